@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for the DNS update flows against the local Namecheap stub
+Runs the reconcile flow (getHosts, diff, setHosts when needed) for a growing
+number of domains and zone sizes and reports per-domain latency percentiles
+and throughput, so performance changes can be measured without the real API.
+
+Usage: python3 bench_dns.py [--domains 10 100] [--zone-sizes 5 50 500]
+                            [--workers 1 8] [--latency 0.02] [--json]
+"""
+
+import argparse
+import json
+import time
+
+from dns_batch import run_batch
+from namecheap_client import NamecheapClient
+from namecheap_stub_server import StubServer, StubState, synthetic_zone
+from run_metrics import percentile
+from zone_file import github_pages_records
+
+SCENARIOS = ('noop', 'write')
+
+
+def run_case(domains, zone_size, workers, scenario, latency, pooled=True):
+    """One benchmark cell: returns a dict of timings and API call counts"""
+    state = StubState(latency=latency)
+    jobs = []
+    for i in range(domains):
+        domain = f'bench{i}.world'
+        zone = synthetic_zone(zone_size, seed=i)
+        state.add_zone(domain, zone)
+        # 'noop' asks for exactly what is there; 'write' changes the www target
+        desired = zone if scenario == 'noop' else zone[:4] + github_pages_records([], 'bench')
+        jobs.append((domain, desired))
+
+    with StubServer(state) as server:
+        started = time.perf_counter()
+        if pooled:
+            with NamecheapClient(state.api_user, state.api_key, '127.0.0.1',
+                                 pool_size=workers, url=server.url) as client:
+                results = list(run_batch(client, jobs, workers))
+        else:
+            results = []
+            for domain, desired in jobs:
+                with NamecheapClient(state.api_user, state.api_key, '127.0.0.1',
+                                     url=server.url) as client:
+                    results.extend(run_batch(client, [(domain, desired)], 1))
+        elapsed = time.perf_counter() - started
+
+    latencies = [r['seconds'] for r in results]
+    return {
+        'domains': domains,
+        'zone_size': zone_size,
+        'workers': workers if pooled else 1,
+        'scenario': scenario,
+        'pooled': pooled,
+        'seconds': round(elapsed, 4),
+        'domains_per_sec': round(domains / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p90_ms': round(percentile(latencies, 90) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'errors': sum(1 for r in results if r['status'] == 'error'),
+        'api_calls': dict(state.calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DNS update flows against the Namecheap stub")
+    parser.add_argument('--domains', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--zone-sizes', type=int, nargs='+', default=[5, 50, 500])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--latency', type=float, default=0.0, help="stub latency per request (s)")
+    parser.add_argument('--unpooled', action='store_true',
+                        help="also run the one-connection-per-domain baseline")
+    parser.add_argument('--json', action='store_true', help="one JSON object per case")
+    args = parser.parse_args()
+
+    if not args.json:
+        print(f"{'scenario':8} {'domains':>7} {'zone':>5} {'workers':>7} {'pool':>5} "
+              f"{'total s':>8} {'dom/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'err':>4}")
+        print("-" * 88)
+    for scenario in args.scenarios:
+        for domains in args.domains:
+            for zone_size in args.zone_sizes:
+                cases = [(workers, True) for workers in args.workers]
+                if args.unpooled:
+                    cases.append((1, False))
+                for workers, pooled in cases:
+                    row = run_case(domains, zone_size, workers, scenario, args.latency, pooled)
+                    if args.json:
+                        print(json.dumps(row), flush=True)
+                        continue
+                    print(f"{scenario:8} {domains:7} {zone_size:5} {row['workers']:7} "
+                          f"{'yes' if pooled else 'no':>5} {row['seconds']:8.3f} "
+                          f"{row['domains_per_sec']:8.1f} {row['p50_ms']:8.2f} "
+                          f"{row['p90_ms']:8.2f} {row['p99_ms']:8.2f} {row['errors']:4}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
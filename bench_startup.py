@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the DNS scripts
+Imports each entry point in a fresh interpreter with ``-X importtime`` and
+reports the median wall time plus the slowest imports, so regressions in
+module-load cost (e.g. a heavy dependency pulled in at the top of a script)
+show up before they land in cron/CI runs.
+
+Usage: python3 bench_startup.py [--runs 7] [--top 5] [--max-ms 150] [--json]
+                                [module ...]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ENTRY_POINTS = [
+    'namecheap_dns_update',
+    'update_dns',
+    'setup_dns',
+    'dns_batch',
+    'namecheap_client',
+    'dns_resolver',
+]
+
+
+def parse_importtime(stderr):
+    """{module: cumulative microseconds} from ``-X importtime`` output
+
+    Everything up to and including ``site`` is interpreter startup and is
+    left out, so only imports triggered by the module itself are counted.
+    """
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        try:
+            _, cumul_us, name = line.split('|')
+            cumul_us = int(cumul_us)
+        except ValueError:
+            continue
+        if name.strip() == 'site':
+            cumulative = {}
+            continue
+        cumulative[name.strip()] = cumul_us
+    return cumulative
+
+
+def measure(module, runs=7, python=sys.executable):
+    """Median wall-clock ms to import ``module`` and its slowest imports"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    walls = []
+    imports = {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run([python, '-X', 'importtime', '-c', f'import {module}'],
+                              cwd=cwd, capture_output=True, text=True)
+        walls.append((time.perf_counter() - started) * 1000)
+        if proc.returncode != 0:
+            return {'module': module, 'error': proc.stderr.strip().splitlines()[-1]}
+        imports = parse_importtime(proc.stderr)
+    own = imports.get(module, 0) / 1000
+    slowest = sorted(((name, us / 1000) for name, us in imports.items() if name != module),
+                     key=lambda item: item[1], reverse=True)
+    return {
+        'module': module,
+        'wall_ms': round(statistics.median(walls), 2),
+        'import_ms': round(own, 2),
+        'requests_loaded': 'requests' in imports,
+        'slowest': [(name, round(ms, 2)) for name, ms in slowest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure interpreter startup + import cost per script")
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('--runs', type=int, default=7, help="interpreter launches per module")
+    parser.add_argument('--top', type=int, default=5, help="slowest imports to list")
+    parser.add_argument('--max-ms', type=float, help="exit 1 if any module's import time exceeds this")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    baseline = measure('sys', args.runs)
+    results = [measure(module, args.runs) for module in args.modules]
+
+    if args.json:
+        print(json.dumps({'baseline_ms': baseline.get('wall_ms'), 'results': results}, indent=2))
+    else:
+        print(f"🐍 Bare interpreter: {baseline.get('wall_ms', 0):.1f} ms (median of {args.runs})")
+        for result in results:
+            if 'error' in result:
+                print(f"❌ {result['module']}: {result['error']}")
+                continue
+            flag = " (pulls in requests)" if result['requests_loaded'] else ""
+            print(f"\n📦 {result['module']}: {result['wall_ms']:.1f} ms wall, "
+                  f"{result['import_ms']:.1f} ms importing{flag}")
+            for name, ms in result['slowest'][:args.top]:
+                print(f"   {ms:7.2f} ms  {name}")
+
+    if args.max_ms is not None:
+        slow = [r['module'] for r in results if 'error' in r or r['import_ms'] > args.max_ms]
+        if slow:
+            print(f"\n⚠️  Over {args.max_ms:g} ms: {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,12 @@
 #!/bin/bash
 
+# Lookups go through dns_cache.py, so repeated checks (here and in the other
+# DNS scripts) reuse answers until their TTL runs out; dig if that fails
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+lookup() {
+    python3 "$SCRIPT_DIR/dns_cache.py" "$@" 2>/dev/null || dig +short "$@"
+}
+
 echo "🔍 DNS Configuration Check for www.lech.world"
 echo "=============================================="
 echo ""
@@ -8,7 +15,7 @@ echo ""
 
 # Check CNAME
 echo "1. CNAME Record (www.lech.world):"
-CNAME=$(dig +short www.lech.world CNAME)
+CNAME=$(lookup www.lech.world CNAME)
 if [[ $CNAME == *"github"* ]]; then
     echo "   ✅ $CNAME (GitHub Pages)"
 elif [[ $CNAME == *"vercel"* ]]; then
@@ -19,7 +26,7 @@ fi
 
 echo ""
 echo "2. A Records (lech.world):"
-A_RECORDS=$(dig +short lech.world A)
+A_RECORDS=$(lookup lech.world A)
 if [[ $A_RECORDS == *"185.199"* ]]; then
     echo "   ✅ GitHub Pages IPs detected"
 else
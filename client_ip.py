@@ -0,0 +1,162 @@
+"""
+Public IP detection for the Namecheap API whitelist (the ClientIp parameter)
+Resolution order: explicit override (argument or NAMECHEAP_CLIENT_IP), a
+fresh on-disk cache entry, a public address on a local interface, and
+finally several IP-echo services queried concurrently, first valid answer
+wins. Nothing ever falls back to a made-up address.
+"""
+
+import ipaddress
+import json
+import os
+import socket
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from http_transport import TransportError, make_transport
+from run_metrics import incr, span
+
+IP_ENDPOINTS = [
+    'https://api.ipify.org',
+    'https://checkip.amazonaws.com',
+    'https://icanhazip.com',
+    'https://ifconfig.me/ip',
+]
+
+OVERRIDE_ENV = 'NAMECHEAP_CLIENT_IP'
+TTL_ENV = 'NAMECHEAP_CLIENT_IP_TTL'
+CACHE_TTL = 3600
+ECHO_TIMEOUT = 3
+
+
+class ClientIPError(Exception):
+    """No public IP could be determined"""
+
+
+def cache_path():
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'lechworld', 'client_ip.json')
+
+
+def valid_ip(text):
+    """Normalized address if text is a single IPv4/IPv6 address, else None"""
+    try:
+        return str(ipaddress.ip_address((text or '').strip()))
+    except ValueError:
+        return None
+
+
+def read_cache(path, ttl):
+    """Cached address if younger than ttl seconds"""
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+        if time.time() - entry['detected_at'] <= ttl:
+            return valid_ip(entry['ip'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def write_cache(path, ip):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'ip': ip, 'detected_at': time.time()}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def local_interface_ip():
+    """Public address of the outbound interface, if the host has one
+
+    Connecting a UDP socket sends no packets; it only picks the route.
+    Behind NAT this is a private address and None is returned.
+    """
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(('192.0.2.1', 53))
+            ip = ipaddress.ip_address(s.getsockname()[0])
+    except (OSError, ValueError):
+        return None
+    return str(ip) if ip.is_global else None
+
+
+def _echo(transport, url, timeout):
+    try:
+        response = transport.get(url, timeout=timeout)
+    except (OSError, EOFError, zlib.error) as e:
+        # A corrupt gzip body (gzip.BadGzipFile) fails this service only
+        raise TransportError(f"{url}: {e}") from e
+    response.raise_for_status()
+    return valid_ip(response.text)
+
+
+def _close_when_done(futures, transport):
+    """Close ``transport`` once every future has finished or been cancelled"""
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            last = not remaining[0]
+        if last:
+            transport.close()
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def fetch_ip(endpoints=IP_ENDPOINTS, timeout=ECHO_TIMEOUT):
+    """Ask every echo service at once and return the first valid answer"""
+    transport = make_transport(pool_size=1)
+    pool = ThreadPoolExecutor(max_workers=len(endpoints))
+    futures = [pool.submit(_echo, transport, url, timeout) for url in endpoints]
+    # The slower services may still hold connections when we return
+    _close_when_done(futures, transport)
+    try:
+        for future in as_completed(futures):
+            try:
+                ip = future.result()
+            except TransportError:
+                continue
+            if ip:
+                return ip
+    finally:
+        # Don't wait for the slower services once we have an answer
+        pool.shutdown(wait=False, cancel_futures=True)
+    raise ClientIPError(f"None of {len(endpoints)} IP echo services answered")
+
+
+def get_client_ip(override=None, ttl=None, path=None, refresh=False):
+    """Public IP to send as ClientIp; raises ClientIPError if it can't be found"""
+    with span('ip_detection'):
+        return _resolve_client_ip(override, ttl, path, refresh)
+
+
+def _resolve_client_ip(override, ttl, path, refresh):
+    for candidate in (override, os.getenv(OVERRIDE_ENV)):
+        if candidate:
+            ip = valid_ip(candidate)
+            if not ip:
+                raise ClientIPError(f"Not an IP address: {candidate!r}")
+            return ip
+
+    if ttl is None:
+        ttl = int(os.getenv(TTL_ENV) or CACHE_TTL)
+    path = path or cache_path()
+    if not refresh and ttl > 0:
+        ip = read_cache(path, ttl)
+        if ip:
+            incr('ip_cache_hits')
+            return ip
+
+    incr('ip_cache_misses')
+    ip = local_interface_ip() or fetch_ip()
+    write_cache(path, ip)
+    return ip
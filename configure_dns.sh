@@ -3,6 +3,17 @@
 # LechWorld DNS Configuration Script
 # Configures www.lech.world to point to GitHub Pages
 
+# Lookups go through dns_cache.py, so repeated checks (here and in the other
+# DNS scripts) reuse answers until their TTL runs out; dig if that fails.
+# Propagation checks use fresh_lookup: a cached answer would hide the change.
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+lookup() {
+    python3 "$SCRIPT_DIR/dns_cache.py" "$@" 2>/dev/null || dig +short "$@"
+}
+fresh_lookup() {
+    python3 "$SCRIPT_DIR/dns_cache.py" --fresh "$@" 2>/dev/null || dig +short "$@"
+}
+
 echo "======================================================================"
 echo "       🌐 LECHWORLD DNS CONFIGURATION - NAMECHEAP TO GITHUB PAGES"
 echo "======================================================================"
@@ -12,13 +23,14 @@ echo "-------------------"
 
 # Check current DNS
 echo "Checking www.lech.world..."
-nslookup www.lech.world | head -n 10
+WWW=$(lookup www.lech.world A)
+echo "$WWW" | sed 's/^/   /'
 
-if nslookup www.lech.world 2>/dev/null | grep -q "vercel"; then
+if echo "$WWW" | grep -q "vercel"; then
     echo ""
     echo "⚠️  WARNING: DNS currently points to Vercel (old project)"
     echo "   This needs to be updated to GitHub Pages"
-elif nslookup www.lech.world 2>/dev/null | grep -q "185.199"; then
+elif echo "$WWW" | grep -q "185.199"; then
     echo ""
     echo "✅ DNS already configured for GitHub Pages!"
     echo "   If the site isn't working, wait for propagation (up to 24h)"
@@ -112,7 +124,7 @@ case $choice in
         
         # Check www subdomain
         echo "1. Checking www.lech.world:"
-        if nslookup www.lech.world 2>/dev/null | grep -q "leolech14.github.io"; then
+        if fresh_lookup www.lech.world CNAME | grep -q "leolech14.github.io"; then
             echo "   ✅ CNAME correctly points to leolech14.github.io"
         else
             echo "   ⏳ CNAME not yet propagated"
@@ -121,7 +133,7 @@ case $choice in
         # Check apex domain
         echo ""
         echo "2. Checking lech.world:"
-        if nslookup lech.world 2>/dev/null | grep -q "185.199"; then
+        if fresh_lookup lech.world A | grep -q "185.199"; then
             echo "   ✅ A records correctly point to GitHub Pages IPs"
         else
             echo "   ⏳ A records not yet propagated"
@@ -0,0 +1,125 @@
+"""
+Authoritative-nameserver convergence check
+Finds a zone's authoritative nameservers and asks every one of them directly
+(without recursion) for the SOA serial and for the records just written.
+Once they all agree the change is "done at the source"; what remains is
+recursive caches expiring, which can be estimated from the TTLs they report.
+"""
+
+import asyncio
+import time
+
+from dns_resolver import DEFAULT_TIMEOUT, query, run
+
+
+class AuthorityReport:
+    """State of every authoritative server for one zone"""
+
+    def __init__(self, zone):
+        self.zone = zone
+        self.nameservers = {}     # NS host name -> [addresses]
+        self.serials = {}         # server address -> SOA serial (None if no answer)
+        self.soa_minimum = None   # negative-caching TTL from the SOA
+        self.answers = []         # non-recursive Answers for the checked questions
+        self.errors = []
+
+    @property
+    def servers(self):
+        return [ip for ips in self.nameservers.values() for ip in ips]
+
+    @property
+    def serial(self):
+        """The common SOA serial, or None while servers disagree"""
+        serials = set(self.serials.values())
+        if len(serials) == 1 and None not in serials:
+            return serials.pop()
+        return None
+
+    def converged(self, matches):
+        """Every server has the same serial and serves the expected records"""
+        return (bool(self.servers) and self.serial is not None
+                and bool(self.answers)
+                and all(a.ok and matches(a) for a in self.answers))
+
+
+async def _lookup(zone, questions, resolvers, timeout, port):
+    report = AuthorityReport(zone)
+
+    ns_names = []
+    for resolver in resolvers:
+        answer = await query(resolver, zone, 'NS', timeout)
+        if answer.ok and answer.values('NS'):
+            ns_names = sorted(answer.values('NS'))
+            break
+        report.errors.append(f"{resolver}: NS lookup {answer.error or answer.rcode}")
+    if not ns_names:
+        return report
+
+    addresses = await asyncio.gather(*[query(resolvers[0], ns, 'A', timeout) for ns in ns_names])
+    for ns, answer in zip(ns_names, addresses):
+        report.nameservers[ns] = [ip if port == 53 else f"{ip}:{port}" for ip in answer.values('A')]
+        if not answer.values('A'):
+            report.errors.append(f"{ns}: no address ({answer.error or answer.rcode})")
+
+    servers = report.servers
+    soas = await asyncio.gather(*[query(ip, zone, 'SOA', timeout, recursion=False)
+                                  for ip in servers])
+    for ip, answer in zip(servers, soas):
+        values = answer.values('SOA')
+        if values:
+            report.serials[ip] = values[0].serial
+            report.soa_minimum = min(values[0].minimum, answer.records[0].ttl)
+        else:
+            report.serials[ip] = None
+            report.errors.append(f"{ip}: SOA {answer.error or answer.rcode}")
+
+    report.answers = await asyncio.gather(*[
+        query(ip, name, qtype, timeout, recursion=False)
+        for ip in servers for name, qtype in questions
+    ])
+    return report
+
+
+def check_authorities(zone, questions, resolvers, timeout=DEFAULT_TIMEOUT, port=53):
+    """One pass: NS discovery, then SOA and the questions against every authoritative server"""
+    return run(_lookup(zone, questions, resolvers, timeout, port))
+
+
+def wait_for_authorities(zone, questions, resolvers, matches, deadline=120.0,
+                         interval=2.0, timeout=DEFAULT_TIMEOUT, port=53):
+    """Repeat check_authorities until the authoritative set converges
+
+    Returns (report, seconds waited, converged). Gives up at once when no
+    authoritative nameserver can be found: asking again won't change that.
+    """
+    started = time.monotonic()
+    while True:
+        report = check_authorities(zone, questions, resolvers, timeout, port)
+        elapsed = time.monotonic() - started
+        if report.converged(matches):
+            return report, elapsed, True
+        if not report.nameservers:
+            return report, elapsed, False
+        if elapsed + interval > deadline:
+            return report, elapsed, False
+        time.sleep(interval)
+
+
+def estimate_cache_expiry(recursive_answers, matches, soa_minimum=None):
+    """Seconds until every recursive cache has dropped its stale answer
+
+    A stale answer can't outlive the TTL the resolver reports for it; a
+    negative (NXDOMAIN/empty) answer lives for at most the SOA minimum.
+    Returns 0 when every answer is already current, None if nothing answered.
+    """
+    remaining = []
+    for answer in recursive_answers:
+        if not answer.ok and answer.rcode != 'NXDOMAIN':
+            continue
+        if answer.ok and answer.records and matches(answer):
+            remaining.append(0)
+        elif answer.records:
+            remaining.append(max(r.ttl for r in answer.records))
+        else:
+            remaining.append(soa_minimum or 0)
+    return max(remaining) if remaining else None
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Batch DNS reconcile for many Namecheap domains
+Runs every domain through a bounded worker pool sharing one pooled client and
+one token-bucket scheduler, so total time is set by the API quota rather than
+by per-request latency. Results are printed as each domain finishes.
+
+Domains file (JSON):
+    [
+      {"domain": "lech.world", "github_pages": "leolech14"},
+      {"domain": "example.com", "records": [
+          {"HostName": "@", "RecordType": "A", "Address": "1.2.3.4", "TTL": "1800"}
+      ]},
+      {"domain": "example.org", "zone_file": "zones/example.org.zone"}
+    ]
+
+zone_file paths are relative to the domains file and compiled (with an
+on-disk cache) by zone_file.py.
+
+Usage: python3 dns_batch.py domains.json [--workers 8] [--jsonl] [--force]
+Credentials come from NAMECHEAP_API_USER / NAMECHEAP_API_KEY.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from client_ip import ClientIPError, get_client_ip
+from dns_reconcile import reconcile
+from domain_coord import LockTimeout
+from namecheap_client import HostRecord, NamecheapClient, TransportError, split_domain
+from rate_limit import PER_DAY, PER_HOUR, PER_MINUTE, namecheap_limiter
+from record_rules import InvalidRecords
+from run_metrics import METRICS, incr, write_reports
+from run_profile import start_profiling
+from zone_file import GITHUB_IPS, compile_zone, github_pages_records
+from zone_history import open_history
+
+
+def load_jobs(path):
+    """Read the domains file into (domain, records) pairs
+
+    Raises OSError, or ValueError (ZoneError and bad JSON included) naming
+    the entry at fault.
+    """
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError("expected a JSON list of domains")
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for i, entry in enumerate(entries):
+        try:
+            domain = entry['domain']
+            if 'records' in entry:
+                records = [HostRecord.from_dict(r) for r in entry['records']]
+            elif 'github_pages' in entry:
+                records = github_pages_records(GITHUB_IPS, entry['github_pages'])
+            elif 'zone_file' in entry:
+                records = compile_zone(os.path.join(base, entry['zone_file']), domain).records
+            else:
+                raise ValueError(f"{domain}: needs 'records', 'github_pages' or 'zone_file'")
+        except KeyError as e:
+            raise ValueError(f"entry {i + 1}: missing {e}")
+        except (TypeError, AttributeError):
+            raise ValueError(f"entry {i + 1}: expected an object with a 'domain'")
+        jobs.append((domain, records))
+    return jobs
+
+
+def run_domain(client, domain, records, force=False):
+    """Reconcile one domain; always returns a result dict, never raises"""
+    started = time.monotonic()
+    result = {'domain': domain, 'status': 'error', 'changes': [], 'errors': [], 'warnings': []}
+    try:
+        sld, tld = split_domain(domain)
+        outcome = reconcile(client, sld, tld, records, force=force)
+        result['changes'] = [line.strip() for line in outcome.plan.lines()]
+        result['superseded'] = outcome.superseded
+        result['warnings'] = [str(v) for v in outcome.warnings]
+        if not outcome.ok:
+            result['errors'] = [f"{num}: {text}" for num, text in outcome.api_result.errors]
+        elif outcome.changed:
+            result['status'] = 'updated'
+        else:
+            result['status'] = 'unchanged'
+    except InvalidRecords as e:
+        result['errors'] = [str(v) for v in e.violations]
+    except (TransportError, ET.ParseError, ValueError, LockTimeout, OSError) as e:
+        result['errors'] = [str(e) or e.__class__.__name__]
+    result['seconds'] = round(time.monotonic() - started, 4)
+    return result
+
+
+def run_batch(client, jobs, workers=8, force=False):
+    """Yield per-domain results in completion order"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_domain, client, domain, records, force)
+                   for domain, records in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def print_result(result):
+    icon = {'updated': '✅', 'unchanged': '➖', 'error': '❌'}[result['status']]
+    print(f"{icon} {result['domain']:30} {result['status']:10} {result['seconds']:.2f}s")
+    for line in result['changes']:
+        print(f"     {line}")
+    for error in result['errors']:
+        print(f"     {error}")
+    for warning in result['warnings']:
+        print(f"     ⚠️  {warning}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile DNS for many Namecheap domains")
+    parser.add_argument('domains_file', help="JSON list of domains and desired records")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent domains (default 8)")
+    parser.add_argument('--per-minute', type=int, default=PER_MINUTE)
+    parser.add_argument('--per-hour', type=int, default=PER_HOUR)
+    parser.add_argument('--per-day', type=int, default=PER_DAY)
+    parser.add_argument('--client-ip',
+                        help="whitelisted IP (default: NAMECHEAP_CLIENT_IP, cache or detection)")
+    parser.add_argument('--jsonl', action='store_true', help="print one JSON object per domain")
+    parser.add_argument('--force', action='store_true', help="write even when zones match")
+    parser.add_argument('--metrics-jsonl', help="append a run report here (default: $DNS_METRICS_JSONL)")
+    parser.add_argument('--metrics-prom', help="write Prometheus metrics here (default: $DNS_METRICS_PROM)")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile CPU and memory per phase into $DNS_PROFILE_DIR (default ./profiles)")
+    args = parser.parse_args()
+    if args.profile:
+        start_profiling('dns_batch')
+
+    api_user = os.getenv('NAMECHEAP_API_USER')
+    api_key = os.getenv('NAMECHEAP_API_KEY')
+    if not api_user or not api_key:
+        print("Set NAMECHEAP_API_USER and NAMECHEAP_API_KEY")
+        sys.exit(1)
+
+    try:
+        client_ip = get_client_ip(args.client_ip)
+    except ClientIPError as e:
+        print(f"❌ Could not determine client IP ({e}); pass --client-ip")
+        sys.exit(1)
+
+    try:
+        jobs = load_jobs(args.domains_file)
+    except (OSError, ValueError) as e:
+        print(f"❌ {args.domains_file}: {e}")
+        sys.exit(1)
+    limiter = namecheap_limiter(args.per_minute, args.per_hour, args.per_day)
+    counts = {'updated': 0, 'unchanged': 0, 'error': 0}
+    started = time.monotonic()
+
+    if not args.jsonl:
+        print(f"🌐 Reconciling {len(jobs)} domains with {args.workers} workers")
+        print(f"📍 Client IP: {client_ip}")
+    with NamecheapClient(api_user, api_key, client_ip, pool_size=args.workers,
+                         limiter=limiter, history=open_history()) as client:
+        for result in run_batch(client, jobs, args.workers, args.force):
+            counts[result['status']] += 1
+            incr('domains', status=result['status'])
+            if args.jsonl:
+                print(json.dumps(result), flush=True)
+            else:
+                print_result(result)
+
+    if not args.jsonl:
+        print("-" * 60)
+        print(f"Done in {time.monotonic() - started:.1f}s: "
+              f"{counts['updated']} updated, {counts['unchanged']} unchanged, "
+              f"{counts['error']} failed (rate limit wait {limiter.waited:.1f}s, "
+              f"{METRICS.total('api_retries')} retries, {METRICS.total('api_hedges')} hedged reads)")
+    write_reports('dns_batch', jsonl_path=args.metrics_jsonl, prom_path=args.metrics_prom)
+    sys.exit(1 if counts['error'] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+TTL-honoring cache of recursive DNS answers
+Answers are keyed by (resolver, name, type) and kept for the smallest TTL
+in the answer, the same time the resolver itself would serve them from
+its cache. NXDOMAIN and no-data answers are cached for the SOA minimum
+from the authority section (RFC 2308). Failures are never cached. The
+cache is bounded and evicts the least recently used entry. Records on a
+cache hit get their remaining TTL, as a resolver would report them.
+
+dns_resolver.query() consults the process-wide cache for recursive
+queries unless it is called with fresh=True. Non-recursive queries to
+authoritative servers always go to the network. DNS_CACHE selects the
+mode: "memory" (default), "disk" (persisted to
+~/.cache/lechworld/dns_answers.json so separate runs share answers), a
+file path, or "off".
+
+Usage: python3 dns_cache.py www.lech.world [CNAME] [--server 1.1.1.1] [--fresh]
+       python3 dns_cache.py --stats | --clear
+The lookup prints one value per line, like dig +short.
+"""
+
+import argparse
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from dns_resolver import PUBLIC_RESOLVERS, SOA, Answer, Record, resolve_many, system_resolvers
+from run_metrics import incr
+
+CACHE_ENV = 'DNS_CACHE'
+MAX_ENTRIES = 4096
+MAX_TTL = 86400           # never trust an answer for longer than a day
+NEGATIVE_MAX_TTL = 3600   # RFC 2308 suggests capping negative TTLs
+
+
+def cache_path():
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'lechworld', 'dns_answers.json')
+
+
+def answer_ttl(answer):
+    """Seconds an answer may be reused, or None if it must not be cached"""
+    if answer.error is not None:
+        return None
+    if answer.rcode == 'NOERROR' and answer.records:
+        return min(answer.min_ttl, MAX_TTL)
+    if answer.rcode in ('NOERROR', 'NXDOMAIN'):
+        # Negative answer: min(SOA record TTL, SOA minimum)
+        soas = [r for r in answer.authority if r.type == 'SOA']
+        if soas:
+            return min(soas[0].ttl, soas[0].data.minimum, NEGATIVE_MAX_TTL)
+    return None
+
+
+def _encode_records(records):
+    return [[r.name, r.type, r.ttl, list(r.data) if r.type == 'SOA' else r.data] for r in records]
+
+
+def _decode_records(rows):
+    return [Record(name, type_, ttl, SOA(*data) if type_ == 'SOA' else data)
+            for name, type_, ttl, data in rows]
+
+
+class AnswerCache:
+    """LRU of (resolver, name, type) -> answer, expired by TTL (thread-safe)"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()   # key -> (stored_at, expires_at, encoded answer)
+        self.lock = threading.Lock()
+        self.dirty = False
+        if path:
+            self.load()
+
+    @staticmethod
+    def key(resolver, name, qtype):
+        return f"{resolver}|{name.rstrip('.').lower()}|{qtype}"
+
+    def get(self, resolver, name, qtype, now=None):
+        """A copy of the cached Answer with TTLs counted down, or None"""
+        now = time.time() if now is None else now
+        key = self.key(resolver, name, qtype)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self.entries[key]
+                    self.dirty = True
+                incr('dns_cache_misses')
+                return None
+            self.entries.move_to_end(key)
+        stored_at, _, data = entry
+        age = int(now - stored_at)
+        answer = Answer(resolver, data['name'], qtype, data['rcode'],
+                        _decode_records(data['records']), _decode_records(data['authority']),
+                        authoritative=data['authoritative'], cached=True)
+        for record in answer.records + answer.authority:
+            record.ttl = max(0, record.ttl - age)
+        incr('dns_cache_hits')
+        return answer
+
+    def put(self, answer, now=None):
+        """Store an answer if it is cacheable; returns the TTL used or None"""
+        ttl = answer_ttl(answer)
+        if not ttl:
+            return None
+        now = time.time() if now is None else now
+        data = {'name': answer.name, 'rcode': answer.rcode,
+                'records': _encode_records(answer.records),
+                'authority': _encode_records(answer.authority),
+                'authoritative': answer.authoritative}
+        key = self.key(answer.resolver, answer.name, answer.qtype)
+        with self.lock:
+            self.entries[key] = (now, now + ttl, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                incr('dns_cache_evictions')
+            self.dirty = True
+        return ttl
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.dirty = True
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self):
+        """Merge unexpired entries from the cache file, oldest first"""
+        try:
+            with open(self.path) as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self.lock:
+            for row in rows if isinstance(rows, list) else []:
+                try:
+                    key, stored_at, expires_at, data = row
+                except (TypeError, ValueError):
+                    continue
+                if expires_at > now and key not in self.entries:
+                    self.entries[key] = (stored_at, expires_at, data)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def save(self):
+        """Write unexpired entries back to the cache file (in LRU order)"""
+        if not self.path or not self.dirty:
+            return
+        now = time.time()
+        with self.lock:
+            rows = [[key, stored_at, expires_at, data]
+                    for key, (stored_at, expires_at, data) in self.entries.items()
+                    if expires_at > now]
+            self.dirty = False
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(rows, f, separators=(',', ':'))
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+_shared = {}
+
+
+def shared_cache():
+    """The process-wide AnswerCache selected by DNS_CACHE, or None when it is off"""
+    mode = os.getenv(CACHE_ENV, 'memory').strip() or 'memory'
+    if mode not in _shared:
+        if mode.lower() in ('off', 'none', '0'):
+            _shared[mode] = None
+        elif mode.lower() == 'memory':
+            _shared[mode] = AnswerCache()
+        else:
+            cache = AnswerCache(path=cache_path() if mode.lower() == 'disk' else mode)
+            atexit.register(cache.save)
+            _shared[mode] = cache
+    return _shared[mode]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached DNS lookup (dig +short style)")
+    parser.add_argument('name', nargs='?')
+    parser.add_argument('type', nargs='?', default='A')
+    parser.add_argument('--server', help="resolver to ask (default: the system resolver)")
+    parser.add_argument('--fresh', action='store_true', help="bypass the cache for this lookup")
+    parser.add_argument('--stats', action='store_true', help="show cache size and exit")
+    parser.add_argument('--clear', action='store_true', help="empty the cache and exit")
+    args = parser.parse_args()
+
+    # Separate invocations (shell scripts) only share answers through the file
+    if not os.getenv(CACHE_ENV):
+        os.environ[CACHE_ENV] = 'disk'
+    cache = shared_cache()
+    if args.stats or args.clear:
+        if cache is None:
+            print(f"➖ Cache disabled ({CACHE_ENV}=off)")
+            return
+        if args.clear:
+            cache.clear()
+        print(f"📦 {len(cache)} cached answers in {cache.path or 'memory'}")
+        return
+    if not args.name:
+        parser.error("name is required")
+
+    server = args.server or (system_resolvers()[:1] or [PUBLIC_RESOLVERS['Cloudflare']])[0]
+    answer = resolve_many([(args.name, args.type.upper())], [server], fresh=args.fresh)[0]
+    if answer.error or answer.rcode not in ('NOERROR', 'NXDOMAIN'):
+        print(f";; {answer.error or answer.rcode} from {server}", file=sys.stderr)
+        sys.exit(1)
+    # Whole answer section, so an A lookup of a CNAME shows the chain like dig does
+    for record in answer.records:
+        print(record.data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Drift-detection reconciler daemon for many Namecheap domains
+Keeps the desired records for every domain in a domains file (the same
+format as dns_batch.py) and checks them with cheap DNS queries, each domain
+rescheduled by the TTLs its answers carry. The Namecheap API is only used
+when DNS disagrees with the desired state: getHosts confirms the drift and
+setHosts is sent only when the zone really differs, so a fleet that stays
+in sync costs next to no API quota. An optional slow audit (getHosts once
+per --audit-interval) catches records DNS checks can't see, such as a
+stray CNAME on a name that isn't in the desired set.
+
+Health and metrics are served locally:
+    GET /healthz   200 while the check loop is alive, 503 otherwise (JSON)
+    GET /metrics   Prometheus text format: run counters plus per-domain state
+    GET /status    every domain's verdict and schedule (JSON)
+
+Usage: python3 dns_daemon.py domains.json [--listen 127.0.0.1:9477]
+                             [--resolver IP|tls://host|https://host/dns-query ...] [--dry-run] [--once]
+                             [--profile]
+Credentials come from NAMECHEAP_API_USER / NAMECHEAP_API_KEY.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from client_ip import ClientIPError, get_client_ip
+from dns_batch import load_jobs
+from dns_reconcile import fetch_current, plan_changes, reconcile
+from dns_resolver import DEFAULT_TIMEOUT, resolve_each, system_resolvers
+from domain_coord import LockTimeout
+from namecheap_client import NamecheapClient, TransportError, split_domain
+from rate_limit import namecheap_limiter
+from record_rules import InvalidRecords
+from run_metrics import METRICS, prom_labels, incr, span, to_prometheus
+from run_profile import start_profiling
+from zone_history import open_history
+
+# Record types a plain DNS query can confirm; the rest only get the audit
+CHECKABLE_TYPES = ('A', 'AAAA', 'CNAME', 'MX', 'TXT')
+
+MIN_INTERVAL = 60          # never check a domain more often than this (seconds)
+MAX_INTERVAL = 3600        # ...or less often than this
+API_COOLDOWN = 900         # at most one drift-triggered getHosts per domain per cooldown
+AUDIT_INTERVAL = 86400     # unconditional getHosts per domain (0 disables)
+TICK = 30                  # longest the loop sleeps, keeps the heartbeat fresh
+DEFAULT_LISTEN = '127.0.0.1:9477'
+
+
+def fqdn(name, domain):
+    name = name.strip().lower().rstrip('.')
+    return domain if name in ('', '@') else f"{name}.{domain}"
+
+
+def expected_answers(domain, records):
+    """{(fqdn, qtype): set of values} a resolver should return for the desired records"""
+    expected = {}
+    for record in records:
+        if record.type not in CHECKABLE_TYPES:
+            continue
+        _, type_, address = record.key
+        if type_ == 'MX':
+            address = f"{record.mx_pref} {address}"
+        expected.setdefault((fqdn(record.name, domain), type_), set()).add(address)
+    return expected
+
+
+def compare_answer(answer, values):
+    """('ok' | 'drift' | 'unknown', detail) for one resolver answer"""
+    if answer.error or answer.rcode not in ('NOERROR', 'NXDOMAIN'):
+        return 'unknown', f"{answer.name} {answer.qtype}: {answer.error or answer.rcode}"
+    if answer.qtype != 'CNAME':
+        # A CNAME at the name itself shadows every other record we want there
+        aliases = [r.data for r in answer.records if r.type == 'CNAME' and r.name == answer.name]
+        if aliases:
+            return 'drift', f"{answer.name} {answer.qtype}: unexpected CNAME → {aliases[0]}"
+    got = set(answer.values())
+    if answer.qtype != 'TXT':
+        got = {str(v).lower().rstrip('.') for v in got}
+    if got != values:
+        seen = ', '.join(sorted(got)) or answer.rcode
+        return 'drift', f"{answer.name} {answer.qtype}: {seen} (want {', '.join(sorted(values))})"
+    return 'ok', None
+
+
+def next_delay(answers, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+    """Seconds until the cached answers expire, clamped to [min_interval, max_interval]
+
+    Negative answers are cached for the SOA minimum in the authority section.
+    """
+    ttls = [a.min_ttl for a in answers if a.min_ttl is not None]
+    ttls += [min(r.ttl, r.data.minimum) for a in answers for r in a.authority if r.type == 'SOA']
+    delay = min(ttls) if ttls else min_interval
+    return max(min_interval, min(delay, max_interval))
+
+
+class DomainState:
+    """Desired records, last verdict and schedule for one domain"""
+
+    def __init__(self, domain, records, now=0.0):
+        self.domain = domain.lower()
+        self.records = records
+        self.sld, self.tld = split_domain(self.domain)
+        self.expected = expected_answers(self.domain, records)
+        self.status = 'pending'     # in_sync | propagating | drift | repaired | unknown | error
+        self.detail = []
+        self.next_check = now
+        self.last_check = None      # wall clock, for /status
+        self.last_api_check = None  # monotonic
+        self.last_audit = now       # monotonic; the first audit is one interval in
+        self.repairs = 0
+
+    def to_dict(self, now):
+        return {
+            'domain': self.domain,
+            'status': self.status,
+            'detail': self.detail,
+            'last_check': self.last_check,
+            'next_check_in': round(max(self.next_check - now, 0), 1),
+            'repairs': self.repairs,
+        }
+
+
+def log(state, icon, message):
+    print(f"[{datetime.now():%H:%M:%S}] {icon} {state.domain}: {message}", flush=True)
+
+
+class DriftReconciler:
+    """TTL-scheduled DNS checks with API confirmation and repair"""
+
+    def __init__(self, client, jobs, resolvers, min_interval=MIN_INTERVAL,
+                 max_interval=MAX_INTERVAL, api_cooldown=API_COOLDOWN,
+                 audit_interval=AUDIT_INTERVAL, dry_run=False, timeout=DEFAULT_TIMEOUT):
+        now = time.monotonic()
+        self.client = client
+        self.states = [DomainState(domain, records, now) for domain, records in jobs]
+        self.resolvers = resolvers
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.api_cooldown = api_cooldown
+        self.audit_interval = audit_interval
+        self.dry_run = dry_run
+        self.timeout = timeout
+        self.heartbeat = now
+        self.rounds = 0
+
+    def run_once(self, now=None):
+        """Check every due domain; returns the states that were checked"""
+        now = time.monotonic() if now is None else now
+        due = [s for s in self.states if s.next_check <= now]
+        if due:
+            self.check(due, now)
+        self.heartbeat = time.monotonic()
+        self.rounds += 1
+        return due
+
+    def check(self, states, now):
+        """All questions of all due domains against all resolvers in one event loop"""
+        jobs, owners = [], []
+        for state in states:
+            for name, qtype in state.expected:
+                for resolver in self.resolvers:
+                    jobs.append((resolver, name, qtype))
+                    owners.append((state, (name, qtype)))
+        with span('dns_check'):
+            answers = resolve_each(jobs, self.timeout, fresh=True) if jobs else []
+
+        by_state = {}
+        for (state, key), answer in zip(owners, answers):
+            by_state.setdefault(id(state), []).append((key, answer))
+
+        for state in states:
+            results = by_state.get(id(state), [])
+            verdicts = [compare_answer(answer, state.expected[key]) for key, answer in results]
+            state.last_check = round(time.time(), 3)
+            state.next_check = now + next_delay([a for _, a in results],
+                                                self.min_interval, self.max_interval)
+            drift = [detail for verdict, detail in verdicts if verdict == 'drift']
+            unknown = [detail for verdict, detail in verdicts if verdict == 'unknown']
+            incr('drift_checks', result='drift' if drift else 'unknown' if unknown else 'ok')
+
+            if drift:
+                state.detail = drift
+                self.confirm(state, now, 'drift')
+            elif self.audit_interval and now - state.last_audit >= self.audit_interval:
+                self.confirm(state, now, 'audit')
+            elif unknown:
+                # Resolver trouble says nothing about the zone; look again soon
+                state.status, state.detail = 'unknown', unknown
+                state.next_check = now + self.min_interval
+            else:
+                state.status, state.detail = 'in_sync', []
+
+    def confirm(self, state, now, reason):
+        """getHosts for a suspect (or audited) domain; setHosts only for a real diff"""
+        if (reason == 'drift' and state.last_api_check is not None
+                and now - state.last_api_check < self.api_cooldown):
+            # Already confirmed recently; DNS is still catching up
+            if state.status not in ('propagating', 'repaired'):
+                state.status = 'drift'
+            return
+        state.last_api_check = state.last_audit = now
+        incr('drift_api_checks', reason=reason)
+
+        try:
+            current, result = fetch_current(self.client, state.sld, state.tld)
+            if current is None:
+                state.status = 'error'
+                state.detail = [f"{num}: {text}" for num, text in result.errors]
+                log(state, '❌', f"getHosts failed ({'; '.join(state.detail)})")
+                return
+
+            plan = plan_changes(current, state.records)
+            if plan.is_noop:
+                # The registrar already holds the desired zone; resolvers are catching up
+                state.status = 'propagating' if reason == 'drift' else 'in_sync'
+                if reason == 'drift':
+                    log(state, '⏳', "zone matches at Namecheap, waiting for caches to expire")
+                return
+
+            incr('drift_detected')
+            state.detail = [line.strip() for line in plan.lines()]
+            source = 'audit' if reason == 'audit' else 'DNS mismatch'
+            log(state, '⚠️ ', f"zone differs ({source}): {'; '.join(state.detail)}")
+            if self.dry_run:
+                state.status = 'drift'
+                return
+
+            outcome = reconcile(self.client, state.sld, state.tld, state.records, current=current)
+            if outcome.ok:
+                state.status = 'repaired'
+                state.repairs += 1
+                incr('drift_repairs')
+                log(state, '✅', "setHosts sent, zone restored")
+            else:
+                state.status = 'error'
+                state.detail = [f"{num}: {text}" for num, text in outcome.api_result.errors]
+                log(state, '❌', f"setHosts failed ({'; '.join(state.detail)})")
+        except (TransportError, ET.ParseError, LockTimeout, InvalidRecords) as e:
+            state.status, state.detail = 'error', [str(e)]
+            log(state, '❌', f"API error: {e}")
+
+    def run(self, stop):
+        """Loop until ``stop`` (a threading.Event) is set"""
+        while not stop.is_set():
+            self.run_once()
+            wake = min((s.next_check for s in self.states), default=time.monotonic() + TICK)
+            stop.wait(min(max(wake - time.monotonic(), 0), TICK))
+
+    def health(self):
+        """(healthy, details): the loop is alive and not every domain is failing"""
+        age = time.monotonic() - self.heartbeat
+        counts = Counter(s.status for s in self.states)
+        healthy = age <= 3 * TICK and (counts['error'] < len(self.states) or not self.states)
+        return healthy, {'healthy': healthy, 'heartbeat_age': round(age, 1),
+                         'rounds': self.rounds, 'domains': dict(counts)}
+
+    def status(self):
+        now = time.monotonic()
+        return [s.to_dict(now) for s in self.states]
+
+    def prometheus(self):
+        """Run counters and phases plus one in_sync gauge per domain"""
+        lines = ['# HELP lechworld_dns_domain_in_sync 1 when the zone at Namecheap matches the desired records',
+                 '# TYPE lechworld_dns_domain_in_sync gauge']
+        for state in self.states:
+            labels = (('domain', state.domain), ('script', 'dns_daemon'))
+            in_sync = int(state.status in ('in_sync', 'propagating', 'repaired'))
+            lines.append(f"lechworld_dns_domain_in_sync{prom_labels(labels)} {in_sync}")
+        return to_prometheus(METRICS.snapshot('dns_daemon')) + '\n'.join(lines) + '\n'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _send(self, status, content_type, body):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        reconciler = self.server.reconciler
+        path = urlsplit(self.path).path
+        if path == '/healthz':
+            healthy, details = reconciler.health()
+            self._send(200 if healthy else 503, 'application/json', json.dumps(details))
+        elif path == '/metrics':
+            self._send(200, 'text/plain; version=0.0.4', reconciler.prometheus())
+        elif path == '/status':
+            self._send(200, 'application/json', json.dumps(reconciler.status(), indent=2))
+        else:
+            self._send(404, 'text/plain', 'not found\n')
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_http(reconciler, listen=DEFAULT_LISTEN):
+    """Start the health/metrics endpoint in a background thread"""
+    host, _, port = listen.rpartition(':')
+    httpd = ThreadingHTTPServer((host or '127.0.0.1', int(port)), _Handler)
+    httpd.daemon_threads = True
+    httpd.reconciler = reconciler
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch many domains for DNS drift and repair it")
+    parser.add_argument('domains_file', help="JSON list of domains and desired records")
+    parser.add_argument('--resolver', action='append',
+                        help="recursive resolver to check against: IP, tls://host or https://host/path "
+                             "(repeatable; default: system resolver)")
+    parser.add_argument('--listen', default=DEFAULT_LISTEN, help="health/metrics address (empty to disable)")
+    parser.add_argument('--min-interval', type=float, default=MIN_INTERVAL)
+    parser.add_argument('--max-interval', type=float, default=MAX_INTERVAL)
+    parser.add_argument('--api-cooldown', type=float, default=API_COOLDOWN)
+    parser.add_argument('--audit-interval', type=float, default=AUDIT_INTERVAL,
+                        help="seconds between unconditional getHosts per domain (0 disables)")
+    parser.add_argument('--dry-run', action='store_true', help="report drift but never call setHosts")
+    parser.add_argument('--once', action='store_true',
+                        help="check every domain once and exit 1 if any drifted")
+    parser.add_argument('--client-ip',
+                        help="whitelisted IP (default: NAMECHEAP_CLIENT_IP, cache or detection)")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile CPU and memory per phase into $DNS_PROFILE_DIR (default ./profiles)")
+    args = parser.parse_args()
+    if args.profile:
+        start_profiling('dns_daemon')
+
+    api_user = os.getenv('NAMECHEAP_API_USER')
+    api_key = os.getenv('NAMECHEAP_API_KEY')
+    if not api_user or not api_key:
+        print("Set NAMECHEAP_API_USER and NAMECHEAP_API_KEY")
+        sys.exit(1)
+    try:
+        client_ip = get_client_ip(args.client_ip)
+    except ClientIPError as e:
+        print(f"❌ Could not determine client IP ({e}); pass --client-ip")
+        sys.exit(1)
+
+    try:
+        jobs = load_jobs(args.domains_file)
+    except (OSError, ValueError) as e:
+        print(f"❌ {args.domains_file}: {e}")
+        sys.exit(1)
+    resolvers = args.resolver or system_resolvers()[:1] or ['1.1.1.1']
+    with NamecheapClient(api_user, api_key, client_ip, limiter=namecheap_limiter(),
+                         history=open_history()) as client:
+        reconciler = DriftReconciler(client, jobs, resolvers, args.min_interval, args.max_interval,
+                                     args.api_cooldown, args.audit_interval, args.dry_run)
+
+        if args.once:
+            reconciler.audit_interval = 0
+            reconciler.run_once()
+            for state in reconciler.states:
+                print(f"{state.domain:30} {state.status:12} {'; '.join(state.detail)}")
+            sys.exit(1 if any(s.status in ('drift', 'error') for s in reconciler.states) else 0)
+
+        httpd = serve_http(reconciler, args.listen) if args.listen else None
+        print(f"🛰️  Watching {len(jobs)} domains via {', '.join(resolvers)}"
+              + (f", health on http://{args.listen}/healthz" if httpd else ""), flush=True)
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        try:
+            reconciler.run(stop)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if httpd:
+                httpd.shutdown()
+            print("\n👋 Stopped")
+
+
+if __name__ == "__main__":
+    main()
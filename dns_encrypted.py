@@ -0,0 +1,282 @@
+"""
+DNS-over-TLS and DNS-over-HTTPS upstreams for dns_resolver
+Resolvers given as "tls://host[:port]" (RFC 7858) or
+"https://host[:port]/path" (RFC 8484) are asked over one persistent
+encrypted connection per upstream and event loop, shared by every query
+in flight: DoT messages are matched to their query by message ID and may
+come back in any order; DoH requests are pipelined over HTTP/1.1 and
+answered in order (the stdlib has no HTTP/2 client), so one slow answer
+holds up the ones behind it; prefer tls:// for large sweeps. Checking
+hundreds of names costs one TLS handshake per upstream, not one per query.
+
+"#name" after the address sets the TLS server name to verify, for
+upstreams given by IP: "tls://1.1.1.1#cloudflare-dns.com". Certificates
+are checked against the system trust store (SSL_CERT_FILE points
+elsewhere, e.g. at dns_stub_server.py's self-signed certificate).
+"""
+
+import asyncio
+import collections
+import ssl
+import struct
+import weakref
+from urllib.parse import urlsplit
+
+from run_metrics import incr
+
+SCHEMES = {'tls': 853, 'https': 443}
+DOH_PATH = '/dns-query'
+MAX_IN_FLIGHT = 100    # queries outstanding on one connection
+CONTENT_TYPE = 'application/dns-message'
+
+
+class UpstreamError(Exception):
+    """The upstream answered with something other than a DNS message"""
+
+
+class ConnectionLost(UpstreamError):
+    """The connection closed before this query was answered"""
+
+
+def is_encrypted(server):
+    return server.split('://', 1)[0] in SCHEMES if '://' in server else False
+
+
+def parse_upstream(server):
+    """'tls://1.1.1.1#cloudflare-dns.com' -> (scheme, host, port, path, server_name)"""
+    address, _, server_name = server.partition('#')
+    parts = urlsplit(address)
+    if parts.scheme not in SCHEMES or not parts.hostname:
+        raise UpstreamError(f"Bad upstream {server!r} (use tls://host or https://host/path)")
+    port = parts.port or SCHEMES[parts.scheme]
+    return parts.scheme, parts.hostname, port, parts.path or DOH_PATH, server_name or parts.hostname
+
+
+_contexts = {}
+
+
+def _tls_context(alpn):
+    if alpn not in _contexts:
+        context = ssl.create_default_context()
+        if alpn:
+            context.set_alpn_protocols([alpn])
+        _contexts[alpn] = context
+    return _contexts[alpn]
+
+
+class _Connection:
+    """One TLS connection to an upstream, (re)opened on demand"""
+
+    alpn = None
+
+    def __init__(self, server, host, port, server_name):
+        self.server = server
+        self.host = host
+        self.port = port
+        self.server_name = server_name
+        self.writer = None
+        self.reader_task = None
+        self.connecting = asyncio.Lock()
+        self.sending = asyncio.Lock()
+        self.slots = asyncio.Semaphore(MAX_IN_FLIGHT)
+
+    async def _connect(self):
+        async with self.connecting:
+            if self.writer is not None and not self.writer.is_closing():
+                return self.writer
+            reader, writer = await asyncio.open_connection(
+                self.host, self.port, ssl=_tls_context(self.alpn), server_hostname=self.server_name)
+            incr('dns_tls_handshakes', upstream=self.server)
+            self.writer = writer
+            self.reader_task = asyncio.create_task(self._read_loop(reader, writer))
+            return writer
+
+    async def _read_loop(self, reader, writer):
+        error = ConnectionLost("connection closed by upstream")
+        try:
+            while await self._read_one(reader):
+                pass
+        except (OSError, UpstreamError, ValueError, asyncio.IncompleteReadError) as e:
+            error = ConnectionLost(f"connection lost ({e or e.__class__.__name__})")
+        finally:
+            writer.close()
+            if self.writer is writer:
+                self.writer = None
+            self._fail_pending(error)
+
+    async def exchange(self, packet):
+        """Send one wire-format query and return the response (with the query's ID)"""
+        async with self.slots:
+            for attempt in range(2):
+                writer = await self._connect()
+                future = asyncio.get_running_loop().create_future()
+                token = None
+                try:
+                    async with self.sending:
+                        if writer.is_closing():
+                            raise ConnectionLost("connection closed before sending")
+                        token = self._send(writer, packet, future)
+                        await writer.drain()
+                    response = await future
+                except ConnectionLost:
+                    # The server may close an idle or busy connection at any time;
+                    # a query that was never answered is safe to resend once
+                    if attempt:
+                        raise
+                    incr('dns_upstream_resends')
+                    continue
+                finally:
+                    self._forget(token, future)
+                return packet[:2] + response[2:]
+
+    async def close(self):
+        writer, self.writer = self.writer, None
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+            try:
+                await self.reader_task
+            except asyncio.CancelledError:
+                pass
+        self.reader_task = None
+        if writer is not None:
+            # Wait for the TLS shutdown, or the transport is left for the GC
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+class _DoTConnection(_Connection):
+    """RFC 7858: length-prefixed messages, answered in any order, matched by ID"""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.pending = {}      # wire ID -> future
+        self.next_id = 0
+
+    def _send(self, writer, packet, future):
+        # Rewrite the ID so concurrent queries never collide on one connection
+        while self.next_id in self.pending:
+            self.next_id = (self.next_id + 1) & 0xFFFF
+        wire_id, self.next_id = self.next_id, (self.next_id + 1) & 0xFFFF
+        self.pending[wire_id] = future
+        writer.write(struct.pack('!HH', len(packet), wire_id) + packet[2:])
+        return wire_id
+
+    def _forget(self, wire_id, future):
+        if self.pending.get(wire_id) is future:
+            del self.pending[wire_id]
+
+    async def _read_one(self, reader):
+        try:
+            length = struct.unpack('!H', await reader.readexactly(2))[0]
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise
+            return False
+        data = await reader.readexactly(length)
+        if len(data) >= 2:
+            future = self.pending.pop(struct.unpack('!H', data[:2])[0], None)
+            if future is not None and not future.done():
+                future.set_result(data)
+        return True
+
+    def _fail_pending(self, error):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+
+class _DoHConnection(_Connection):
+    """RFC 8484 POSTs pipelined over HTTP/1.1; responses arrive in request order"""
+
+    alpn = 'http/1.1'
+
+    def __init__(self, server, host, port, server_name, path):
+        super().__init__(server, host, port, server_name)
+        self.path = path
+        self.waiting = collections.deque()
+
+    def _send(self, writer, packet, future):
+        # ID 0 as RFC 8484 recommends, so HTTP caches can share answers
+        body = b'\0\0' + packet[2:]
+        writer.write((f"POST {self.path} HTTP/1.1\r\n"
+                      f"Host: {self.server_name}\r\n"
+                      f"Content-Type: {CONTENT_TYPE}\r\n"
+                      f"Accept: {CONTENT_TYPE}\r\n"
+                      f"Content-Length: {len(body)}\r\n\r\n").encode('ascii') + body)
+        self.waiting.append(future)
+
+    def _forget(self, token, future):
+        # A query that timed out keeps its place: its response still comes in order
+        pass
+
+    async def _read_one(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            return False
+        parts = status_line.decode('latin-1').split(None, 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise UpstreamError(f"not an HTTP response: {status_line[:40]!r}")
+        status = int(parts[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = b''
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if not size:
+                    break
+                body += chunk[:-2]
+        else:
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+        future = self.waiting.popleft() if self.waiting else None
+        if future is not None and not future.done():
+            if status != 200:
+                future.set_exception(UpstreamError(f"HTTP {status} from {self.server}"))
+            elif not headers.get('content-type', '').startswith(CONTENT_TYPE):
+                future.set_exception(UpstreamError(f"unexpected content type from {self.server}"))
+            else:
+                future.set_result(body)
+        return headers.get('connection', '').lower() != 'close'
+
+    def _fail_pending(self, error):
+        while self.waiting:
+            future = self.waiting.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+
+# Connections belong to the event loop that opened them
+_pools = weakref.WeakKeyDictionary()
+
+
+def _connection(server):
+    pool = _pools.setdefault(asyncio.get_running_loop(), {})
+    if server not in pool:
+        scheme, host, port, path, server_name = parse_upstream(server)
+        if scheme == 'tls':
+            pool[server] = _DoTConnection(server, host, port, server_name)
+        else:
+            pool[server] = _DoHConnection(server, host, port, server_name, path)
+    return pool[server]
+
+
+async def exchange(server, packet):
+    """Send a query to an encrypted upstream over its shared connection"""
+    return await _connection(server).exchange(packet)
+
+
+async def close_upstreams():
+    """Close every connection opened from the running event loop"""
+    pool = _pools.pop(asyncio.get_running_loop(), {})
+    await asyncio.gather(*[conn.close() for conn in pool.values()])
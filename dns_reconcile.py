@@ -0,0 +1,213 @@
+"""
+Diff-based reconcile for Namecheap zones
+Compares the records returned by getHosts with the desired record set and
+only calls setHosts when they actually differ. Writes are serialized per
+domain across runs (see domain_coord), and both the desired records and
+the zone a plan would leave behind pass record_rules before any API call.
+"""
+
+from client_ip import ClientIPError, get_client_ip
+from domain_coord import desired_state, mark_applied, queue_desired, write_lock
+from namecheap_client import HostRecord
+from record_rules import InvalidRecords, check_plan, errors, preflight
+from run_metrics import incr
+
+# Namecheap's "no host records" error from getHosts: an empty zone, not a failure
+NO_RECORDS_ERROR = '2019166'
+
+# "Invalid request IP": ClientIp isn't whitelisted, e.g. a stale cached address
+NOT_WHITELISTED_ERROR = '2050900'
+
+# Old Vercel project targets that must be gone after the switch
+VERCEL_TARGETS = ('cname.vercel-dns.com', '76.76.21.21')
+
+
+def is_vercel_target(address):
+    """True for an A or CNAME value still pointing at the old Vercel project"""
+    address = str(address).lower().rstrip('.')
+    return address in VERCEL_TARGETS or address.endswith('.vercel-dns.com')
+
+
+class Plan:
+    """Minimal change set turning the current zone into the desired one"""
+
+    def __init__(self, add=None, remove=None, modify=None):
+        self.add = add or []         # desired records missing from the zone
+        self.remove = remove or []   # zone records not in the desired set
+        self.modify = modify or []   # (current, desired) pairs changed in place
+
+    @property
+    def is_noop(self):
+        return not (self.add or self.remove or self.modify)
+
+    def lines(self):
+        """Human readable summary, one change per line"""
+        out = []
+        for record in self.remove:
+            out.append(f"  - {record.type:6} {record.name:10} → {record.address}")
+        for record in self.add:
+            out.append(f"  + {record.type:6} {record.name:10} → {record.address}")
+        for old, new in self.modify:
+            change = []
+            if old.key != new.key:
+                change.append(f"{old.address} → {new.address}")
+            if old.ttl != new.ttl:
+                change.append(f"TTL {old.ttl} → {new.ttl}")
+            if old.attrs[1] != new.attrs[1]:
+                change.append(f"MXPref {old.mx_pref} → {new.mx_pref}")
+            out.append(f"  ~ {new.type:6} {new.name:10} {', '.join(change)}")
+        return out
+
+
+def plan_changes(current, desired):
+    """Diff two HostRecord lists into a Plan
+
+    Records with the same name/type/address but a different TTL or MX
+    preference are modifications. Left-over removals and additions on the
+    same name/type are paired up as address changes.
+    """
+    current_by_key = {}
+    for record in current:
+        current_by_key.setdefault(record.key, record)
+    desired_by_key = {}
+    for record in desired:
+        desired_by_key.setdefault(record.key, record)
+
+    plan = Plan()
+    for key, record in desired_by_key.items():
+        old = current_by_key.get(key)
+        if old is None:
+            plan.add.append(record)
+        elif old.attrs != record.attrs:
+            plan.modify.append((old, record))
+    for key, record in current_by_key.items():
+        if key not in desired_by_key:
+            plan.remove.append(record)
+
+    # Pair add/remove on the same (name, type) into in-place modifications
+    paired = set()
+    for record in plan.remove:
+        match = next((r for r in plan.add if id(r) not in paired
+                      and r.key[:2] == record.key[:2]), None)
+        if match is not None:
+            plan.modify.append((record, match))
+            paired.update((id(record), id(match)))
+    plan.add = [r for r in plan.add if id(r) not in paired]
+    plan.remove = [r for r in plan.remove if id(r) not in paired]
+    return plan
+
+
+class ReconcileResult:
+    """Outcome of reconcile(): the plan and whether setHosts was sent
+
+    ``superseded`` means another run queued a newer desired state while
+    this one waited for the lock, and the zone was brought to that one.
+    """
+
+    def __init__(self, plan, changed, api_result=None, superseded=False, warnings=None):
+        self.plan = plan
+        self.changed = changed
+        self.api_result = api_result
+        self.superseded = superseded
+        self.warnings = warnings or []   # record_rules warnings for the desired set
+
+    @property
+    def ok(self):
+        return self.api_result is None or self.api_result.ok
+
+
+def refresh_client_ip(client):
+    """After a whitelist rejection: detect the IP again, bypassing the cache
+
+    Returns True if the client now sends a different ClientIp (worth one
+    more try); the fresh address also replaces the cached one.
+    """
+    try:
+        ip = get_client_ip(refresh=True)
+    except ClientIPError:
+        return False
+    if ip == client.client_ip:
+        return False
+    incr('client_ip_refreshed')
+    client.client_ip = ip
+    return True
+
+
+def fetch_current(client, sld, tld):
+    """Current records via getHosts; an empty zone yields []
+
+    Returns None (with the ApiResult) when the read itself failed. A
+    "not whitelisted" answer is retried once if a fresh IP detection finds
+    a different address. The snapshot is saved to the client's zone
+    history, if it has one.
+    """
+    result = client.get_hosts(sld, tld)
+    if result.has_error(NOT_WHITELISTED_ERROR) and refresh_client_ip(client):
+        result = client.get_hosts(sld, tld)
+    if result.ok:
+        hosts = result.hosts
+    elif result.has_error(NO_RECORDS_ERROR):
+        hosts = []
+    else:
+        return None, result
+    history = getattr(client, 'history', None)
+    if history is not None:
+        history.record(f"{sld}.{tld}", hosts, 'get')
+    return hosts, result
+
+
+def reconcile(client, sld, tld, desired, current=None, force=False):
+    """Bring a zone to the desired record set with the fewest API calls
+
+    ``current`` can be passed when getHosts was already fetched earlier in the
+    run; if it already matches, nothing is locked or written. Otherwise the
+    desired set is queued, the domain's write lock taken, and the zone read
+    again under it, so a write from an overlapping run is never lost. The
+    newest queued set is written with one setHosts (which always replaces
+    the whole zone); a run whose set was already superseded and applied
+    writes nothing.
+
+    Raises record_rules.InvalidRecords, without any API call, when the
+    desired set or the planned zone breaks a rule.
+    """
+    domain = f"{sld}.{tld}"
+    warnings = preflight(desired, domain)
+    if current is not None and not force:
+        plan = plan_changes(current, desired)
+        if plan.is_noop:
+            return ReconcileResult(plan, False, warnings=warnings)
+
+    ticket = queue_desired(domain, [r.to_dict() for r in desired])
+    with write_lock(domain):
+        superseded = False
+        if ticket is not None:
+            newest, records, applied = desired_state(domain)
+            if applied >= ticket:
+                incr('writes_coalesced')
+                return ReconcileResult(Plan(), False, superseded=True, warnings=warnings)
+            if newest != ticket and records is not None:
+                desired = [HostRecord.from_dict(d) for d in records]
+                superseded = True
+                incr('writes_coalesced')
+            ticket = newest
+
+        current, result = fetch_current(client, sld, tld)
+        if current is None:
+            return ReconcileResult(Plan(), False, result, superseded, warnings)
+        plan = plan_changes(current, desired)
+        if plan.is_noop and not force:
+            if ticket is not None:
+                mark_applied(domain, ticket)
+            return ReconcileResult(plan, False, superseded=superseded, warnings=warnings)
+        blocking = errors(check_plan(current, plan, domain, allow_empty=force))
+        if blocking:
+            raise InvalidRecords(blocking, domain)
+
+        result = client.set_hosts(sld, tld, desired)
+        if result.ok:
+            if ticket is not None:
+                mark_applied(domain, ticket, wrote=True)
+            history = getattr(client, 'history', None)
+            if history is not None:
+                history.record(domain, desired, 'set', [line.strip() for line in plan.lines()])
+        return ReconcileResult(plan, True, result, superseded, warnings)
@@ -0,0 +1,376 @@
+"""
+In-process DNS resolver for the DNS scripts
+Builds and parses DNS wire-format packets itself and sends them over UDP
+(falling back to TCP on truncation), so many names can be checked against
+many resolvers at once from a single asyncio event loop instead of forking
+one nslookup per check
+
+Resolvers are given as "ip" or "ip:port" ("[v6]:port" for IPv6), or as
+"tls://host" / "https://host/dns-query" for DNS-over-TLS / DNS-over-HTTPS
+through dns_encrypted (one shared connection per upstream).
+Recursive answers are served from dns_cache while their TTL lasts; pass
+fresh=True for checks that must hit the network.
+"""
+
+import asyncio
+import collections
+import ipaddress
+import random
+import socket
+import struct
+import time
+
+from dns_encrypted import UpstreamError, close_upstreams, exchange, is_encrypted
+from run_metrics import incr
+
+TYPES = {'A': 1, 'NS': 2, 'CNAME': 5, 'SOA': 6, 'MX': 15, 'TXT': 16, 'AAAA': 28}
+TYPE_NAMES = {code: name for name, code in TYPES.items()}
+RCODES = {0: 'NOERROR', 1: 'FORMERR', 2: 'SERVFAIL', 3: 'NXDOMAIN', 4: 'NOTIMP', 5: 'REFUSED'}
+
+# Well-known public recursive resolvers checked alongside the system one
+PUBLIC_RESOLVERS = {
+    'Google': '8.8.8.8',
+    'Cloudflare': '1.1.1.1',
+    'Quad9': '9.9.9.9',
+    'OpenDNS': '208.67.222.222',
+}
+
+DEFAULT_TIMEOUT = 2.0
+
+SOA = collections.namedtuple('SOA', 'mname rname serial refresh retry expire minimum')
+
+
+class DNSError(Exception):
+    """Malformed packet or transport failure"""
+
+
+class Record:
+    """One resource record from an answer or authority section"""
+
+    __slots__ = ('name', 'type', 'ttl', 'data')
+
+    def __init__(self, name, type_, ttl, data):
+        self.name = name
+        self.type = type_
+        self.ttl = ttl
+        self.data = data
+
+    def __repr__(self):
+        return f"Record({self.name!r}, {self.type!r}, {self.ttl}, {self.data!r})"
+
+
+class Answer:
+    """Structured result of one query against one resolver"""
+
+    def __init__(self, resolver, name, qtype, rcode=None, records=None,
+                 authority=None, elapsed=0.0, error=None, authoritative=False, cached=False):
+        self.resolver = resolver
+        self.name = name
+        self.qtype = qtype
+        self.rcode = rcode
+        self.records = records or []
+        self.authority = authority or []
+        self.elapsed = elapsed
+        self.error = error
+        self.authoritative = authoritative
+        self.cached = cached     # served from dns_cache, TTLs counted down
+
+    @property
+    def ok(self):
+        """Got a response with NOERROR (possibly with no records)"""
+        return self.error is None and self.rcode == 'NOERROR'
+
+    def values(self, type_=None):
+        """Data of answer records, optionally filtered by type"""
+        type_ = type_ or self.qtype
+        return [r.data for r in self.records if r.type == type_]
+
+    @property
+    def min_ttl(self):
+        """Smallest TTL in the answer, or None if there are no records"""
+        ttls = [r.ttl for r in self.records]
+        return min(ttls) if ttls else None
+
+    def __repr__(self):
+        status = self.error or self.rcode
+        return f"Answer({self.resolver} {self.name} {self.qtype} {status} {self.records})"
+
+
+def split_server(server, default_port=53):
+    """'1.1.1.1' / '1.1.1.1:5353' / '[::1]:53' -> (host, port)"""
+    if server.startswith('['):
+        host, _, port = server[1:].partition(']')
+        return host, int(port.lstrip(':') or default_port)
+    if server.count(':') == 1:
+        host, port = server.split(':')
+        return host, int(port)
+    return server, default_port
+
+
+def system_resolvers(path='/etc/resolv.conf'):
+    """Nameservers configured for this host"""
+    servers = []
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    servers.append(parts[1])
+    except OSError:
+        pass
+    return servers
+
+
+# --- wire format -----------------------------------------------------------
+
+def encode_name(name):
+    out = bytearray()
+    for label in name.rstrip('.').split('.'):
+        if not label:
+            continue
+        try:
+            raw = label.encode('idna')
+        except UnicodeError as e:
+            raise DNSError(f"Bad label in {name!r}: {e}")
+        if len(raw) > 63:
+            raise DNSError(f"Label too long in {name!r}")
+        out.append(len(raw))
+        out += raw
+    out.append(0)
+    return bytes(out)
+
+
+def build_query(name, qtype, qid=None, recursion=True):
+    """Wire-format query for one question; returns (qid, packet)"""
+    if qid is None:
+        qid = random.getrandbits(16)
+    flags = 0x0100 if recursion else 0
+    header = struct.pack('!HHHHHH', qid, flags, 1, 0, 0, 0)
+    question = encode_name(name) + struct.pack('!HH', TYPES[qtype], 1)
+    return qid, header + question
+
+
+def read_name(data, offset):
+    """Decode a possibly compressed name; returns (name, next offset)"""
+    labels = []
+    jumped = False
+    end = offset
+    hops = 0
+    while True:
+        if offset >= len(data):
+            raise DNSError("Name runs past end of packet")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if offset + 1 >= len(data):
+                raise DNSError("Truncated compression pointer")
+            pointer = ((length & 0x3F) << 8) | data[offset + 1]
+            if not jumped:
+                end = offset + 2
+            jumped = True
+            hops += 1
+            if hops > 64:
+                raise DNSError("Compression loop")
+            offset = pointer
+        elif length == 0:
+            if not jumped:
+                end = offset + 1
+            break
+        else:
+            offset += 1
+            labels.append(data[offset:offset + length].decode('ascii', 'replace'))
+            offset += length
+    return '.'.join(labels).lower(), end
+
+
+def _decode_rdata(data, offset, rdlength, type_):
+    rdata = data[offset:offset + rdlength]
+    if type_ == 'A':
+        return socket.inet_ntop(socket.AF_INET, rdata)
+    if type_ == 'AAAA':
+        return socket.inet_ntop(socket.AF_INET6, rdata)
+    if type_ in ('CNAME', 'NS'):
+        return read_name(data, offset)[0]
+    if type_ == 'MX':
+        pref = struct.unpack('!H', rdata[:2])[0]
+        return f"{pref} {read_name(data, offset + 2)[0]}"
+    if type_ == 'TXT':
+        parts, i = [], 0
+        while i < len(rdata):
+            length = rdata[i]
+            parts.append(rdata[i + 1:i + 1 + length].decode('utf-8', 'replace'))
+            i += 1 + length
+        return ''.join(parts)
+    if type_ == 'SOA':
+        mname, pos = read_name(data, offset)
+        rname, pos = read_name(data, pos)
+        return SOA(mname, rname, *struct.unpack('!IIIII', data[pos:pos + 20]))
+    return rdata.hex()
+
+
+def _read_records(data, offset, count):
+    records = []
+    for _ in range(count):
+        name, offset = read_name(data, offset)
+        if offset + 10 > len(data):
+            raise DNSError("Truncated resource record")
+        code, _, ttl, rdlength = struct.unpack('!HHIH', data[offset:offset + 10])
+        offset += 10
+        type_ = TYPE_NAMES.get(code, str(code))
+        records.append(Record(name, type_, ttl, _decode_rdata(data, offset, rdlength, type_)))
+        offset += rdlength
+    return records, offset
+
+
+def parse_response(data):
+    """Decode a response packet into a dict
+
+    Keys: id, rcode, truncated, authoritative, question, answers, authority.
+    """
+    if len(data) < 12:
+        raise DNSError("Packet shorter than DNS header")
+    qid, flags, qdcount, ancount, nscount, _ = struct.unpack('!HHHHHH', data[:12])
+    offset = 12
+    question = None
+    try:
+        for _ in range(qdcount):
+            qname, offset = read_name(data, offset)
+            qcode = struct.unpack('!H', data[offset:offset + 2])[0]
+            question = (qname, TYPE_NAMES.get(qcode, str(qcode)))
+            offset += 4
+        answers, offset = _read_records(data, offset, ancount)
+        authority, offset = _read_records(data, offset, nscount)
+    except (struct.error, IndexError, ValueError) as e:
+        raise DNSError(f"Malformed packet: {e}")
+    return {
+        'id': qid,
+        'rcode': RCODES.get(flags & 0x000F, str(flags & 0x000F)),
+        'truncated': bool(flags & 0x0200),
+        'authoritative': bool(flags & 0x0400),
+        'question': question,
+        'answers': answers,
+        'authority': authority,
+    }
+
+
+# --- transports ------------------------------------------------------------
+
+class _UDPQuery(asyncio.DatagramProtocol):
+    def __init__(self, qid, future):
+        self.qid = qid
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if len(data) >= 2 and struct.unpack('!H', data[:2])[0] == self.qid:
+            if not self.future.done():
+                self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+async def _udp_exchange(host, port, qid, packet):
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    family = socket.AF_INET6 if ipaddress.ip_address(host).version == 6 else socket.AF_INET
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _UDPQuery(qid, future), remote_addr=(host, port), family=family)
+    try:
+        transport.sendto(packet)
+        return await future
+    finally:
+        transport.close()
+
+
+async def _tcp_exchange(host, port, packet):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(struct.pack('!H', len(packet)) + packet)
+        await writer.drain()
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+        return await reader.readexactly(length)
+    finally:
+        writer.close()
+
+
+def _cache(recursion):
+    if not recursion:
+        return None
+    from dns_cache import shared_cache   # dns_cache imports this module
+    return shared_cache()
+
+
+async def query(server, name, qtype='A', timeout=DEFAULT_TIMEOUT, recursion=True, tcp=False,
+                fresh=False):
+    """Ask one server one question; never raises, errors end up in Answer.error
+
+    Recursive queries are answered from the shared cache when possible;
+    ``fresh`` always asks the server (and refreshes the cache).
+    """
+    cache = _cache(recursion)
+    if cache is not None and not fresh:
+        cached = cache.get(server, name, qtype)
+        if cached is not None:
+            return cached
+    started = time.perf_counter()
+    answer = Answer(server, name.rstrip('.').lower(), qtype)
+    incr('dns_queries', qtype=qtype)
+    try:
+        qid, packet = build_query(name, qtype, recursion=recursion)
+        if is_encrypted(server):
+            raw = await asyncio.wait_for(exchange(server, packet), timeout)
+        elif tcp:
+            raw = await asyncio.wait_for(_tcp_exchange(*split_server(server), packet), timeout)
+        else:
+            raw = await asyncio.wait_for(_udp_exchange(*split_server(server), qid, packet), timeout)
+        response = parse_response(raw)
+        if response['truncated'] and not tcp and not is_encrypted(server):
+            remaining = max(timeout - (time.perf_counter() - started), 0.1)
+            raw = await asyncio.wait_for(_tcp_exchange(*split_server(server), packet), remaining)
+            response = parse_response(raw)
+        if response['id'] != qid:
+            raise DNSError("Response ID mismatch")
+        answer.rcode = response['rcode']
+        answer.records = response['answers']
+        answer.authority = response['authority']
+        answer.authoritative = response['authoritative']
+    except asyncio.TimeoutError:
+        answer.error = 'timeout'
+    except (OSError, DNSError, UpstreamError, ValueError, asyncio.IncompleteReadError) as e:
+        answer.error = str(e) or e.__class__.__name__
+    if answer.error:
+        incr('dns_query_errors')
+    answer.elapsed = time.perf_counter() - started
+    if cache is not None:
+        cache.put(answer)
+    return answer
+
+
+async def query_many(questions, servers, timeout=DEFAULT_TIMEOUT, recursion=True, fresh=False):
+    """Every (name, qtype) question against every server, all in flight at once"""
+    tasks = [query(server, name, qtype, timeout, recursion, fresh=fresh)
+             for server in servers for name, qtype in questions]
+    return await asyncio.gather(*tasks)
+
+
+def run(coro):
+    """asyncio.run() that also closes the encrypted upstream connections it opened"""
+    async def closing():
+        try:
+            return await coro
+        finally:
+            await close_upstreams()
+    return asyncio.run(closing())
+
+
+def resolve_many(questions, servers, timeout=DEFAULT_TIMEOUT, recursion=True, fresh=False):
+    """Blocking wrapper around query_many for the synchronous scripts"""
+    return run(query_many(questions, servers, timeout, recursion, fresh))
+
+
+def resolve_each(jobs, timeout=DEFAULT_TIMEOUT, recursion=True, fresh=False):
+    """Blocking: run explicit (server, name, qtype) jobs concurrently"""
+    async def jobs_done():
+        return await asyncio.gather(*[query(server, name, qtype, timeout, recursion, fresh=fresh)
+                                      for server, name, qtype in jobs])
+    return run(jobs_done())
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Local DNS stand-in: plain UDP/TCP, DNS-over-TLS and DNS-over-HTTPS
+Answers A, AAAA, CNAME, MX, TXT and NS questions for the records of one or
+more zone files (default: zones/lech.world.zone), NXDOMAIN for anything
+else, so the resolver backends can be exercised without a public
+upstream. UDP answers that don't fit in 512 bytes come back truncated (TC
+set, no records) and are served in full over TCP on the same port, like
+a real server. DoT answers queries of one connection concurrently, in
+whatever order they finish; DoH keeps HTTP/1.1 connections alive and
+accepts pipelined POST and GET (?dns=) requests. --latency adds seconds
+to every answer.
+
+Without --cert/--key a throwaway self-signed certificate for localhost and
+127.0.0.1 is generated with openssl; point clients at it with SSL_CERT_FILE.
+
+Usage: python3 dns_stub_server.py [--dns-port 8053] [--dot-port 8853] [--doh-port 8443]
+                                  [--zone zones/lech.world.zone ...] [--latency 0.05]
+Then resolve through 127.0.0.1:8053, tls://127.0.0.1:8853 or
+https://127.0.0.1:8443/dns-query
+"""
+
+import argparse
+import base64
+import os
+import random
+import socket
+import socketserver
+import ssl
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from dns_resolver import TYPE_NAMES, TYPES, encode_name, read_name
+from zone_file import ZONES_DIR, compile_zone
+
+CONTENT_TYPE = 'application/dns-message'
+UDP_PAYLOAD = 512    # classic limit without EDNS0
+
+
+class StubZones:
+    """(fqdn, type) -> [(ttl, rdata)] for every record of the loaded zones"""
+
+    def __init__(self, latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.records = {}
+        self.domains = []
+        self.queries = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def add_zone(self, path):
+        zone = compile_zone(path, use_cache=False)
+        self.domains.append(zone.domain)
+        for record in zone.records:
+            fqdn = zone.domain if record.name == '@' else f"{record.name}.{zone.domain}"
+            self.records.setdefault((fqdn.lower(), record.type), []).append(
+                (record.ttl, self._rdata(record)))
+
+    @staticmethod
+    def _rdata(record):
+        if record.type == 'A':
+            return socket.inet_pton(socket.AF_INET, record.address)
+        if record.type == 'AAAA':
+            return socket.inet_pton(socket.AF_INET6, record.address)
+        if record.type == 'MX':
+            return struct.pack('!H', record.mx_pref) + encode_name(record.address)
+        if record.type == 'TXT':
+            raw = record.address.encode('utf-8')
+            return b''.join(bytes([len(raw[i:i + 255])]) + raw[i:i + 255]
+                            for i in range(0, len(raw), 255))
+        return encode_name(record.address)
+
+    def count(self, what):
+        with self.lock:
+            setattr(self, what, getattr(self, what) + 1)
+
+    def answer(self, query, max_size=None):
+        """Response packet for one query packet, truncated if over ``max_size`` bytes"""
+        self.count('queries')
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+        qid, flags = struct.unpack('!HH', query[:4])
+        name, end = read_name(query, 12)
+        code = struct.unpack('!H', query[end:end + 2])[0]
+        question = query[12:end + 4]
+        rrsets = []
+        if TYPE_NAMES.get(code) != 'CNAME' and (name, 'CNAME') in self.records:
+            rrsets.append(('CNAME', self.records[(name, 'CNAME')]))
+        elif (name, TYPE_NAMES.get(code)) in self.records:
+            rrsets.append((TYPE_NAMES[code], self.records[(name, TYPE_NAMES[code])]))
+        known = any(key[0] == name for key in self.records)
+        rcode = 0 if known else 3
+        answers = b''
+        count = 0
+        for type_, rows in rrsets:
+            for ttl, rdata in rows:
+                # 0xC00C: compression pointer to the question name
+                answers += struct.pack('!HHHIH', 0xC00C, TYPES[type_], 1, ttl, len(rdata)) + rdata
+                count += 1
+        # QR, RA, RD copied from the query, rcode
+        flags = 0x8080 | (flags & 0x0100) | rcode
+        if max_size and 12 + len(question) + len(answers) > max_size:
+            # TC: the client is expected to ask again over TCP
+            return struct.pack('!HHHHHH', qid, flags | 0x0200, 1, 0, 0, 0) + question
+        header = struct.pack('!HHHHHH', qid, flags, 1, count, 0, 0)
+        return header + question + answers
+
+
+class _UDPHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        try:
+            response = self.server.zones.answer(data, UDP_PAYLOAD)
+        except (ValueError, IndexError, struct.error):
+            return
+        sock.sendto(response, self.client_address)
+
+
+class _UDPServer(socketserver.ThreadingUDPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, zones):
+        super().__init__(address, _UDPHandler)
+        self.zones = zones
+
+
+class _StreamHandler(socketserver.BaseRequestHandler):
+    """One TCP or DoT connection: read length-prefixed queries, answer each on its own thread"""
+
+    def handle(self):
+        zones = self.server.zones
+        zones.count('connections')
+        send_lock = threading.Lock()
+
+        def respond(query):
+            try:
+                response = zones.answer(query)
+            except (ValueError, IndexError, struct.error):
+                return
+            with send_lock:
+                try:
+                    self.request.sendall(struct.pack('!H', len(response)) + response)
+                except OSError:
+                    pass
+
+        stream = self.request.makefile('rb')
+        while True:
+            prefix = stream.read(2)
+            if len(prefix) < 2:
+                break
+            query = stream.read(struct.unpack('!H', prefix)[0])
+            threading.Thread(target=respond, args=(query,), daemon=True).start()
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, zones):
+        super().__init__(address, _StreamHandler)
+        self.zones = zones
+
+
+class _DoTServer(_TCPServer):
+    def __init__(self, address, zones, context):
+        super().__init__(address, zones)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+
+class _DoHHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.zones.count('connections')
+
+    def _reply(self, query):
+        try:
+            body = self.server.zones.answer(query)
+        except (ValueError, IndexError, struct.error):
+            self.send_error(400, "malformed DNS message")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'max-age=60')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/dns-query':
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        self._reply(self.rfile.read(length))
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        values = parse_qs(parts.query).get('dns')
+        if parts.path != '/dns-query' or not values:
+            self.send_error(404)
+            return
+        encoded = values[0]
+        self._reply(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+
+
+class _DoHServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, zones, context):
+        super().__init__(address, _DoHHandler)
+        self.zones = zones
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+
+def self_signed_cert(directory):
+    """Generate a localhost certificate with openssl; returns (cert, key) paths"""
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '2',
+                    '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1',
+                    '-keyout', key, '-out', cert],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def plain_servers(zones, host='127.0.0.1', port=0):
+    """UDP and TCP servers for ``zones`` on one port (0: pick a free one); not started"""
+    udp = _UDPServer((host, port), zones)
+    tcp = _TCPServer((host, udp.server_address[1]), zones)
+    return udp, tcp
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local DNS / DoT / DoH stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--dns-port', type=int, default=8053, help="plain UDP+TCP port, 0 to disable")
+    parser.add_argument('--dot-port', type=int, default=8853, help="0 to disable DoT")
+    parser.add_argument('--doh-port', type=int, default=8443, help="0 to disable DoH")
+    parser.add_argument('--zone', action='append', help="zone file to serve (repeatable)")
+    parser.add_argument('--latency', type=float, default=0.0, help="added seconds per answer")
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="extra random seconds per answer (DoT answers then arrive out of order)")
+    parser.add_argument('--cert', help="PEM certificate (default: generate a self-signed one)")
+    parser.add_argument('--key', help="PEM private key for --cert")
+    args = parser.parse_args()
+
+    zones = StubZones(args.latency, args.jitter)
+    for path in args.zone or [os.path.join(ZONES_DIR, 'lech.world.zone')]:
+        zones.add_zone(path)
+
+    cert, key = args.cert, args.key
+    if not cert:
+        cert, key = self_signed_cert(tempfile.mkdtemp(prefix='dns-stub-'))
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    context.set_alpn_protocols(['http/1.1', 'dot'])
+
+    servers = []
+    if args.dns_port:
+        servers.extend(plain_servers(zones, args.host, args.dns_port))
+        print(f"📡 DNS on {args.host}:{args.dns_port} (UDP, TCP)")
+    if args.dot_port:
+        servers.append(_DoTServer((args.host, args.dot_port), zones, context))
+        print(f"🔐 DoT on tls://{args.host}:{args.dot_port}")
+    if args.doh_port:
+        servers.append(_DoHServer((args.host, args.doh_port), zones, context))
+        print(f"🔐 DoH on https://{args.host}:{args.doh_port}/dns-query")
+    print(f"🧪 Serving {', '.join(zones.domains)}; export SSL_CERT_FILE={cert}")
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print(f"\n👋 Stopped after {zones.queries} queries on {zones.connections} connections")
+        for server in servers:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
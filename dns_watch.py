@@ -0,0 +1,121 @@
+"""
+Adaptive DNS propagation watcher
+Polls every (resolver, question) pair until each one returns the expected
+answer or a deadline passes. The wait between rounds backs off
+exponentially and is stretched to the TTL of the stale answers still cached,
+since a resolver can't change its answer before that TTL runs out.
+"""
+
+import time
+
+from dns_resolver import DEFAULT_TIMEOUT, resolve_each
+
+INITIAL_INTERVAL = 2.0
+MAX_INTERVAL = 300.0
+
+# Consecutive failed queries after which a resolver is given up on
+MAX_FAILURES = 3
+
+
+class WatchResult:
+    """Outcome of watch(): converged flag, elapsed seconds and what is still pending"""
+
+    def __init__(self, converged, elapsed, rounds, pending, answers, unreachable=None):
+        self.converged = converged
+        self.elapsed = elapsed
+        self.rounds = rounds
+        self.pending = pending   # [(resolver, name, qtype)] never matched
+        self.answers = answers   # last Answer seen per (resolver, name, qtype)
+        self.unreachable = unreachable or []   # pairs dropped after MAX_FAILURES
+
+
+def next_interval(round_no, stale_ttls, remaining,
+                  initial=INITIAL_INTERVAL, max_interval=MAX_INTERVAL):
+    """Seconds to wait before the next round
+
+    Exponential backoff from ``initial``, raised to the smallest TTL among
+    stale answers (no point asking before the cache expires), capped by
+    ``max_interval`` and by the time left before the deadline.
+    """
+    wait = initial * (2 ** round_no)
+    if stale_ttls:
+        wait = max(wait, min(stale_ttls) + 1)
+    return max(0.0, min(wait, max_interval, remaining))
+
+
+def print_event(event):
+    """Default progress printer for watch()"""
+    kind = event['event']
+    if kind == 'round':
+        print(f"   ⏳ round {event['round']}: {event['converged']}/{event['total']} converged"
+              f", next check in {event['next_in']:.0f}s")
+    elif kind == 'converged':
+        print(f"   ✅ {event['resolver']:16} {event['name']} after {event['elapsed']:.1f}s")
+    elif kind == 'unreachable':
+        print(f"   ⚠️  {event['resolver']:16} {event['name']} not answering ({event['error']}), skipped")
+    elif kind == 'done':
+        print(f"\n✅ Propagation complete in {event['elapsed']:.1f}s ({event['rounds']} rounds)")
+    elif kind == 'deadline':
+        print(f"\n⏳ Still propagating after {event['elapsed']:.0f}s "
+              f"({event['pending']} resolver answers outstanding)")
+
+
+def watch(questions, resolvers, matches, deadline=600.0, timeout=DEFAULT_TIMEOUT,
+          initial=INITIAL_INTERVAL, max_interval=MAX_INTERVAL, on_event=print_event):
+    """Poll until every resolver answers every question as expected
+
+    ``matches(answer)`` decides whether one Answer is the expected one.
+    Pairs that have converged are not queried again, and pairs whose
+    resolver fails MAX_FAILURES times in a row are dropped as unreachable.
+    Progress is reported through ``on_event`` as dicts with an 'event' key.
+    """
+    started = time.monotonic()
+    pending = {(resolver, name, qtype) for resolver in resolvers for name, qtype in questions}
+    total = len(pending)
+    last = {}
+    failures = {}
+    unreachable = []
+    round_no = 0
+
+    while True:
+        jobs = sorted(pending)
+        for key, answer in zip(jobs, resolve_each(jobs, timeout, fresh=True)):
+            last[key] = answer
+            if answer.error:
+                failures[key] = failures.get(key, 0) + 1
+                if failures[key] >= MAX_FAILURES:
+                    pending.discard(key)
+                    unreachable.append(key)
+                    if on_event:
+                        on_event({'event': 'unreachable', 'resolver': key[0],
+                                  'name': answer.name, 'error': answer.error})
+                continue
+            failures[key] = 0
+            if answer.ok and matches(answer):
+                pending.discard(key)
+                if on_event:
+                    on_event({'event': 'converged', 'resolver': key[0],
+                              'name': answer.name, 'qtype': answer.qtype,
+                              'elapsed': time.monotonic() - started})
+        elapsed = time.monotonic() - started
+        round_no += 1
+
+        if not pending:
+            converged = len(unreachable) < total
+            if on_event and converged:
+                on_event({'event': 'done', 'elapsed': elapsed, 'rounds': round_no})
+            return WatchResult(converged, elapsed, round_no, [], last, unreachable)
+
+        remaining = deadline - elapsed
+        if remaining <= 0:
+            if on_event:
+                on_event({'event': 'deadline', 'elapsed': elapsed, 'pending': len(pending)})
+            return WatchResult(False, elapsed, round_no, sorted(pending), last, unreachable)
+
+        stale_ttls = [last[key].min_ttl for key in pending
+                      if key in last and last[key].min_ttl is not None]
+        wait = next_interval(round_no - 1, stale_ttls, remaining, initial, max_interval)
+        if on_event:
+            on_event({'event': 'round', 'round': round_no, 'converged': total - len(pending),
+                      'total': total, 'next_in': wait})
+        time.sleep(wait)
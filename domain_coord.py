@@ -0,0 +1,242 @@
+"""
+Coordination between overlapping DNS runs on the same machine
+Two cron jobs or CI runs updating the same domain used to both read the
+zone, both call setHosts, and the later write silently won. Three pieces
+prevent that, all keyed by domain and backed by flock()ed files in one
+directory, so they work across threads and processes alike:
+
+- write_lock(): one writer per domain at a time.
+- queue_desired() / desired_state(): each writer records the record set
+  it wants before waiting for the lock. Whoever gets the lock applies the
+  newest queued set, so a burst of deploys collapses into one final write
+  and the runs whose set was superseded skip theirs.
+- SingleFlight / shared_fetch(): identical getHosts calls in flight at the
+  same time share one API call (threads in-process, a result file across
+  processes). A result is only shared with callers that were waiting for
+  it and never across a write to the zone.
+
+Files live in $DNS_LOCK_DIR, $XDG_RUNTIME_DIR/lechworld-dns or
+~/.cache/lechworld/locks; DNS_LOCK_DIR=off turns coordination off. So
+does a platform without fcntl (Windows): every function then behaves as
+if only this run existed, and SingleFlight still shares in-process calls.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+from run_metrics import METRICS, incr
+
+try:
+    import fcntl
+except ImportError:     # Windows: no flock(), run uncoordinated
+    fcntl = None
+
+LOCK_ENV = 'DNS_LOCK_DIR'
+LOCK_TIMEOUT = 300.0    # seconds to wait for another run's write
+POLL_INTERVAL = 0.05
+
+
+class LockTimeout(Exception):
+    """Another run held the lock for longer than the timeout"""
+
+
+def lock_dir():
+    """Directory for lock and state files, or None when coordination is off"""
+    if fcntl is None:
+        return None
+    configured = os.getenv(LOCK_ENV)
+    if configured:
+        return None if configured.lower() in ('off', 'none', '0') else configured
+    runtime = os.getenv('XDG_RUNTIME_DIR')
+    if runtime:
+        return os.path.join(runtime, 'lechworld-dns')
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'lechworld', 'locks')
+
+
+def _base(domain, directory=None):
+    directory = directory or lock_dir()
+    if directory is None:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, domain.lower().rstrip('.'))
+
+
+@contextlib.contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT):
+    """Exclusive flock on ``path``, polling until ``timeout``
+
+    Each call opens its own descriptor, so threads of one process exclude
+    each other just like separate processes do.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    started = time.monotonic()
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() - started >= timeout:
+                    raise LockTimeout(f"{os.path.basename(path)} still held after {timeout:.0f}s")
+                time.sleep(POLL_INTERVAL)
+        waited = time.monotonic() - started
+        if waited >= POLL_INTERVAL:
+            METRICS.observe('lock_wait', waited)
+        yield
+    finally:
+        os.close(fd)    # closing the last descriptor releases the lock
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def _state(base):
+    """Read-modify-write the domain's state file under its own short lock"""
+    with file_lock(base + '.state.lock'):
+        state = _read_json(base + '.json')
+        yield state
+        _write_atomic(base + '.json', json.dumps(state).encode('utf-8'))
+
+
+@contextlib.contextmanager
+def write_lock(domain, timeout=LOCK_TIMEOUT, directory=None):
+    """Hold the per-domain write lock (no-op when coordination is off)"""
+    base = _base(domain, directory)
+    if base is None:
+        yield
+        return
+    with file_lock(base + '.write.lock', timeout):
+        yield
+
+
+def queue_desired(domain, records, directory=None):
+    """Record the set this run wants to write; returns its ticket (None when off)
+
+    ``records`` is any JSON-serializable list. A later call for the same
+    domain replaces it: only the newest desired state is ever written.
+    """
+    base = _base(domain, directory)
+    if base is None:
+        return None
+    with _state(base) as state:
+        ticket = max(time.time_ns(), state.get('pending_seq', 0) + 1)
+        state['pending_seq'] = ticket
+        state['pending'] = records
+    return ticket
+
+
+def desired_state(domain, directory=None):
+    """(newest ticket, its records, newest applied ticket) for a domain"""
+    base = _base(domain, directory)
+    state = _read_json(base + '.json') if base else {}
+    return state.get('pending_seq', 0), state.get('pending'), state.get('applied_seq', 0)
+
+
+def mark_applied(domain, ticket, wrote=False, directory=None):
+    """The zone now holds the state queued as ``ticket``; call under write_lock()
+
+    ``ticket`` None records an unqueued write (e.g. a rollback), which only
+    stops older getHosts responses from being shared.
+    """
+    base = _base(domain, directory)
+    if base is None:
+        return
+    with _state(base) as state:
+        if ticket is not None:
+            state['applied_seq'] = max(ticket, state.get('applied_seq', 0))
+        if wrote:
+            state['last_write'] = time.time()
+
+
+def last_write(domain, directory=None):
+    """Wall-clock time the last coordinated setHosts for a domain finished"""
+    base = _base(domain, directory)
+    return _read_json(base + '.json').get('last_write', 0.0) if base else 0.0
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Concurrent calls with the same key run once; every caller gets the result"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if not leader:
+            incr('singleflight_shared', scope='thread')
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+
+def shared_fetch(domain, fetch, decode, timeout=LOCK_TIMEOUT, directory=None):
+    """Run ``fetch()`` (returning an object with ``.raw`` bytes) at most once per wave
+
+    Callers queue on a per-domain lock. The first one calls the API and
+    leaves the raw response behind; callers that were already waiting
+    when it finished decode that instead of calling again. Responses that
+    started before the last coordinated write are never reused.
+    """
+    base = _base(domain, directory)
+    if base is None:
+        return fetch()
+    requested = time.time()
+    with file_lock(base + '.read.lock', timeout):
+        try:
+            with open(base + '.hosts', 'rb') as f:
+                header = json.loads(f.readline())
+                if header['finished'] >= requested and header['started'] >= last_write(domain, directory):
+                    incr('singleflight_shared', scope='process')
+                    return decode(f.read())
+        except (OSError, ValueError, KeyError):
+            pass
+        started = time.time()
+        result = fetch()
+        header = json.dumps({'started': started, 'finished': time.time()}).encode('utf-8')
+        try:
+            _write_atomic(base + '.hosts', header + b'\n' + result.raw)
+        except OSError:
+            pass
+        return result
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+HTTPS edge probe for the GitHub Pages front ends
+Opens HTTPS connections to every GitHub Pages IP and to whatever www
+currently resolves to, all at once, sending SNI and Host for our domain.
+Each sample times the TCP connect, the TLS handshake and the time to the
+first response byte, and checks that the certificate is valid for the
+domain. Repeated samples are summarized as percentiles per edge, so right
+after a DNS switch it takes seconds to see whether the certificate has
+been issued and how each edge performs.
+
+Usage: python3 edge_probe.py [--host www.lech.world] [--samples 5]
+                             [--ip IP ...] [--port 443] [--cafile ca.pem] [--json]
+"""
+
+import argparse
+import json
+import socket
+import ssl
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from run_metrics import incr, percentile, span
+
+DOMAIN = 'lech.world'
+HOST = f'www.{DOMAIN}'
+
+PROBE_TIMEOUT = 5.0
+USER_AGENT = 'lechworld-edge-probe/1.0'
+
+
+class Sample:
+    """Timings (seconds) and outcome of one HTTPS request to one edge"""
+
+    __slots__ = ('connect', 'tls', 'ttfb', 'status', 'cert_ok', 'cert_error',
+                 'cert_expires', 'error')
+
+    def __init__(self):
+        self.connect = self.tls = self.ttfb = None
+        self.status = None
+        self.cert_ok = None
+        self.cert_error = None
+        self.cert_expires = None
+        self.error = None
+
+
+def _context(cafile=None):
+    context = ssl.create_default_context(cafile=cafile)
+    context.set_alpn_protocols(['http/1.1'])
+    return context
+
+
+def probe_once(ip, host=HOST, port=443, path='/', timeout=PROBE_TIMEOUT, context=None):
+    """One connect + handshake + GET against ``ip``, presenting ``host`` via SNI"""
+    sample = Sample()
+    context = context or _context()
+    started = time.perf_counter()
+    try:
+        raw = socket.create_connection((ip, port), timeout=timeout)
+    except OSError as e:
+        sample.error = f"connect: {e}"
+        return sample
+    sample.connect = time.perf_counter() - started
+
+    try:
+        handshake = time.perf_counter()
+        try:
+            conn = context.wrap_socket(raw, server_hostname=host)
+        except ssl.SSLCertVerificationError as e:
+            sample.cert_ok = False
+            sample.cert_error = e.verify_message or str(e)
+            sample.error = "certificate"
+            return sample
+        sample.tls = time.perf_counter() - handshake
+        sample.cert_ok = True
+        not_after = (conn.getpeercert() or {}).get('notAfter')
+        if not_after:
+            sample.cert_expires = ssl.cert_time_to_seconds(not_after)
+
+        with conn:
+            request = (f"HEAD {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: {USER_AGENT}\r\n"
+                       f"Connection: close\r\n\r\n").encode('ascii')
+            sent = time.perf_counter()
+            conn.sendall(request)
+            first = conn.recv(1)
+            if not first:
+                sample.error = "closed before responding"
+                return sample
+            sample.ttfb = time.perf_counter() - sent
+            head = first + conn.recv(256)
+            status_line = head.split(b'\r\n', 1)[0].split()
+            if len(status_line) >= 2 and status_line[1].isdigit():
+                sample.status = int(status_line[1])
+    except (OSError, ssl.SSLError) as e:
+        sample.error = str(e) or e.__class__.__name__
+    finally:
+        raw.close()
+    return sample
+
+
+def probe_edge(ip, samples=5, host=HOST, port=443, path='/', timeout=PROBE_TIMEOUT, context=None):
+    """``samples`` sequential probes of one edge (fresh connection each time)"""
+    results = []
+    for _ in range(samples):
+        sample = probe_once(ip, host, port, path, timeout, context)
+        incr('edge_probes', result='ok' if sample.error is None else 'error')
+        results.append(sample)
+    return results
+
+
+def summarize(label, ip, results):
+    """Percentiles per phase (ms) plus status codes and certificate state"""
+    def stats(values):
+        values = [v * 1000 for v in values if v is not None]
+        if not values:
+            return None
+        return {'p50': round(percentile(values, 50), 2), 'p95': round(percentile(values, 95), 2),
+                'max': round(max(values), 2)}
+
+    cert_errors = sorted({r.cert_error for r in results if r.cert_error})
+    expires = [r.cert_expires for r in results if r.cert_expires]
+    return {
+        'edge': label,
+        'ip': ip,
+        'samples': len(results),
+        'ok': sum(1 for r in results if r.error is None),
+        'connect_ms': stats(r.connect for r in results),
+        'tls_ms': stats(r.tls for r in results),
+        'ttfb_ms': stats(r.ttfb for r in results),
+        'statuses': sorted({r.status for r in results if r.status is not None}),
+        'cert_ok': (all(r.cert_ok for r in results if r.cert_ok is not None)
+                    if any(r.cert_ok is not None for r in results) else None),
+        'cert_errors': cert_errors,
+        'cert_days_left': round((min(expires) - time.time()) / 86400, 1) if expires else None,
+        'errors': sorted({r.error for r in results if r.error and r.error != 'certificate'}),
+    }
+
+
+def resolve_targets(host=HOST, ips=None):
+    """[(label, ip)]: the zone's apex A records plus the current answers for ``host``"""
+    if ips:
+        return [(ip, ip) for ip in ips]
+    from zone_file import desired_records
+    apex = [r.address for r in desired_records(DOMAIN) if r.name == '@' and r.type == 'A']
+    targets = [(f"github-{ip.split('.')[2]}", ip) for ip in apex]
+    from dns_resolver import PUBLIC_RESOLVERS, resolve_many, system_resolvers
+    resolvers = system_resolvers()[:1] or [PUBLIC_RESOLVERS['Cloudflare']]
+    for answer in resolve_many([(host, 'A')], resolvers):
+        for ip in answer.values('A'):
+            if ip not in [t[1] for t in targets]:
+                targets.append((f"{host} → {ip}", ip))
+    return targets
+
+
+def probe_edges(targets, samples=5, host=HOST, port=443, path='/',
+                timeout=PROBE_TIMEOUT, cafile=None):
+    """Probe every (label, ip) target concurrently; returns one summary per target"""
+    context = _context(cafile)
+    with span('edge_probe'):
+        with ThreadPoolExecutor(max_workers=max(len(targets), 1)) as pool:
+            futures = [pool.submit(probe_edge, ip, samples, host, port, path, timeout, context)
+                       for _, ip in targets]
+            return [summarize(label, ip, future.result())
+                    for (label, ip), future in zip(targets, futures)]
+
+
+def print_summary(summary):
+    def fmt(stats):
+        return f"{stats['p50']:7.1f}/{stats['p95']:7.1f}" if stats else "      -/      -"
+
+    if summary['cert_ok']:
+        days = summary['cert_days_left']
+        cert = f"🔒 valid ({days:.0f} days left)" if days is not None else "🔒 valid"
+    elif summary['cert_ok'] is False:
+        cert = f"❌ {'; '.join(summary['cert_errors'])}"
+    else:
+        cert = "❓ no handshake"
+    icon = '✅' if summary['ok'] == summary['samples'] else '⚠️ ' if summary['ok'] else '❌'
+    statuses = ','.join(map(str, summary['statuses'])) or '-'
+    print(f"{icon} {summary['edge']:32} {summary['ok']}/{summary['samples']}  "
+          f"connect {fmt(summary['connect_ms'])}  tls {fmt(summary['tls_ms'])}  "
+          f"ttfb {fmt(summary['ttfb_ms'])}  HTTP {statuses}  {cert}")
+    for error in summary['errors']:
+        print(f"     {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe HTTPS reachability and latency of each edge")
+    parser.add_argument('--host', default=HOST, help="SNI / Host header (default %(default)s)")
+    parser.add_argument('--ip', action='append', help="probe only these IPs (repeatable)")
+    parser.add_argument('--port', type=int, default=443)
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--samples', type=int, default=5, help="requests per edge")
+    parser.add_argument('--timeout', type=float, default=PROBE_TIMEOUT)
+    parser.add_argument('--cafile', help="trust this CA bundle instead of the system one")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    targets = resolve_targets(args.host, args.ip)
+    summaries = probe_edges(targets, args.samples, args.host, args.port, args.path,
+                            args.timeout, args.cafile)
+
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        print(f"🌍 {args.host}: {len(targets)} edges × {args.samples} samples "
+              f"({datetime.now(timezone.utc):%H:%M:%S} UTC), p50/p95 in ms")
+        for summary in summaries:
+            print_summary(summary)
+    sys.exit(0 if all(s['cert_ok'] and s['ok'] for s in summaries) else 1)
+
+
+if __name__ == "__main__":
+    main()
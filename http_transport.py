@@ -0,0 +1,234 @@
+"""
+Minimal pooled HTTP transport for the DNS scripts
+The default transport uses only the standard library (http.client) so a
+short-lived cron or CI run doesn't pay for importing requests/urllib3, and
+the scripts work where requests isn't installed. Connections are kept alive
+and reused per host, like a requests.Session.
+
+Set DNS_HTTP_TRANSPORT=requests to use requests instead.
+"""
+
+import contextlib
+import os
+import threading
+from urllib.parse import urlencode, urlsplit
+
+TRANSPORT_ENV = 'DNS_HTTP_TRANSPORT'
+USER_AGENT = 'lechworld-dns/1.0'
+
+
+class TransportError(Exception):
+    """Connection, timeout or protocol failure talking to an HTTP endpoint"""
+
+
+class Response:
+    """Status, headers and fully read body of one HTTP response"""
+
+    def __init__(self, status, headers, content):
+        self.status = status
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', 'replace')
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise TransportError(f"HTTP {self.status}")
+
+
+class StreamingResponse:
+    """Status and headers of a response whose body is read with iter_chunks()"""
+
+    def __init__(self, status, headers, read):
+        self.status = status
+        self.headers = headers
+        self._read = read
+
+    def iter_chunks(self, size=65536):
+        while True:
+            chunk = self._read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _split_timeout(timeout):
+    if isinstance(timeout, (tuple, list)):
+        return timeout[0], timeout[1]
+    return timeout, timeout
+
+
+class HTTPClientTransport:
+    """Keep-alive connection pool on top of http.client, safe to share between threads"""
+
+    def __init__(self, pool_size=10):
+        self.pool_size = pool_size
+        self.idle = {}   # (scheme, host, port) -> [connections]
+        self.lock = threading.Lock()
+
+    def _connect(self, scheme, host, port, connect_timeout):
+        import http.client
+        if scheme == 'https':
+            import ssl
+            return http.client.HTTPSConnection(host, port, timeout=connect_timeout,
+                                               context=ssl.create_default_context())
+        return http.client.HTTPConnection(host, port, timeout=connect_timeout)
+
+    def _checkout(self, key, connect_timeout):
+        with self.lock:
+            idle = self.idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._connect(*key, connect_timeout), False
+
+    def _checkin(self, key, conn):
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _open(self, method, url, data=None, headers=None, timeout=None):
+        """Send a request and read the response head: (key, conn, response)"""
+        import http.client
+        parts = urlsplit(url)
+        scheme = parts.scheme or 'http'
+        port = parts.port or (443 if scheme == 'https' else 80)
+        key = (scheme, parts.hostname, port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        body = None
+        send_headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': 'gzip',
+                        'Connection': 'keep-alive'}
+        if data is not None:
+            body = urlencode(data).encode('utf-8') if isinstance(data, dict) else data
+            send_headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        send_headers.update(headers or {})
+        connect_timeout, read_timeout = _split_timeout(timeout)
+
+        for attempt in range(2):
+            conn, reused = self._checkout(key, connect_timeout)
+            try:
+                conn.timeout = connect_timeout
+                if conn.sock is None:
+                    conn.connect()
+                conn.sock.settimeout(read_timeout)
+                conn.request(method, path, body=body, headers=send_headers)
+                return key, conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                conn.close()
+                # A reused keep-alive connection may have been closed by the
+                # server while idle; retry once on a fresh one
+                if reused and attempt == 0:
+                    continue
+                raise TransportError(str(e) or e.__class__.__name__) from e
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise TransportError(str(e) or e.__class__.__name__) from e
+
+    def _release(self, key, conn, response):
+        if response.will_close or not response.isclosed():
+            conn.close()
+        else:
+            self._checkin(key, conn)
+
+    def request(self, method, url, data=None, headers=None, timeout=None):
+        import http.client
+        key, conn, response = self._open(method, url, data, headers, timeout)
+        try:
+            content = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise TransportError(str(e) or e.__class__.__name__) from e
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            import gzip
+            content = gzip.decompress(content)
+        self._release(key, conn, response)
+        return Response(response.status, dict(response.getheaders()), content)
+
+    @contextlib.contextmanager
+    def stream(self, method, url, headers=None, timeout=None):
+        """Yield a StreamingResponse whose body is read in chunks, never buffered
+
+        The body is passed through as sent (no gzip decoding). The connection
+        goes back to the pool only if the body was read to the end.
+        """
+        import http.client
+        key, conn, response = self._open(method, url, None, headers, timeout)
+        try:
+            yield StreamingResponse(response.status, dict(response.getheaders()), response.read)
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise TransportError(str(e) or e.__class__.__name__) from e
+        except BaseException:
+            conn.close()
+            raise
+        self._release(key, conn, response)
+
+    def post(self, url, data=None, timeout=None, headers=None):
+        return self.request('POST', url, data, headers, timeout)
+
+    def get(self, url, timeout=None, headers=None):
+        return self.request('GET', url, None, headers, timeout)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+class RequestsTransport:
+    """Same interface backed by a pooled requests.Session (imported on first use)"""
+
+    def __init__(self, pool_size=10):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.requests = requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, url, data=None, headers=None, timeout=None):
+        try:
+            r = self.session.request(method, url, data=data, headers=headers, timeout=timeout)
+        except self.requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+        return Response(r.status_code, dict(r.headers), r.content)
+
+    def post(self, url, data=None, timeout=None, headers=None):
+        return self.request('POST', url, data, headers, timeout)
+
+    def get(self, url, timeout=None, headers=None):
+        return self.request('GET', url, None, headers, timeout)
+
+    @contextlib.contextmanager
+    def stream(self, method, url, headers=None, timeout=None):
+        try:
+            r = self.session.request(method, url, headers=headers, timeout=timeout, stream=True)
+        except self.requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+        with r:
+            try:
+                yield StreamingResponse(r.status_code, dict(r.headers),
+                                        lambda size: r.raw.read(size, decode_content=False))
+            except self.requests.exceptions.RequestException as e:
+                raise TransportError(str(e)) from e
+
+    def close(self):
+        self.session.close()
+
+
+def make_transport(pool_size=10, kind=None):
+    """Transport chosen by ``kind`` or DNS_HTTP_TRANSPORT ('stdlib' by default)"""
+    kind = (kind or os.getenv(TRANSPORT_ENV) or 'stdlib').lower()
+    if kind == 'requests':
+        return RequestsTransport(pool_size)
+    return HTTPClientTransport(pool_size)
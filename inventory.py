@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Account-wide domain and DNS inventory
+Pages through namecheap.domains.getList (page 1 first, then the remaining
+pages concurrently) and feeds every domain into a bounded worker pool that
+fetches its records with getHosts. All calls share one pooled client and
+one token-bucket scheduler, so the pass stays inside the API quota.
+Results are streamed to NDJSON or SQLite as each domain completes rather
+than collected in memory, and records still pointing at the old Vercel
+project are flagged.
+
+Usage: python3 inventory.py [--ndjson inventory.ndjson | --sqlite inventory.db]
+                            [--workers 8] [--page-size 100] [--vercel-only]
+Credentials come from NAMECHEAP_API_USER / NAMECHEAP_API_KEY.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from client_ip import ClientIPError, get_client_ip
+from dns_reconcile import NO_RECORDS_ERROR, is_vercel_target
+from domain_coord import LockTimeout
+from namecheap_client import NamecheapClient, TransportError, split_domain
+from rate_limit import PER_DAY, PER_HOUR, PER_MINUTE, namecheap_limiter
+from run_metrics import METRICS, incr, write_reports
+from run_profile import start_profiling
+from zone_history import open_history
+
+PAGE_SIZE = 100   # getList maximum
+
+
+def iter_domains(client, page_size=PAGE_SIZE, workers=4):
+    """Every domain in the account as a getList attribute dict
+
+    Page 1 gives the total; the remaining pages are then fetched
+    concurrently and yielded as they arrive. Raises RuntimeError if a page
+    can't be read, since the inventory would silently be incomplete.
+    """
+    def page(number):
+        result = client.get_list(number, page_size)
+        if not result.ok:
+            errors = '; '.join(f"{num}: {text}" for num, text in result.errors)
+            raise RuntimeError(f"getList page {number} failed ({errors or 'no details'})")
+        return result
+
+    first = page(1)
+    yield from first.domains
+    total = first.paging.get('TotalItems', len(first.domains))
+    size = first.paging.get('PageSize', page_size) or page_size
+    pages = range(2, (total + size - 1) // size + 1)
+    if not pages:
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(pages))) as pool:
+        for future in as_completed([pool.submit(page, n) for n in pages]):
+            yield from future.result().domains
+
+
+def inspect_domain(client, info):
+    """getHosts for one getList entry; always returns a result dict, never raises"""
+    domain = info.get('Name', '').lower()
+    result = {
+        'domain': domain,
+        'expires': info.get('Expires'),
+        'is_our_dns': info.get('IsOurDNS', 'true').lower() == 'true',
+        'status': 'error',
+        'records': [],
+        'vercel': [],
+        'errors': [],
+    }
+    if not result['is_our_dns']:
+        # Records live at another DNS provider; getHosts would only spend quota
+        result['status'] = 'external_dns'
+        return result
+    try:
+        sld, tld = split_domain(domain)
+        api_result = client.get_hosts(sld, tld)
+        if api_result.ok:
+            result['status'] = 'ok'
+        elif api_result.has_error(NO_RECORDS_ERROR):
+            result['status'] = 'empty'
+        else:
+            result['errors'] = [f"{num}: {text}" for num, text in api_result.errors]
+        result['records'] = [r.to_dict() for r in api_result.hosts]
+        result['vercel'] = [r.to_dict() for r in api_result.hosts if is_vercel_target(r.address)]
+        if client.history is not None and result['status'] != 'error':
+            client.history.record(domain, api_result.hosts, 'get')
+    except (TransportError, ET.ParseError, ValueError, LockTimeout, OSError) as e:
+        result['errors'] = [str(e) or e.__class__.__name__]
+    return result
+
+
+def iter_inventory(client, workers=8, page_size=PAGE_SIZE):
+    """Yield inspect_domain results in completion order
+
+    At most ``2 * workers`` domains are queued at once, so memory stays flat
+    however large the account is.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for info in iter_domains(client, page_size, workers):
+            pending.add(pool.submit(inspect_domain, client, info))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+
+class NDJSONSink:
+    """One JSON object per domain, flushed as it arrives"""
+
+    def __init__(self, path):
+        self.file = sys.stdout if path == '-' else open(path, 'w')
+
+    def write(self, result):
+        self.file.write(json.dumps(result) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class SQLiteSink:
+    """domains + records tables, committed in small batches"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS domains (
+            domain TEXT PRIMARY KEY, expires TEXT, is_our_dns INTEGER,
+            status TEXT, errors TEXT, vercel INTEGER, checked_at REAL);
+        CREATE TABLE IF NOT EXISTS records (
+            domain TEXT, name TEXT, type TEXT, address TEXT, ttl INTEGER,
+            mx_pref INTEGER, vercel INTEGER);
+        CREATE INDEX IF NOT EXISTS records_domain ON records (domain);
+        CREATE INDEX IF NOT EXISTS records_address ON records (address);
+    """
+    BATCH = 50
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(self.SCHEMA)
+        self.pending = 0
+
+    def write(self, result):
+        domain = result['domain']
+        vercel = {(r['HostName'], r['RecordType'], r['Address']) for r in result['vercel']}
+        self.db.execute('DELETE FROM records WHERE domain = ?', (domain,))
+        self.db.execute('INSERT OR REPLACE INTO domains VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (domain, result['expires'], int(result['is_our_dns']), result['status'],
+                         '; '.join(result['errors']), len(vercel), time.time()))
+        self.db.executemany('INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?)', [
+            (domain, r['HostName'], r['RecordType'], r['Address'], int(r['TTL']),
+             int(r.get('MXPref') or 0), int((r['HostName'], r['RecordType'], r['Address']) in vercel))
+            for r in result['records']])
+        self.pending += 1
+        if self.pending >= self.BATCH:
+            self.db.commit()
+            self.pending = 0
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inventory every domain and its DNS records")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--ndjson', default='-', help="NDJSON output file (default: stdout)")
+    output.add_argument('--sqlite', help="write to this SQLite database instead")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent getHosts calls")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--vercel-only', action='store_true',
+                        help="only output domains with leftover Vercel records")
+    parser.add_argument('--per-minute', type=int, default=PER_MINUTE)
+    parser.add_argument('--per-hour', type=int, default=PER_HOUR)
+    parser.add_argument('--per-day', type=int, default=PER_DAY)
+    parser.add_argument('--client-ip',
+                        help="whitelisted IP (default: NAMECHEAP_CLIENT_IP, cache or detection)")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile CPU and memory per phase into $DNS_PROFILE_DIR (default ./profiles)")
+    args = parser.parse_args()
+    if args.profile:
+        start_profiling('inventory')
+
+    api_user = os.getenv('NAMECHEAP_API_USER')
+    api_key = os.getenv('NAMECHEAP_API_KEY')
+    if not api_user or not api_key:
+        print("Set NAMECHEAP_API_USER and NAMECHEAP_API_KEY", file=sys.stderr)
+        sys.exit(1)
+    try:
+        client_ip = get_client_ip(args.client_ip)
+    except ClientIPError as e:
+        print(f"❌ Could not determine client IP ({e}); pass --client-ip", file=sys.stderr)
+        sys.exit(1)
+
+    sink = SQLiteSink(args.sqlite) if args.sqlite else NDJSONSink(args.ndjson)
+    limiter = namecheap_limiter(args.per_minute, args.per_hour, args.per_day)
+    counts = {}
+    flagged = []
+    started = time.monotonic()
+    ok = True
+    try:
+        with NamecheapClient(api_user, api_key, client_ip, pool_size=args.workers,
+                             limiter=limiter, history=open_history()) as client:
+            for result in iter_inventory(client, args.workers, args.page_size):
+                counts[result['status']] = counts.get(result['status'], 0) + 1
+                incr('inventory_domains', status=result['status'])
+                if result['vercel']:
+                    flagged.append(result['domain'])
+                if result['vercel'] or not args.vercel_only:
+                    sink.write(result)
+    except (RuntimeError, TransportError, ET.ParseError) as e:
+        print(f"❌ Inventory incomplete: {e}", file=sys.stderr)
+        ok = False
+    finally:
+        sink.close()
+
+    # Summary goes to stderr so NDJSON on stdout stays clean
+    summary = ', '.join(f"{n} {status}" for status, n in sorted(counts.items()))
+    print(f"📒 {sum(counts.values())} domains in {time.monotonic() - started:.1f}s ({summary or 'none'}), "
+          f"rate limit wait {limiter.waited:.1f}s, {METRICS.total('api_retries')} retries, "
+          f"{METRICS.total('api_hedges')} hedged reads", file=sys.stderr)
+    if flagged:
+        print(f"⚠️  Leftover Vercel records on {len(flagged)} domains: {', '.join(sorted(flagged))}",
+              file=sys.stderr)
+    write_reports('inventory')
+    sys.exit(0 if ok and not counts.get('error') else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Shared Namecheap API client for the DNS scripts
+Keeps one keep-alive connection pool per client so repeated calls
+(getHosts followed by setHosts, or many domains in a row) reuse the same
+TCP+TLS connection instead of paying the handshake on every request
+"""
+
+import io
+import os
+import xml.etree.ElementTree as ET
+
+from domain_coord import SingleFlight, shared_fetch
+from http_transport import TransportError, make_transport
+from resilience import CallPolicy
+from run_metrics import incr, span
+
+API_URL = 'https://api.namecheap.com/xml.response'
+# Overrides API_URL, e.g. to point the scripts at namecheap_stub_server.py
+API_URL_ENV = 'NAMECHEAP_API_URL'
+NAMESPACE = '{http://api.namecheap.com/xml.response}'
+
+# (connect, read) timeouts in seconds, used when neither the call, the
+# client nor its CallPolicy sets one
+DEFAULT_TIMEOUT = (5, 30)
+
+DEFAULT_TTL = 1800
+DEFAULT_MX_PREF = 10
+
+
+def _local(tag):
+    """Strip the XML namespace from a tag"""
+    return tag.rsplit('}', 1)[-1]
+
+
+class HostRecord:
+    """One host record as Namecheap stores it (getHosts <host> / setHosts HostNameN...)"""
+
+    __slots__ = ('name', 'type', 'address', 'ttl', 'mx_pref', 'host_id')
+
+    def __init__(self, name, type_, address, ttl=DEFAULT_TTL, mx_pref=DEFAULT_MX_PREF,
+                 host_id=None):
+        self.name = name or '@'
+        self.type = type_.upper()
+        self.address = address
+        self.ttl = int(ttl or DEFAULT_TTL)
+        self.mx_pref = int(mx_pref or DEFAULT_MX_PREF)
+        self.host_id = host_id
+
+    @classmethod
+    def from_dict(cls, d):
+        """Build from setHosts-style keys (HostName, RecordType, Address, TTL, MXPref)"""
+        return cls(d.get('HostName', '@'), d['RecordType'], d['Address'],
+                   d.get('TTL'), d.get('MXPref'), d.get('HostId'))
+
+    def to_dict(self):
+        d = {'HostName': self.name, 'RecordType': self.type,
+             'Address': self.address, 'TTL': str(self.ttl)}
+        if self.type == 'MX':
+            d['MXPref'] = str(self.mx_pref)
+        return d
+
+    @property
+    def key(self):
+        """Identity used for diffing: (name, type, address), case-folded, no trailing dots"""
+        name = self.name.strip().lower().rstrip('.') or '@'
+        address = self.address.strip()
+        if self.type != 'TXT':
+            address = address.lower().rstrip('.')
+        return name, self.type, address
+
+    @property
+    def attrs(self):
+        """Values that can change in place without changing identity"""
+        return self.ttl, self.mx_pref if self.type == 'MX' else 0
+
+    def __eq__(self, other):
+        if not isinstance(other, HostRecord):
+            return NotImplemented
+        return self.key == other.key and self.attrs == other.attrs
+
+    def __hash__(self):
+        return hash((self.key, self.attrs))
+
+    def __repr__(self):
+        return f"HostRecord({self.type} {self.name} -> {self.address}, TTL {self.ttl})"
+
+
+class ApiResult:
+    """Parsed Namecheap API response"""
+
+    def __init__(self, ok, errors=None, hosts=None, raw=b'', domains=None, paging=None):
+        self.ok = ok
+        self.errors = errors or []   # list of (number, message)
+        self.hosts = hosts or []     # list of HostRecord (getHosts only)
+        self.raw = raw
+        self.domains = domains or []  # list of <Domain> attribute dicts (getList only)
+        self.paging = paging or {}    # TotalItems / CurrentPage / PageSize as ints
+
+    @property
+    def text(self):
+        return self.raw.decode('utf-8', 'replace')
+
+    def has_error(self, number):
+        """True if the response carries the given Namecheap error number"""
+        return any(str(number) in num for num, _ in self.errors)
+
+    def __bool__(self):
+        return self.ok
+
+
+def iter_response(data):
+    """Single streaming pass over an xml.response body
+
+    Yields ('status', str) for the root, then ('host', HostRecord),
+    ('domain', attribute dict), ('paging', dict of ints) and
+    ('error', (number, message)) in document order. Elements are cleared
+    as soon as they are consumed, so no full tree is ever built.
+    Raises ET.ParseError on malformed XML.
+    """
+    root = None
+    for event, elem in ET.iterparse(io.BytesIO(data), events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+                yield 'status', elem.get('Status')
+            continue
+        tag = _local(elem.tag)
+        if tag == 'host':
+            yield 'host', HostRecord(elem.get('Name'), elem.get('Type', ''),
+                                     elem.get('Address', ''), elem.get('TTL'),
+                                     elem.get('MXPref'), elem.get('HostId'))
+        elif tag == 'Domain':
+            yield 'domain', dict(elem.attrib)
+        elif tag == 'Paging':
+            yield 'paging', {_local(child.tag): int(child.text or 0) for child in elem
+                             if (child.text or '').strip().isdigit()}
+        elif tag == 'Error':
+            yield 'error', (elem.get('Number', ''), (elem.text or '').strip())
+        else:
+            continue
+        elem.clear()
+        if root is not None:
+            root.clear()
+
+
+def parse_response(data):
+    """Parse an xml.response body (bytes or str) into an ApiResult"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    status = None
+    errors = []
+    hosts = []
+    domains = []
+    paging = {}
+    for kind, value in iter_response(data):
+        if kind == 'host':
+            hosts.append(value)
+        elif kind == 'domain':
+            domains.append(value)
+        elif kind == 'paging':
+            paging = value
+        elif kind == 'error':
+            errors.append(value)
+        else:
+            status = value
+    return ApiResult(status == 'OK', errors, hosts, data, domains, paging)
+
+
+def split_domain(domain):
+    """'lech.world' -> ('lech', 'world'); everything after the first label is the TLD"""
+    sld, _, tld = domain.strip().rstrip('.').lower().partition('.')
+    if not sld or not tld:
+        raise ValueError(f"Not a registrable domain: {domain!r}")
+    return sld, tld
+
+
+def build_host_params(records):
+    """Turn a list of HostRecords into indexed setHosts parameters"""
+    params = {}
+    for i, record in enumerate(records, 1):
+        params[f'HostName{i}'] = record.name
+        params[f'RecordType{i}'] = record.type
+        params[f'Address{i}'] = record.address
+        params[f'TTL{i}'] = str(record.ttl)
+        if record.type == 'MX':
+            params[f'MXPref{i}'] = str(record.mx_pref)
+    return params
+
+
+class NamecheapClient:
+    """Namecheap API client backed by a pooled keep-alive transport
+
+    One instance should be created per run and shared by every call; it is
+    safe to use from several threads at once (up to ``pool_size`` idle
+    connections are kept per host). See http_transport for the transport.
+
+    Reads and writes go through a resilience.CallPolicy (retries, hedged
+    reads, verified write retries, circuit breaker); pass
+    ``CallPolicy(retries=0, hedge_after=None)`` to send every call once.
+    """
+
+    def __init__(self, api_user, api_key, client_ip, username=None,
+                 pool_size=10, timeout=None, url=None,
+                 limiter=None, transport=None, history=None, policy=None):
+        self.api_user = api_user
+        self.api_key = api_key
+        self.client_ip = client_ip
+        self.username = username or api_user
+        self.timeout = timeout
+        self.url = url or os.getenv(API_URL_ENV) or API_URL
+        self.limiter = limiter   # rate_limit.RateLimiter shared by all calls
+        self.history = history   # zone_history.ZoneHistory fed by dns_reconcile
+        self.policy = policy or CallPolicy()
+        self.flights = SingleFlight()
+
+        self.transport = transport or make_transport(pool_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.transport.close()
+
+    def call(self, command, params=None, timeout=None):
+        """POST a command and return the parsed ApiResult
+
+        Sent once, without the CallPolicy. Connection errors and 5xx
+        responses (TransportError) and malformed responses (ET.ParseError)
+        are left to the caller.
+        """
+        data = {
+            'ApiUser': self.api_user,
+            'ApiKey': self.api_key,
+            'UserName': self.username,
+            'Command': command,
+            'ClientIp': self.client_ip,
+        }
+        if params:
+            data.update(params)
+        if self.limiter is not None:
+            self.limiter.acquire()
+        phase = command.rsplit('.', 1)[-1]
+        incr('api_calls', command=phase)
+        with span(phase):
+            response = self.transport.post(self.url, data=data,
+                                           timeout=timeout or self.timeout or DEFAULT_TIMEOUT)
+        if response.status >= 500:
+            raise TransportError(f"{phase}: HTTP {response.status}")
+        with span('xml_parse'):
+            return parse_response(response.content)
+
+    def get_hosts(self, sld, tld, timeout=None):
+        """namecheap.domains.dns.getHosts; records are in result.hosts
+
+        Identical reads already in flight, in this process or another run
+        (see domain_coord), share one API call.
+        """
+        params = {'SLD': sld, 'TLD': tld}
+
+        def fetch():
+            return self.policy.read(
+                lambda t: self.call('namecheap.domains.dns.getHosts', params,
+                                    timeout or self.timeout or t), 'getHosts')
+
+        domain = f"{sld}.{tld}"
+        return self.flights.do(('getHosts', domain),
+                               lambda: shared_fetch(domain, fetch, parse_response))
+
+    def get_list(self, page=1, page_size=100, list_type='ALL', timeout=None):
+        """namecheap.domains.getList; domains in result.domains, totals in result.paging"""
+        params = {'ListType': list_type, 'Page': str(page), 'PageSize': str(page_size)}
+        return self.policy.read(
+            lambda t: self.call('namecheap.domains.getList', params,
+                                timeout or self.timeout or t), 'getList')
+
+    def set_hosts(self, sld, tld, records, timeout=None):
+        """namecheap.domains.dns.setHosts; replaces the whole zone with HostRecords
+
+        A write whose response is lost is only resent if getHosts shows the
+        zone doesn't hold ``records`` yet.
+        """
+        params = {'SLD': sld, 'TLD': tld}
+        with span('build_params'):
+            params.update(build_host_params(records))
+
+        def landed():
+            current = self.get_hosts(sld, tld)
+            if current.ok and set(current.hosts) == set(records):
+                return ApiResult(True, hosts=current.hosts, raw=current.raw)
+            return None
+
+        return self.policy.write(
+            lambda t: self.call('namecheap.domains.dns.setHosts', params,
+                                timeout or self.timeout or t), landed, 'setHosts')
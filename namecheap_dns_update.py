@@ -2,185 +2,213 @@
 """
 Namecheap DNS Configuration Script for www.lech.world
 Updates DNS records to point to GitHub Pages instead of Vercel
+
+Heavier modules (the resolver/asyncio, the API client, XML parsing) are
+imported inside the functions that need them, so paths that never touch
+the network start fast.
+
+Usage: python3 namecheap_dns_update.py          (interactive)
+       python3 namecheap_dns_update.py --yes [--client-ip IP] [--deadline 10]
+                                       [--force] [--no-watch]
+With --yes credentials come from NAMECHEAP_API_USER / NAMECHEAP_API_KEY and
+the pre-write probes run concurrently under one deadline.
 """
 
-import requests
-import xml.etree.ElementTree as ET
+import argparse
 import sys
 import time
 import os
 from datetime import datetime
 
+from run_metrics import METRICS, span, write_reports
+
 # Domain configuration
 DOMAIN = "lech.world"
 SLD = "lech"
 TLD = "world"
 
-# GitHub Pages IPs (required for apex domain)
-GITHUB_IPS = [
-    "185.199.108.153",
-    "185.199.109.153",
-    "185.199.110.153",
-    "185.199.111.153"
-]
+# Resolvers checked in parallel; None means this host's own plus the big public ones
+DNS_RESOLVERS = None
+DNS_TIMEOUT = 3.0
 
-# GitHub Pages username
-GITHUB_USERNAME = "leolech14"
+# How long to wait for the authoritative nameservers to agree (seconds)
+AUTHORITY_DEADLINE = 120
+
+# How long main() keeps watching for propagation after a successful update (seconds)
+PROPAGATION_DEADLINE = 600
+
+# Overall budget for the concurrent pre-write probes in --yes mode (seconds)
+STARTUP_DEADLINE = 10.0
 
 def get_client_ip():
-    """Get the public IP of the client"""
+    """Get the public IP of the client (override, cache, local interface or echo services)"""
+    from client_ip import ClientIPError, get_client_ip as detect_client_ip
+    
     try:
-        response = requests.get('https://api.ipify.org', timeout=5)
-        return response.text.strip()
-    except:
-        print("⚠️  Could not detect your IP automatically")
+        return detect_client_ip()
+    except ClientIPError as e:
+        print(f"⚠️  Could not detect your IP automatically ({e})")
         return input("Enter your IP address (for whitelist): ").strip()
 
-def check_current_dns():
-    """Check current DNS configuration"""
+def dns_resolvers():
+    """DNS_RESOLVERS, or the system resolver plus the well-known public ones"""
+    if DNS_RESOLVERS:
+        return DNS_RESOLVERS
+    from dns_resolver import PUBLIC_RESOLVERS, system_resolvers
+    return system_resolvers()[:1] + list(PUBLIC_RESOLVERS.values())
+
+def lookup_site_dns(resolvers=None, timeout=DNS_TIMEOUT):
+    """A answers (with any CNAME chain) for the apex and www from every resolver at once"""
+    from dns_resolver import resolve_many
+    
+    questions = [(DOMAIN, 'A'), (f'www.{DOMAIN}', 'A')]
+    return resolve_many(questions, resolvers or dns_resolvers(), timeout)
+
+_site_targets = None
+
+def site_targets():
+    """(apex A addresses, www CNAME targets) from the zone file, loaded once"""
+    global _site_targets
+    if _site_targets is None:
+        from zone_file import desired_records
+        records = desired_records(DOMAIN)
+        _site_targets = ({r.address for r in records if r.name == '@' and r.type == 'A'},
+                         {r.address for r in records if r.name == 'www' and r.type == 'CNAME'})
+    return _site_targets
+
+def points_to_github(answer):
+    """www must CNAME to the zone's target; the apex must only hold the zone's A records"""
+    apex_ips, www_targets = site_targets()
+    if answer.name.startswith('www.'):
+        return bool(www_targets & set(answer.values('CNAME')))
+    addresses = answer.values('A')
+    return bool(addresses) and set(addresses) <= apex_ips
+
+def points_to_vercel(answer):
+    from dns_reconcile import is_vercel_target
+    return any(is_vercel_target(r.data) for r in answer.records)
+
+def describe_answer(answer):
+    if answer.error:
+        return f"failed ({answer.error})"
+    if not answer.records:
+        return answer.rcode
+    return ", ".join(f"{r.data} (TTL {r.ttl})" for r in answer.records)
+
+def check_current_dns(answers=None):
+    """Check current DNS configuration (``answers`` from an earlier lookup_site_dns)"""
     print("\n🔍 Checking current DNS configuration...")
     print("-" * 60)
     
-    # Check www subdomain
-    import subprocess
-    try:
-        result = subprocess.run(['nslookup', 'www.lech.world'], 
-                              capture_output=True, text=True, timeout=5)
-        if "vercel" in result.stdout.lower():
-            print("⚠️  DNS currently points to Vercel (old project)")
-            print("   Need to update to GitHub Pages")
-        elif "github" in result.stdout.lower() or "185.199" in result.stdout:
-            print("✅ DNS already points to GitHub Pages")
-        else:
-            print("❓ Current DNS configuration unclear")
-        print(result.stdout[:300])
-    except:
+    if answers is None:
+        answers = lookup_site_dns()
+    for answer in answers:
+        print(f"  {answer.resolver:16} {answer.name:16} {describe_answer(answer)}")
+    
+    answered = [a for a in answers if a.ok]
+    if not answered:
         print("Could not check current DNS")
+    elif any(points_to_vercel(a) for a in answered):
+        print("⚠️  DNS currently points to Vercel (old project)")
+        print("   Need to update to GitHub Pages")
+    elif all(points_to_github(a) for a in answered):
+        print("✅ DNS already points to GitHub Pages")
+    else:
+        print("❓ Current DNS configuration unclear")
     
     print("-" * 60)
 
-def delete_existing_records(api_user, api_key, client_ip):
-    """First, get and display existing records"""
-    print("\n📋 Fetching existing DNS records...")
+def delete_existing_records(client, fetched=None):
+    """First, get and display existing records
+
+    Returns the current host records (empty list for an empty zone) so the
+    write step can diff against them, or None if the zone couldn't be read.
+    ``fetched`` is a fetch_current() result already gathered by the probes.
+    """
+    from dns_reconcile import fetch_current
     
-    params = {
-        'ApiUser': api_user,
-        'ApiKey': api_key,
-        'UserName': api_user,
-        'Command': 'namecheap.domains.dns.getHosts',
-        'ClientIp': client_ip,
-        'SLD': SLD,
-        'TLD': TLD
-    }
+    print("\n📋 Fetching existing DNS records...")
     
     try:
-        response = requests.post(
-            'https://api.namecheap.com/xml.response',
-            data=params,
-            timeout=30
-        )
-        
-        root = ET.fromstring(response.text)
-        status = root.get('Status')
+        hosts, result = fetched or fetch_current(client, SLD, TLD)
         
-        if status == 'OK':
-            # Find all host records
-            hosts = root.findall('.//{http://api.namecheap.com/xml.response}host')
-            if hosts:
-                print("\n⚠️  Found existing records (will be replaced):")
-                for host in hosts:
-                    name = host.get('Name')
-                    type_ = host.get('Type')
-                    address = host.get('Address')
-                    print(f"   - {type_:6} {name:10} → {address}")
-            return True
+        if hosts is None:
+            for _, error_text in result.errors:
+                print(f"Error: {error_text}")
+            return None
+        if hosts:
+            print("\n⚠️  Found existing records (will be replaced):")
+            for host in hosts:
+                print(f"   - {host.type:6} {host.name:10} → {host.address}")
         else:
-            errors = root.findall('.//Error')
-            if errors:
-                for error in errors:
-                    if "2019166" in str(error.get('Number', '')):
-                        print("ℹ️  No existing DNS records found")
-                        return True
-                    print(f"Error: {error.text}")
-            return False
+            print("ℹ️  No existing DNS records found")
+        return hosts
     except Exception as e:
         print(f"Error checking existing records: {e}")
-        return False
+        return None
+
+def setup_dns_records(client, current=None, force=False):
+    """Configure DNS records for GitHub Pages
 
-def setup_dns_records(api_user, api_key, client_ip):
-    """Configure DNS records for GitHub Pages"""
+    ``current`` is the getHosts result from delete_existing_records; when it
+    already matches the desired records setHosts is skipped entirely.
+    Returns the dns_reconcile result, or None if nothing could be applied.
+    """
+    import xml.etree.ElementTree as ET
+    from dns_reconcile import reconcile
+    from domain_coord import LockTimeout
+    from namecheap_client import TransportError
+    from record_rules import InvalidRecords, preflight, print_violations
+    from zone_file import ZoneError, desired_records
     
     print("\n🚀 Configuring new DNS records for GitHub Pages...")
     
-    # Build DNS records
-    dns_records = []
-    
-    # A Records for apex domain (lech.world)
-    for ip in GITHUB_IPS:
-        dns_records.append({
-            'HostName': '@',
-            'RecordType': 'A',
-            'Address': ip,
-            'TTL': '1800'
-        })
-    
-    # CNAME for www subdomain
-    dns_records.append({
-        'HostName': 'www',
-        'RecordType': 'CNAME',
-        'Address': f'{GITHUB_USERNAME}.github.io',
-        'TTL': '1800'
-    })
-    
-    # Build API parameters
-    params = {
-        'ApiUser': api_user,
-        'ApiKey': api_key,
-        'UserName': api_user,
-        'Command': 'namecheap.domains.dns.setHosts',
-        'ClientIp': client_ip,
-        'SLD': SLD,
-        'TLD': TLD
-    }
-    
-    # Add each DNS record to parameters
-    for i, record in enumerate(dns_records, 1):
-        params[f'HostName{i}'] = record['HostName']
-        params[f'RecordType{i}'] = record['RecordType']
-        params[f'Address{i}'] = record['Address']
-        params[f'TTL{i}'] = record['TTL']
+    # zones/lech.world.zone: A records for the apex plus the www CNAME,
+    # checked offline before anything is sent
+    try:
+        dns_records = desired_records(DOMAIN)
+        warnings = preflight(dns_records, DOMAIN)
+    except (OSError, ZoneError) as e:
+        print(f"\n❌ Invalid zone file: {e}")
+        return None
+    except InvalidRecords as e:
+        print("\n❌ Records failed pre-flight checks, nothing was sent:")
+        print_violations(e.violations)
+        return None
+    print_violations(warnings)
     
     print("\n📝 Setting up the following records:")
     print("-" * 60)
     for record in dns_records:
-        print(f"  {record['RecordType']:6} {record['HostName']:10} → {record['Address']}")
+        print(f"  {record.type:6} {record.name:10} → {record.address}")
     print("-" * 60)
     
     # Make the API request
     print("\n🔄 Sending configuration to Namecheap...")
     
     try:
-        response = requests.post(
-            'https://api.namecheap.com/xml.response',
-            data=params,
-            timeout=30
-        )
+        outcome = reconcile(client, SLD, TLD, dns_records, current=current, force=force)
+        result = outcome.api_result
+        
+        if outcome.superseded:
+            print("\nℹ️  Another run queued newer records meanwhile; the zone was brought to those")
+        if not outcome.changed and outcome.ok:
+            print("\n✅ Zone already matches, no change needed (setHosts skipped)")
+            return outcome
         
-        # Parse XML response
-        root = ET.fromstring(response.text)
-        status = root.get('Status')
+        if outcome.changed and not outcome.plan.is_noop:
+            print("\n🧮 Changes applied:")
+            for line in outcome.plan.lines():
+                print(line)
         
-        if status == 'OK':
+        if outcome.ok:
             print("\n✅ DNS records configured successfully!")
-            return True
+            return outcome
         else:
             # Get error messages
-            errors = root.findall('.//Error')
-            if errors:
+            if result.errors:
                 print("\n❌ Error configuring DNS:")
-                for error in errors:
-                    error_num = error.get('Number', '')
-                    error_text = error.text or ''
+                for error_num, error_text in result.errors:
                     print(f"   Error {error_num}: {error_text}")
                     
                     # Common error handling
@@ -188,41 +216,199 @@ def setup_dns_records(api_user, api_key, client_ip):
                         print("\n⚠️  API access not enabled or IP not whitelisted")
                         print("   1. Go to: https://ap.www.namecheap.com/settings/tools/apiaccess/")
                         print("   2. Enable API Access")
-                        print(f"   3. Whitelist your IP: {client_ip}")
+                        print(f"   3. Whitelist your IP: {client.client_ip}")
                     elif "2011170" in error_num:
                         print("\n⚠️  Invalid API credentials")
                         print("   Check your API User and API Key")
             else:
                 print("\n❌ Unknown error occurred")
-                print(f"Response: {response.text[:500]}")
-            return False
+                print(f"Response: {result.text[:500]}")
+            return None
             
-    except requests.exceptions.RequestException as e:
+    except TransportError as e:
         print(f"\n❌ Connection error: {e}")
-        return False
+        return None
+    except LockTimeout as e:
+        print(f"\n❌ Another run is still writing this zone ({e})")
+        return None
+    except InvalidRecords as e:
+        print("\n❌ The planned zone failed pre-flight checks, setHosts was not sent:")
+        print_violations(e.violations)
+        return None
     except ET.ParseError as e:
         print(f"\n❌ Error parsing response: {e}")
+        return None
+
+def check_authoritative_dns(deadline=AUTHORITY_DEADLINE):
+    """Confirm the zone's own nameservers serve the new records, then estimate cache expiry"""
+    from dns_authority import estimate_cache_expiry, wait_for_authorities
+    
+    print("\n🏛️  Checking authoritative nameservers...")
+    
+    questions = [(DOMAIN, 'A'), (f'www.{DOMAIN}', 'CNAME')]
+    report, elapsed, converged = wait_for_authorities(
+        DOMAIN, questions, dns_resolvers(), points_to_github, deadline=deadline, timeout=DNS_TIMEOUT)
+    
+    for ns, addresses in report.nameservers.items():
+        for ip in addresses:
+            print(f"   {ns:28} {ip:16} serial {report.serials.get(ip)}")
+    for error in report.errors:
+        print(f"   ⚠️  {error}")
+    
+    if not report.nameservers:
+        print("❌ Could not find the authoritative nameservers, skipping the check")
+        return False
+    if not converged:
+        print(f"⏳ Authoritative servers have not converged after {elapsed:.0f}s")
         return False
+    print(f"✅ All authoritative servers serve the new records (serial {report.serial}, {elapsed:.1f}s)")
+    
+    expiry = estimate_cache_expiry(lookup_site_dns(), points_to_github, report.soa_minimum)
+    if expiry:
+        print(f"   Recursive caches should expire within {expiry // 60} min {expiry % 60} s")
+    elif expiry == 0:
+        print("   Recursive resolvers already serve the new records")
+    return True
 
-def verify_dns_propagation():
-    """Check if DNS has propagated"""
-    print("\n🔍 Checking DNS propagation...")
+def check_edge_reachability(samples=3):
+    """Confirm each GitHub Pages edge serves www over HTTPS with a valid certificate"""
+    from edge_probe import print_summary, probe_edges, resolve_targets
     
-    import subprocess
+    host = f'www.{DOMAIN}'
+    print(f"\n🔐 Probing HTTPS on every edge for {host} (p50/p95 ms)...")
+    summaries = probe_edges(resolve_targets(host), samples, host)
+    for summary in summaries:
+        print_summary(summary)
+    if any(s['cert_ok'] is None for s in summaries):
+        print("   Some edges are unreachable over HTTPS (connection or TLS handshake failed)")
+    if any(s['cert_ok'] is False for s in summaries):
+        print("   Certificate not issued yet? Check Settings → Pages → Enforce HTTPS on GitHub")
+    return all(s['cert_ok'] for s in summaries)
+
+def watch_dns_propagation(deadline=PROPAGATION_DEADLINE):
+    """Poll resolvers with backoff until they all serve GitHub Pages or the deadline passes"""
+    from dns_watch import watch
+    
+    print(f"\n⏳ Watching DNS propagation (up to {deadline // 60:.0f} minutes, Ctrl+C to stop)...")
     
-    # Check www subdomain
     try:
-        result = subprocess.run(['nslookup', 'www.lech.world'], 
-                              capture_output=True, text=True, timeout=5)
-        if GITHUB_USERNAME in result.stdout.lower() or "185.199" in result.stdout:
-            print("✅ DNS is propagating correctly!")
+        result = watch([(DOMAIN, 'A'), (f'www.{DOMAIN}', 'A')], dns_resolvers(),
+                       points_to_github, deadline=deadline, timeout=DNS_TIMEOUT)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching, check again later with: nslookup www.lech.world")
+        return False
+    
+    if result.converged:
+        print(f"⏱️  Time to convergence: {result.elapsed:.1f}s")
+    else:
+        print("   DNS is still propagating (this can take up to 24 hours)")
+        for key in result.pending:
+            print(f"   {key[0]:16} {key[1]:16} {describe_answer(result.answers[key])}")
+    return result.converged
+
+class StartupProbes:
+    """Results of the independent pre-write probes gathered by run_startup_probes"""
+
+    def __init__(self):
+        self.answers = None      # recursive answers for the apex and www
+        self.client_ip = None
+        self.client = None
+        self.fetched = None      # (hosts, ApiResult) from getHosts
+        self.errors = {}         # probe -> message, including deadline misses
+
+def run_startup_probes(api_user, api_key, client_ip=None, deadline=STARTUP_DEADLINE):
+    """Run the DNS check and the IP detection → getHosts chain concurrently
+
+    getHosts has to send the whitelisted ClientIp, so it follows IP detection
+    in the same worker while the recursive lookup runs alongside. Pre-write
+    latency is the slower of the two chains instead of the sum of all three.
+    The results are read once, at ``deadline`` at the latest: a probe still
+    running then is reported in ``errors``, runs on in a daemon thread that
+    can't hold up exit, and whatever it finishes later is discarded (a late
+    client is closed).
+    """
+    import queue
+    import threading
+    from client_ip import get_client_ip as detect_client_ip
+    from dns_reconcile import fetch_current
+    from namecheap_client import NamecheapClient
+    from resilience import CallPolicy
+    from zone_history import open_history
+    
+    results = queue.Queue()
+    lock = threading.Lock()
+    expired = False
+    
+    def report(name, value, error=None):
+        """Hand a result over; False if the deadline has passed and nobody will read it"""
+        with lock:
+            if expired:
+                return False
+            results.put((name, value, error))
             return True
+    
+    def dns_probe():
+        with span('dns_check'):
+            return lookup_site_dns()
+    
+    def namecheap_probe():
+        ip = detect_client_ip(client_ip)
+        report('client_ip', ip)
+        # Retries, backoff and hedges of the getHosts read all fit in the deadline
+        startup = CallPolicy(read_timeout=(min(5, deadline), deadline), budget=deadline)
+        client = NamecheapClient(api_user, api_key, ip, policy=startup, history=open_history())
+        try:
+            with span('fetch_hosts'):
+                fetched = fetch_current(client, SLD, TLD)
+        except BaseException:
+            client.close()
+            raise
+        # Later calls (setHosts, its read-back) get the usual policy, same breaker
+        client.policy = CallPolicy(breaker=startup.breaker)
+        return client, fetched
+    
+    def run(name, probe):
+        try:
+            value = probe()
+        except Exception as e:
+            report(name, None, str(e) or e.__class__.__name__)
+            return
+        if not report(name, value) and name == 'namecheap':
+            value[0].close()
+    
+    probes = StartupProbes()
+    for name, probe in (('dns', dns_probe), ('namecheap', namecheap_probe)):
+        threading.Thread(target=run, args=(name, probe), name=f'{name}-probe', daemon=True).start()
+    
+    finished = {}
+    ends = time.monotonic() + deadline
+    while len(finished) < 2:
+        try:
+            name, value, error = results.get(timeout=max(0.0, ends - time.monotonic()))
+        except queue.Empty:
+            # One snapshot: anything reported after this is discarded
+            with lock:
+                expired = True
+            if results.empty():
+                break
+            name, value, error = results.get_nowait()
+        if name == 'client_ip':
+            probes.client_ip = value
         else:
-            print("⏳ DNS is still propagating (this can take up to 24 hours)")
-            return False
-    except:
-        print("Could not verify DNS propagation")
-        return False
+            finished[name] = (value, error)
+    
+    for name in ('dns', 'namecheap'):
+        if name not in finished:
+            probes.errors[name] = f"no answer within {deadline:g}s"
+            continue
+        value, error = finished[name]
+        if error:
+            probes.errors[name] = error
+        elif name == 'dns':
+            probes.answers = value
+        else:
+            probes.client, probes.fetched = value
+    return probes
 
 def print_manual_instructions():
     """Print manual configuration instructions"""
@@ -262,14 +448,15 @@ If the automated script doesn't work, follow these steps:
 """)
     print("="*70)
 
-def main():
+def main(force=False, watch=True):
     print("="*70)
     print(" 🌐 NAMECHEAP DNS CONFIGURATION FOR GITHUB PAGES")
     print("     Updating www.lech.world → GitHub Pages")
     print("="*70)
     
     # Check current DNS
-    check_current_dns()
+    with span('dns_check'):
+        check_current_dns()
     
     print("\n⚡ This script will:")
     print("  1. Remove old Vercel DNS records")
@@ -308,51 +495,137 @@ def main():
         print_manual_instructions()
         return
     
-    # Check existing records
-    print("\n" + "="*60)
-    if delete_existing_records(api_user, api_key, client_ip):
-        # Configure new DNS records
-        success = setup_dns_records(api_user, api_key, client_ip)
-        
-        if success:
-            print("\n" + "🎉"*20)
-            print("\n✅ SUCCESS! DNS configuration complete!")
-            print("\n📊 What happens next:")
-            print("  • 5-10 minutes: Initial propagation")
-            print("  • 30-60 minutes: Most locations updated")
-            print("  • Up to 24 hours: Full global propagation")
-            
-            print("\n🌐 Your site will be available at:")
-            print("  • https://www.lech.world (primary)")
-            print("  • https://lech.world (redirects to www)")
-            
-            print("\n✨ Test your site:")
-            print(f"  1. Wait 5-10 minutes")
-            print(f"  2. Visit: https://www.lech.world")
-            print(f"  3. You should see: LechWorld - Sistema Premium de Gestão de Milhas")
-            
-            print("\n💡 Quick verification commands:")
-            print("  nslookup www.lech.world")
-            print("  curl -I https://www.lech.world")
-            
-            # Wait and verify
-            print("\n⏳ Waiting 30 seconds before checking propagation...")
-            time.sleep(30)
-            verify_dns_propagation()
-            
-        else:
-            print("\n⚠️ Automated configuration failed")
-            print_manual_instructions()
-    else:
+    # One pooled client for the whole run: getHosts and setHosts share the connection
+    from namecheap_client import NamecheapClient
+    from zone_history import open_history
+    with NamecheapClient(api_user, api_key, client_ip, history=open_history()) as client:
+        # Check existing records
+        print("\n" + "="*60)
+        with span('fetch_hosts'):
+            current = delete_existing_records(client)
+        apply_changes(client, current, force, watch)
+
+def apply_changes(client, current, force=False, watch=True):
+    """Write step shared by both modes: setHosts, then authority and propagation checks"""
+    if current is None:
         print("\n⚠️ Could not access Namecheap API")
         print_manual_instructions()
+        return False
+    
+    # Configure new DNS records (skipped when the zone already matches)
+    with span('write_hosts'):
+        outcome = setup_dns_records(client, current, force)
+    
+    if outcome is None:
+        print("\n⚠️ Automated configuration failed")
+        print_manual_instructions()
+        return False
+    if not outcome.changed:
+        # Nothing was written, so there is nothing to wait for
+        print("\n💡 Check the live state any time with: nslookup www.lech.world")
+        return True
+    
+    print("\n" + "🎉"*20)
+    print("\n✅ SUCCESS! DNS configuration complete!")
+    print("\n📊 What happens next:")
+    print("  • 5-10 minutes: Initial propagation")
+    print("  • 30-60 minutes: Most locations updated")
+    print("  • Up to 24 hours: Full global propagation")
+    
+    print("\n🌐 Your site will be available at:")
+    print("  • https://www.lech.world (primary)")
+    print("  • https://lech.world (redirects to www)")
+    
+    print("\n✨ Test your site:")
+    print(f"  1. Wait 5-10 minutes")
+    print(f"  2. Visit: https://www.lech.world")
+    print(f"  3. You should see: LechWorld - Sistema Premium de Gestão de Milhas")
+    
+    print("\n💡 Quick verification commands:")
+    print("  nslookup www.lech.world")
+    print("  curl -I https://www.lech.world")
+    
+    # Confirm the change at the source, then watch recursive resolvers catch up
+    with span('authority_check'):
+        check_authoritative_dns()
+    check_edge_reachability()
+    if watch:
+        with span('propagation'):
+            watch_dns_propagation()
+    return True
+
+def run_unattended(api_user, api_key, client_ip=None, deadline=STARTUP_DEADLINE,
+                   force=False, watch=True):
+    """Non-interactive run: concurrent probes under one deadline, then the write step"""
+    print("="*70)
+    print(" 🌐 NAMECHEAP DNS CONFIGURATION FOR GITHUB PAGES (unattended)")
+    print("="*70)
+    
+    print(f"\n⚡ Probing DNS, client IP and current zone concurrently (deadline {deadline:g}s)...")
+    with span('startup_probes'):
+        probes = run_startup_probes(api_user, api_key, client_ip, deadline)
+    
+    if probes.answers is not None:
+        check_current_dns(probes.answers)
+    for probe, error in probes.errors.items():
+        print(f"⚠️  {probe} probe failed: {error}")
+    
+    if probes.fetched is None:
+        print("\n❌ Could not read the current zone, nothing was changed")
+        if probes.client_ip:
+            print(f"   Make sure {probes.client_ip} is whitelisted in Namecheap")
+        return False
+    
+    print(f"\n📍 Your IP address: {probes.client_ip}")
+    with probes.client as client:
+        current = delete_existing_records(client, probes.fetched)
+        return apply_changes(client, current, force, watch)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Point lech.world at GitHub Pages via the Namecheap API")
+    parser.add_argument('-y', '--yes', action='store_true',
+                        help="non-interactive; credentials from NAMECHEAP_API_USER / NAMECHEAP_API_KEY")
+    parser.add_argument('--client-ip', help="skip IP detection (--yes only)")
+    parser.add_argument('--deadline', type=float, default=STARTUP_DEADLINE,
+                        help="overall seconds for the pre-write probes (--yes only)")
+    parser.add_argument('--force', action='store_true', help="send setHosts even if the zone matches")
+    parser.add_argument('--no-watch', action='store_true', help="don't wait for propagation afterwards")
+    parser.add_argument('--resolver', action='append',
+                        help="resolver for the DNS checks (repeatable): IP, tls://host or "
+                             "https://host/dns-query (default: system + public resolvers)")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile CPU and memory per phase into $DNS_PROFILE_DIR (default ./profiles)")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.resolver:
+        DNS_RESOLVERS = args.resolver
+    if args.profile:
+        from run_profile import start_profiling
+        start_profiling('namecheap_dns_update')
+    ok = True
     try:
-        main()
+        if args.yes:
+            api_user = os.getenv('NAMECHEAP_API_USER')
+            api_key = os.getenv('NAMECHEAP_API_KEY')
+            if not api_user or not api_key:
+                print("❌ --yes needs NAMECHEAP_API_USER and NAMECHEAP_API_KEY")
+                ok = False
+            else:
+                ok = run_unattended(api_user, api_key, args.client_ip, args.deadline,
+                                    args.force, not args.no_watch)
+        else:
+            main(args.force, not args.no_watch)
     except KeyboardInterrupt:
         print("\n\n👋 Configuration cancelled")
         print_manual_instructions()
+        ok = False
     except Exception as e:
         print(f"\n❌ Unexpected error: {e}")
-        print_manual_instructions()
\ No newline at end of file
+        print_manual_instructions()
+        ok = False
+    finally:
+        print(f"\n⏱️  {METRICS.summary_line()}")
+        write_reports('namecheap_dns_update')
+    sys.exit(0 if ok else 1)
\ No newline at end of file
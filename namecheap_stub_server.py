@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Namecheap XML API
+Emulates namecheap.domains.dns.getHosts / setHosts and namecheap.domains.getList
+with the real xml.response namespace, the error codes the scripts handle
+(2019166, 2050900, 2011170), configurable latency and rate-limit responses,
+so the update flows can be exercised and benchmarked without the real API.
+--error-rate answers some requests with HTTP 502 before handling them, and
+--stall-rate holds some responses for --stall seconds after the command was
+applied, to exercise retries, hedging and lost-response writes.
+
+Usage: python3 namecheap_stub_server.py [--port 8999] [--domains 10] [--zone-size 5]
+                                        [--latency 0.05] [--per-minute 50]
+                                        [--error-rate 0.1] [--stall-rate 0.05 --stall 20]
+Then point a client at http://127.0.0.1:8999/xml.response
+"""
+
+import argparse
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from xml.sax.saxutils import escape, quoteattr
+
+from namecheap_client import HostRecord
+
+XMLNS = 'http://api.namecheap.com/xml.response'
+
+# Error numbers as the scripts expect them
+NO_RECORDS = '2019166'
+NOT_WHITELISTED = '2050900'
+BAD_CREDENTIALS = '2011170'
+TOO_MANY_REQUESTS = '500000'
+
+
+def _envelope(command, status, body='', errors=()):
+    error_xml = ''.join(f'<Error Number="{num}">{escape(text)}</Error>' for num, text in errors)
+    return (f'<?xml version="1.0" encoding="utf-8"?>\n'
+            f'<ApiResponse Status="{status}" xmlns="{XMLNS}">'
+            f'<Errors>{error_xml}</Errors><Warnings />'
+            f'<RequestedCommand>{escape(command)}</RequestedCommand>'
+            f'<CommandResponse Type={quoteattr(command)}>{body}</CommandResponse>'
+            f'<Server>STUB</Server><GMTTimeDifference>--0:00</GMTTimeDifference>'
+            f'<ExecutionTime>0.01</ExecutionTime></ApiResponse>').encode('utf-8')
+
+
+class StubState:
+    """Zones, credentials and counters shared by every request handler"""
+
+    def __init__(self, api_user='stub', api_key='stub-key', whitelist=None,
+                 latency=0.0, jitter=0.0, per_minute=None,
+                 error_rate=0.0, stall_rate=0.0, stall=20.0):
+        self.api_user = api_user
+        self.api_key = api_key
+        self.whitelist = set(whitelist) if whitelist else None   # None = allow any IP
+        self.latency = latency
+        self.jitter = jitter
+        self.per_minute = per_minute
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.zones = {}          # domain -> [HostRecord]; missing key = not in account
+        self.calls = {}          # command -> count
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+        self._recent = deque()
+        self._next_id = 1
+
+    def add_zone(self, domain, records):
+        with self.lock:
+            self.zones[domain.lower()] = [self._stamp(r) for r in records]
+
+    def _stamp(self, record):
+        stamped = HostRecord(record.name, record.type, record.address,
+                             record.ttl, record.mx_pref, str(self._next_id))
+        self._next_id += 1
+        return stamped
+
+    def _over_limit(self):
+        if not self.per_minute:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 60:
+            self._recent.popleft()
+        if len(self._recent) >= self.per_minute:
+            self.rate_limited += 1
+            return True
+        self._recent.append(now)
+        return False
+
+    def handle(self, params):
+        """Return the response body for one API request"""
+        command = params.get('Command', '')
+        with self.lock:
+            self.calls[command] = self.calls.get(command, 0) + 1
+            if self._over_limit():
+                return _envelope(command, 'ERROR', errors=[(TOO_MANY_REQUESTS, 'Too many requests')])
+        if params.get('ApiUser') != self.api_user or params.get('ApiKey') != self.api_key:
+            return _envelope(command, 'ERROR', errors=[(BAD_CREDENTIALS, 'API Key is invalid or API access has not been enabled')])
+        if self.whitelist is not None and params.get('ClientIp') not in self.whitelist:
+            return _envelope(command, 'ERROR', errors=[(NOT_WHITELISTED, 'Invalid request IP')])
+
+        if command == 'namecheap.domains.dns.getHosts':
+            return self._get_hosts(command, params)
+        if command == 'namecheap.domains.dns.setHosts':
+            return self._set_hosts(command, params)
+        if command == 'namecheap.domains.getList':
+            return self._get_list(command, params)
+        return _envelope(command, 'ERROR', errors=[('1010101', f'Unknown command {command}')])
+
+    def _domain(self, params):
+        return f"{params.get('SLD', '')}.{params.get('TLD', '')}".lower()
+
+    def _get_hosts(self, command, params):
+        domain = self._domain(params)
+        with self.lock:
+            records = list(self.zones.get(domain) or [])
+        if not records:
+            return _envelope(command, 'ERROR', errors=[(NO_RECORDS, f'No host records found for {domain}')])
+        hosts = ''.join(
+            f'<host HostId="{r.host_id}" Name={quoteattr(r.name)} Type="{r.type}" '
+            f'Address={quoteattr(r.address)} MXPref="{r.mx_pref}" TTL="{r.ttl}" '
+            f'AssociatedAppTitle="" FriendlyName="" IsActive="true" IsDDNSEnabled="false" />'
+            for r in records)
+        body = (f'<DomainDNSGetHostsResult Domain={quoteattr(domain)} EmailType="FWD" '
+                f'IsUsingOurDNS="true">{hosts}</DomainDNSGetHostsResult>')
+        return _envelope(command, 'OK', body)
+
+    def _set_hosts(self, command, params):
+        domain = self._domain(params)
+        records = []
+        i = 1
+        while f'HostName{i}' in params:
+            records.append(HostRecord(params[f'HostName{i}'], params.get(f'RecordType{i}', 'A'),
+                                      params.get(f'Address{i}', ''), params.get(f'TTL{i}'),
+                                      params.get(f'MXPref{i}')))
+            i += 1
+        with self.lock:
+            self.zones[domain] = [self._stamp(r) for r in records]
+        body = (f'<DomainDNSSetHostsResult Domain={quoteattr(domain)} IsSuccess="true">'
+                f'<Warnings /></DomainDNSSetHostsResult>')
+        return _envelope(command, 'OK', body)
+
+    def _get_list(self, command, params):
+        page = max(int(params.get('Page') or 1), 1)
+        size = min(max(int(params.get('PageSize') or 20), 10), 100)
+        with self.lock:
+            names = sorted(self.zones)
+        chunk = names[(page - 1) * size:page * size]
+        domains = ''.join(
+            f'<Domain ID="{n}" Name={quoteattr(name)} User={quoteattr(self.api_user)} '
+            f'Created="01/01/2024" Expires="01/01/2030" IsExpired="false" IsLocked="false" '
+            f'AutoRenew="true" WhoisGuard="ENABLED" IsPremium="false" IsOurDNS="true" />'
+            for n, name in enumerate(chunk, (page - 1) * size + 1))
+        body = (f'<DomainGetListResult>{domains}</DomainGetListResult>'
+                f'<Paging><TotalItems>{len(names)}</TotalItems><CurrentPage>{page}</CurrentPage>'
+                f'<PageSize>{size}</PageSize></Paging>')
+        return _envelope(command, 'OK', body)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, like the real endpoint
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def _respond(self, params):
+        state = self.server.state
+        if state.latency or state.jitter:
+            time.sleep(state.latency + random.uniform(0, state.jitter))
+        if state.error_rate and random.random() < state.error_rate:
+            self.send_response(502)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = state.handle(params)
+        if state.stall_rate and random.random() < state.stall_rate:
+            time.sleep(state.stall)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = self.rfile.read(length).decode('utf-8')
+        params = dict(parse_qsl(urlsplit(self.path).query))
+        params.update(parse_qsl(form, keep_blank_values=True))
+        self._respond(params)
+
+    def do_GET(self):
+        self._respond(dict(parse_qsl(urlsplit(self.path).query, keep_blank_values=True)))
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer:
+    """Threaded stub API server; use as a context manager or start()/stop()"""
+
+    def __init__(self, state=None, host='127.0.0.1', port=0):
+        self.state = state or StubState()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = self.state
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/xml.response'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def synthetic_zone(size, seed=0):
+    """A zone of ``size`` records: apex A records, a www CNAME, then TXT/A filler"""
+    rng = random.Random(seed)
+    records = [HostRecord('@', 'A', f'185.199.{108 + i}.153') for i in range(min(size, 4))]
+    if size > 4:
+        records.append(HostRecord('www', 'CNAME', 'leolech14.github.io'))
+    for i in range(len(records), size):
+        if i % 2:
+            records.append(HostRecord(f'host{i}', 'A', f'10.{rng.randrange(256)}.{rng.randrange(256)}.{i % 256}'))
+        else:
+            records.append(HostRecord(f'txt{i}', 'TXT', f'v=stub{i} token={rng.getrandbits(64):016x}'))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Namecheap API stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8999)
+    parser.add_argument('--domains', type=int, default=10, help="synthetic domains to create")
+    parser.add_argument('--zone-size', type=int, default=5, help="records per synthetic zone")
+    parser.add_argument('--latency', type=float, default=0.0, help="added seconds per request")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random seconds per request")
+    parser.add_argument('--per-minute', type=int, help="answer 'Too many requests' above this rate")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction answered with HTTP 502")
+    parser.add_argument('--stall-rate', type=float, default=0.0, help="fraction of responses held back")
+    parser.add_argument('--stall', type=float, default=20.0, help="seconds a held response waits")
+    parser.add_argument('--api-user', default='stub')
+    parser.add_argument('--api-key', default='stub-key')
+    parser.add_argument('--whitelist', nargs='*', help="allowed ClientIp values (default: any)")
+    args = parser.parse_args()
+
+    state = StubState(args.api_user, args.api_key, args.whitelist,
+                      args.latency, args.jitter, args.per_minute,
+                      args.error_rate, args.stall_rate, args.stall)
+    for i in range(args.domains):
+        state.add_zone(f'stub{i}.world', synthetic_zone(args.zone_size, seed=i))
+    server = StubServer(state, args.host, args.port)
+    print(f"🧪 Namecheap stub listening on {server.url} "
+          f"({args.domains} domains, user {args.api_user!r}, key {args.api_key!r})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Incremental content-hash manifest for the static export in out/
+Keeps a "path,mtime_ms,size,sha256" line per exported file (the same idea
+as Firebase's .firebase/hosting.*.cache, plus the size). On each run only
+files whose mtime or size changed are rehashed: large assets through mmap,
+and many files across a process pool. The result is the set of files
+added, modified and removed since the previous manifest, so deploys and
+post-deploy checks only need to touch what changed.
+
+Usage: python3 out_manifest.py [out] [--manifest .firebase/out.manifest]
+                               [--workers 4] [--full] [--json | --paths]
+"""
+
+import argparse
+import csv
+import fnmatch
+import hashlib
+import json
+import mmap
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from run_metrics import incr, span
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PUBLIC = os.path.join(ROOT, 'out')
+DEFAULT_MANIFEST = os.path.join(ROOT, '.firebase', 'out.manifest')
+FIREBASE_CONFIG = os.path.join(ROOT, 'firebase.json')
+
+# Same defaults as firebase.json's hosting.ignore
+DEFAULT_IGNORE = ['firebase.json', '**/.*', '**/node_modules/**']
+
+MMAP_THRESHOLD = 1 << 20      # hash files at least this big through mmap
+READ_CHUNK = 1 << 16
+POOL_MIN_BYTES = 8 << 20      # below this much work, hashing in-process is faster
+POOL_MIN_FILES = 64
+
+
+class Entry:
+    """One manifest line"""
+
+    __slots__ = ('mtime_ms', 'size', 'sha256')
+
+    def __init__(self, mtime_ms, size, sha256=None):
+        self.mtime_ms = mtime_ms
+        self.size = size
+        self.sha256 = sha256
+
+    def __repr__(self):
+        return f"Entry({self.mtime_ms}, {self.size}, {self.sha256[:12] if self.sha256 else None})"
+
+
+class Changes:
+    """Difference between the previous and the current manifest"""
+
+    def __init__(self):
+        self.added = []
+        self.modified = []
+        self.removed = []
+        self.unchanged = 0
+        self.rehashed = 0
+
+    @property
+    def changed(self):
+        """Paths whose content is new or different"""
+        return sorted(self.added + self.modified)
+
+    def to_dict(self):
+        return {'added': sorted(self.added), 'modified': sorted(self.modified),
+                'removed': sorted(self.removed), 'unchanged': self.unchanged,
+                'rehashed': self.rehashed}
+
+
+def hosting_ignore(config=FIREBASE_CONFIG):
+    """hosting.ignore globs from firebase.json, or Firebase's defaults"""
+    try:
+        with open(config) as f:
+            return json.load(f)['hosting'].get('ignore', DEFAULT_IGNORE)
+    except (OSError, ValueError, KeyError):
+        return DEFAULT_IGNORE
+
+
+def is_ignored(rel, patterns):
+    for pattern in patterns:
+        # '**/' also matches at the top level
+        if fnmatch.fnmatchcase(rel, pattern) or (
+                pattern.startswith('**/') and fnmatch.fnmatchcase(rel, pattern[3:])):
+            return True
+    return False
+
+
+def scan(public, patterns=None):
+    """{relative path: Entry without hash} for every file Firebase would upload"""
+    patterns = hosting_ignore() if patterns is None else patterns
+    found = {}
+    stack = [public]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as it:
+            for item in it:
+                rel = os.path.relpath(item.path, public).replace(os.sep, '/')
+                if is_ignored(rel, patterns):
+                    continue
+                if item.is_dir(follow_symlinks=False):
+                    stack.append(item.path)
+                elif item.is_file():
+                    st = item.stat()
+                    found[rel] = Entry(st.st_mtime_ns // 1_000_000, st.st_size)
+    return found
+
+
+def hash_file(path):
+    """SHA-256 hex digest; big files are hashed from an mmap instead of read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest.update(mm)
+        else:
+            for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_files(paths, sizes, workers=None):
+    """Digests for ``paths`` in order, spread over a process pool when it pays off"""
+    if not paths:
+        return []
+    if workers == 1 or (sum(sizes) < POOL_MIN_BYTES and len(paths) < POOL_MIN_FILES):
+        return [hash_file(path) for path in paths]
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(hash_file, paths, chunksize=max(1, len(paths) // (workers * 4))))
+
+
+def load_manifest(path=DEFAULT_MANIFEST):
+    """{relative path: Entry}; empty if the manifest doesn't exist yet
+
+    A truncated or corrupt manifest also loads as empty: it is only a
+    cache, and the next update_manifest() rehashes everything.
+    """
+    manifest = {}
+    try:
+        with open(path, newline='') as f:
+            for row in csv.reader(f):
+                if not row:
+                    continue
+                if len(row) != 4 or len(row[3]) != 64:
+                    raise ValueError(f"bad manifest row {row!r}")
+                manifest[row[0]] = Entry(int(row[1]), int(row[2]), row[3])
+    except (OSError, ValueError, csv.Error):
+        return {}
+    return manifest
+
+
+def write_manifest(manifest, path=DEFAULT_MANIFEST):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', newline='') as f:
+        writer = csv.writer(f)
+        for rel in sorted(manifest):
+            entry = manifest[rel]
+            writer.writerow([rel, entry.mtime_ms, entry.size, entry.sha256])
+    os.replace(tmp, path)
+
+
+def update_manifest(public=DEFAULT_PUBLIC, previous=None, workers=None, full=False, patterns=None):
+    """(current manifest, Changes) relative to ``previous``
+
+    Files with the same mtime and size as before keep their old hash; only
+    the rest are read. ``full`` rehashes everything.
+    """
+    previous = previous or {}
+    current = scan(public, patterns)
+    changes = Changes()
+
+    stale = [rel for rel, entry in current.items()
+             if full or rel not in previous
+             or (previous[rel].mtime_ms, previous[rel].size) != (entry.mtime_ms, entry.size)]
+    with span('manifest_hash'):
+        digests = hash_files([os.path.join(public, rel) for rel in stale],
+                             [current[rel].size for rel in stale], workers)
+    changes.rehashed = len(stale)
+
+    for rel, digest in zip(stale, digests):
+        current[rel].sha256 = digest
+    for rel, entry in current.items():
+        old = previous.get(rel)
+        if entry.sha256 is None:
+            entry.sha256 = old.sha256
+            changes.unchanged += 1
+        elif old is None:
+            changes.added.append(rel)
+        elif old.sha256 != entry.sha256:
+            changes.modified.append(rel)
+        else:
+            changes.unchanged += 1      # touched, same bytes
+    changes.removed = [rel for rel in previous if rel not in current]
+
+    incr('manifest_files', len(changes.added), state='added')
+    incr('manifest_files', len(changes.modified), state='modified')
+    incr('manifest_files', len(changes.removed), state='removed')
+    incr('manifest_rehashed', changes.rehashed)
+    return current, changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the out/ content-hash manifest and list changes")
+    parser.add_argument('public', nargs='?', default=DEFAULT_PUBLIC, help="export directory (default out/)")
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    parser.add_argument('--workers', type=int, help="hashing processes (default: CPU count)")
+    parser.add_argument('--full', action='store_true', help="rehash every file")
+    parser.add_argument('--dry-run', action='store_true', help="don't write the new manifest")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--json', action='store_true', help="print the change set as JSON")
+    output.add_argument('--paths', action='store_true', help="print changed paths, one per line")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.public):
+        print(f"❌ {args.public} is not a directory (run the static export first)")
+        sys.exit(1)
+
+    previous = load_manifest(args.manifest)
+    manifest, changes = update_manifest(args.public, previous, args.workers, args.full)
+    if not args.dry_run:
+        write_manifest(manifest, args.manifest)
+
+    if args.json:
+        print(json.dumps(changes.to_dict(), indent=2))
+    elif args.paths:
+        for rel in changes.changed:
+            print(rel)
+    else:
+        print(f"📦 {len(manifest)} files, {changes.rehashed} rehashed: "
+              f"{len(changes.added)} added, {len(changes.modified)} modified, "
+              f"{len(changes.removed)} removed, {changes.unchanged} unchanged")
+        for label, paths in (('+', changes.added), ('~', changes.modified), ('-', changes.removed)):
+            for rel in sorted(paths):
+                print(f"   {label} {rel}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Token-bucket rate limiting for Namecheap API calls
+Namecheap enforces per-minute, per-hour and per-day quotas per account;
+every call has to take a token from each bucket before it is sent
+"""
+
+import threading
+import time
+
+from run_metrics import METRICS
+
+# Namecheap API quotas per account
+PER_MINUTE = 50
+PER_HOUR = 700
+PER_DAY = 8000
+
+
+class TokenBucket:
+    """Bucket holding up to ``capacity`` tokens, refilled evenly over ``period`` seconds"""
+
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available"""
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Thread-safe scheduler drawing one token from every bucket per call"""
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        """Block until every bucket has a token, then consume them"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = max(bucket.wait_time(now) for bucket in self.buckets)
+                if wait <= 0:
+                    for bucket in self.buckets:
+                        bucket.tokens -= 1
+                    return
+                self.waited += wait
+            METRICS.observe('rate_limit_wait', wait)
+            time.sleep(wait)
+
+
+def namecheap_limiter(per_minute=PER_MINUTE, per_hour=PER_HOUR, per_day=PER_DAY):
+    """RateLimiter matching Namecheap's documented API quotas"""
+    return RateLimiter([
+        TokenBucket(per_minute, 60),
+        TokenBucket(per_hour, 3600),
+        TokenBucket(per_day, 86400),
+    ])
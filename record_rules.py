@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Offline pre-flight checks for Namecheap record sets
+Runs before any network I/O: on the desired records before a domain is
+touched, and on the zone a change plan would produce before setHosts is
+sent. Every problem is reported at once, each under a stable rule ID, so
+a bad domain in a batch fails in microseconds instead of burning a
+rate-limited API call (and the timeout budget) on an error code.
+
+Errors block the write; warnings are reported but don't.
+
+    R101 unsupported-type    R201 duplicate          R301 too-many-records
+    R102 bad-name            R202 cname-apex         R302 empty-zone
+    R103 ttl-range           R203 cname-coexist      R401 drops-mail
+    R104 bad-address         R204 cname-loop
+    R105 bad-target          R205 mx-to-cname
+    R106 empty-txt           R206 rrset-ttl
+    R107 mx-pref-range       R207 apex-ns
+    R108 private-address
+
+Usage: python3 record_rules.py zones/lech.world.zone [--domain lech.world] [--json]
+"""
+
+import argparse
+import ipaddress
+import json
+import re
+import sys
+
+SUPPORTED_TYPES = ('A', 'AAAA', 'CNAME', 'MX', 'TXT', 'NS')
+MIN_TTL = 60
+MAX_TTL = 60000
+# More host records than this in one setHosts are rejected by Namecheap
+MAX_RECORDS = 150
+
+LABEL = re.compile(r'^(\*|[a-z0-9_]([a-z0-9_-]{0,61}[a-z0-9_])?)$')
+
+ERROR = 'error'
+WARNING = 'warning'
+
+RULES = {
+    'R101': ('unsupported-type', ERROR),
+    'R102': ('bad-name', ERROR),
+    'R103': ('ttl-range', ERROR),
+    'R104': ('bad-address', ERROR),
+    'R105': ('bad-target', ERROR),
+    'R106': ('empty-txt', ERROR),
+    'R107': ('mx-pref-range', ERROR),
+    'R108': ('private-address', WARNING),
+    'R201': ('duplicate', ERROR),
+    'R202': ('cname-apex', ERROR),
+    'R203': ('cname-coexist', ERROR),
+    'R204': ('cname-loop', ERROR),
+    'R205': ('mx-to-cname', WARNING),
+    'R206': ('rrset-ttl', WARNING),
+    'R207': ('apex-ns', ERROR),
+    'R301': ('too-many-records', ERROR),
+    'R302': ('empty-zone', ERROR),
+    'R401': ('drops-mail', WARNING),
+}
+
+
+class Violation:
+    """One rule broken by one record (or by the set as a whole)"""
+
+    __slots__ = ('rule', 'message', 'source', 'record')
+
+    def __init__(self, rule, message, source=None, record=None):
+        self.rule = rule
+        self.message = message
+        self.source = source
+        self.record = record
+
+    @property
+    def name(self):
+        return RULES[self.rule][0]
+
+    @property
+    def severity(self):
+        return RULES[self.rule][1]
+
+    def to_dict(self):
+        return {'rule': self.rule, 'name': self.name, 'severity': self.severity,
+                'source': self.source, 'message': self.message}
+
+    def __str__(self):
+        where = self.source or ''
+        if self.record is not None:
+            where = f"{where} ({self.record.name} {self.record.type})".strip()
+        return f"[{self.rule}] {where + ': ' if where else ''}{self.message}"
+
+    def __repr__(self):
+        return f"Violation({self})"
+
+
+class InvalidRecords(ValueError):
+    """A record set failed pre-flight checks; ``violations`` has all of them"""
+
+    def __init__(self, violations, domain=None):
+        self.violations = violations
+        prefix = f"{domain}: " if domain else ""
+        super().__init__(prefix + "; ".join(str(v) for v in violations))
+
+
+def valid_name(name):
+    return name == '@' or all(LABEL.match(label) for label in name.lower().split('.'))
+
+
+def errors(violations):
+    return [v for v in violations if v.severity == ERROR]
+
+
+def _check_record(record, where, out):
+    def add(rule, message):
+        out.append(Violation(rule, message, where, record))
+
+    if record.type not in SUPPORTED_TYPES:
+        add('R101', f"unsupported type (use one of {', '.join(SUPPORTED_TYPES)})")
+        return
+    if not valid_name(record.name):
+        add('R102', "bad host name")
+    if not MIN_TTL <= record.ttl <= MAX_TTL:
+        add('R103', f"TTL {record.ttl} outside {MIN_TTL}-{MAX_TTL}")
+    if record.type in ('A', 'AAAA'):
+        version = 4 if record.type == 'A' else 6
+        try:
+            ip = ipaddress.ip_address(record.address)
+        except ValueError:
+            ip = None
+        if ip is None or ip.version != version:
+            add('R104', f"{record.address!r} is not an IPv{version} address")
+        elif not ip.is_global:
+            add('R108', f"{record.address} is not publicly routable")
+    elif record.type in ('CNAME', 'MX', 'NS'):
+        target = record.address.rstrip('.')
+        if not target or record.address == '@' or not valid_name(target):
+            add('R105', f"bad target {record.address!r}")
+    elif record.type == 'TXT' and not record.address:
+        add('R106', "empty TXT record")
+    if record.type == 'MX' and not 0 <= record.mx_pref <= 65535:
+        add('R107', f"MX preference {record.mx_pref} out of range")
+
+
+def _fqdn(name, domain):
+    name = name.lower().rstrip('.')
+    if not domain:
+        return name
+    return domain if name == '@' else f"{name}.{domain}"
+
+
+def check_records(records, domain=None, sources=None):
+    """Every Violation in a desired record set, in record order
+
+    ``sources`` optionally labels each record (e.g. "line 12") for messages.
+    """
+    domain = domain.lower().rstrip('.') if domain else None
+    out = []
+    seen = {}
+    by_name = {}
+    ttls = {}
+    for i, record in enumerate(records):
+        where = sources[i] if sources else f"record {i + 1}"
+        _check_record(record, where, out)
+        if record.type not in SUPPORTED_TYPES:
+            continue
+        if record.key in seen:
+            out.append(Violation('R201', f"duplicate of {seen[record.key]}", where, record))
+        seen.setdefault(record.key, where)
+        by_name.setdefault(record.key[0], []).append((record, where))
+        ttls.setdefault(record.key[:2], set()).add(record.ttl)
+        if record.type == 'NS' and record.key[0] == '@':
+            out.append(Violation('R207', "apex NS records are managed by Namecheap", where, record))
+
+    cname_targets = {}
+    for name, entries in by_name.items():
+        cnames = [(r, w) for r, w in entries if r.type == 'CNAME']
+        if not cnames:
+            continue
+        record, where = cnames[0]
+        if name == '@':
+            out.append(Violation('R202', "CNAME at the apex is not allowed (use A records)", where, record))
+        others = sorted({r.type for r, _ in entries} - {'CNAME'})
+        if others or len(cnames) > 1:
+            what = ', '.join(others) if others else 'another CNAME'
+            out.append(Violation('R203', f"CNAME at {name} can't coexist with {what}", where, record))
+        cname_targets[_fqdn(name, domain)] = (record.address.lower().rstrip('.'), record, where)
+
+    # CNAME chains that stay inside the zone and come back around
+    for start, (_, record, where) in cname_targets.items():
+        node, path = start, [start]
+        while node in cname_targets:
+            node = cname_targets[node][0]
+            if node == start:
+                out.append(Violation('R204', f"CNAME loop {' → '.join(path + [start])}", where, record))
+                break
+            if node in path:
+                break
+            path.append(node)
+
+    for name, entries in by_name.items():
+        for record, where in entries:
+            if record.type == 'MX' and record.address.lower().rstrip('.') in cname_targets:
+                out.append(Violation('R205', f"MX target {record.address} is a CNAME", where, record))
+
+    for (name, type_), values in ttls.items():
+        if len(values) > 1:
+            out.append(Violation('R206', f"{type_} records at {name} have different TTLs "
+                                         f"({', '.join(map(str, sorted(values)))})"))
+
+    if len(records) > MAX_RECORDS:
+        out.append(Violation('R301', f"{len(records)} records, setHosts takes at most {MAX_RECORDS}"))
+    return out
+
+
+def apply_plan(current, plan):
+    """The zone ``plan`` would leave behind (what setHosts is about to write)"""
+    removed = {r.key for r in plan.remove} | {old.key for old, _ in plan.modify}
+    merged = [r for r in current if r.key not in removed]
+    merged += [new for _, new in plan.modify] + plan.add
+    return merged
+
+
+def check_plan(current, plan, domain=None, allow_empty=False):
+    """Violations of the zone after ``plan``, plus rules about the change itself"""
+    merged = apply_plan(current, plan)
+    out = check_records(merged, domain)
+    if not merged and current and not allow_empty:
+        out.append(Violation('R302', f"plan removes all {len(current)} records"))
+    if any(r.type == 'MX' for r in current) and not any(r.type == 'MX' for r in merged):
+        out.append(Violation('R401', "plan removes every MX record; mail for the domain stops"))
+    return out
+
+
+def preflight(records, domain=None, sources=None):
+    """Raise InvalidRecords listing every error; returns the warnings"""
+    violations = check_records(records, domain, sources)
+    if errors(violations):
+        raise InvalidRecords(errors(violations), domain)
+    return violations
+
+
+def print_violations(violations):
+    for v in violations:
+        icon = '❌' if v.severity == ERROR else '⚠️ '
+        print(f"{icon} {v}")
+
+
+def main():
+    from zone_file import ZoneError, parse_zone
+
+    parser = argparse.ArgumentParser(description="Check a zone file against every pre-flight rule")
+    parser.add_argument('zone_file')
+    parser.add_argument('--domain', help="zone origin (default: from the file)")
+    parser.add_argument('--json', action='store_true', help="print violations as JSON")
+    args = parser.parse_args()
+
+    try:
+        with open(args.zone_file, encoding='utf-8') as f:
+            origin, entries = parse_zone(f.read(), args.zone_file, args.domain)
+    except (OSError, ZoneError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    violations = check_records([r for _, r in entries], origin, [s for s, _ in entries])
+
+    if args.json:
+        print(json.dumps([v.to_dict() for v in violations], indent=2))
+    elif violations:
+        print_violations(violations)
+    else:
+        print(f"✅ {origin}: {len(entries)} records, no violations")
+    sys.exit(1 if errors(violations) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Retries, hedging and a circuit breaker for registrar calls
+Reads (getHosts, getList) are idempotent: a failed or malformed read is
+retried with jittered exponential backoff, and a read still running after
+``hedge_after`` seconds gets a duplicate request; whichever answers first
+wins. Run time is set by rare API stalls, and the hedge cuts those off
+without waiting for the read timeout.
+
+setHosts is never retried blindly. After a failure whose outcome is
+unknown (timeout, dropped connection) the zone is read back, and the
+write is only sent again if it did not land.
+
+One circuit breaker is shared by every call made through a client. After
+``threshold`` consecutive failures it fails fast with CircuitOpenError (a
+TransportError, so callers handle it like any connection error) and lets
+a single trial call through every ``reset_after`` seconds.
+"""
+
+import queue
+import random
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+from http_transport import TransportError
+from run_metrics import incr
+
+# "Too many requests": rejected before anything was applied, safe to resend
+TOO_MANY_REQUESTS = '500000'
+
+# Failures worth another attempt; API errors (bad credentials, unknown
+# domain...) come back as ApiResults and are returned as they are
+TRANSIENT = (TransportError, ET.ParseError)
+
+
+class CircuitOpenError(TransportError):
+    """The breaker is open; the call was not sent"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker shared by all threads using one endpoint"""
+
+    def __init__(self, threshold=5, reset_after=30.0):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False       # a half-open trial call is in flight
+        self.lock = threading.Lock()
+
+    def _state(self, now):
+        if self.opened_at is None:
+            return 'closed'
+        if now - self.opened_at >= self.reset_after:
+            return 'half-open'
+        return 'open'
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._state(time.monotonic())
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may be sent now"""
+        with self.lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == 'open' or (state == 'half-open' and self.trial):
+                incr('circuit_rejected')
+                wait = max(0.0, self.opened_at + self.reset_after - now)
+                raise CircuitOpenError(f"circuit open after {self.failures} consecutive failures "
+                                       f"(next try in {wait:.0f}s)")
+            if state == 'half-open':
+                self.trial = True
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    incr('circuit_opened')
+                # A failed trial re-opens for another full period
+                self.opened_at = time.monotonic()
+                self.trial = False
+
+
+class CallPolicy:
+    """How a NamecheapClient retries, hedges and sheds its calls
+
+    ``retries`` extra attempts after the first, backoff drawn uniformly
+    from [0, min(max_backoff, backoff * 2**n)] ("full jitter"). A
+    ``hedge_after`` of None disables hedging. The timeouts are per attempt
+    and only used when neither the call nor the client sets one.
+
+    ``budget`` caps the seconds one read or write may take in total,
+    retries, backoff and hedges included: attempt timeouts are cut to what
+    is left and no retry starts once it is spent.
+    """
+
+    def __init__(self, retries=3, backoff=0.5, max_backoff=8.0, hedge_after=2.0,
+                 read_timeout=(5, 10), write_timeout=(5, 30), breaker=None, budget=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget
+
+    def delay(self, attempt):
+        """Seconds to sleep before retry number ``attempt`` (1-based)"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def _ends(self):
+        return time.monotonic() + self.budget if self.budget else None
+
+    def _backoff(self, attempt, ends):
+        """Sleep before a retry; False if the budget would run out first"""
+        pause = self.delay(attempt)
+        if ends is not None and time.monotonic() + pause >= ends:
+            return False
+        time.sleep(pause)
+        return True
+
+    @staticmethod
+    def _within(timeout, ends):
+        """``timeout`` (a number or a (connect, read) pair) cut to the budget left"""
+        if ends is None:
+            return timeout
+        left = max(0.01, ends - time.monotonic())
+        if isinstance(timeout, tuple):
+            return tuple(min(part, left) for part in timeout)
+        return min(timeout, left)
+
+    def _guarded(self, call, timeout):
+        self.breaker.before_call()
+        try:
+            result = call(timeout)
+        except TRANSIENT:
+            self.breaker.failure()
+            raise
+        self.breaker.success()
+        return result
+
+    def _hedged(self, call, ends=None):
+        """First successful answer from the call and, if it is slow, one duplicate"""
+        if not self.hedge_after:
+            return self._guarded(call, self._within(self.read_timeout, ends))
+        answers = queue.Queue()
+
+        def attempt(hedge):
+            try:
+                answers.put((hedge, None, self._guarded(call, self._within(self.read_timeout, ends))))
+            except Exception as e:
+                answers.put((hedge, e, None))
+
+        # Daemon threads: a stalled loser must not hold up interpreter exit
+        threading.Thread(target=attempt, args=(False,), daemon=True).start()
+        try:
+            hedge, error, result = answers.get(timeout=self.hedge_after)
+            pending = 0
+        except queue.Empty:
+            incr('api_hedges')
+            threading.Thread(target=attempt, args=(True,), daemon=True).start()
+            hedge, error, result = answers.get()
+            pending = 1
+        if error is not None and pending:
+            # Give the other request one more hedge interval before retrying
+            try:
+                hedge, error, result = answers.get(timeout=self.hedge_after)
+            except queue.Empty:
+                pass
+        if error is not None:
+            raise error
+        if hedge:
+            incr('api_hedge_wins')
+        return result
+
+    def read(self, call, command):
+        """Run an idempotent call; ``call(timeout)`` returns an ApiResult"""
+        outcome = reason = None
+        ends = self._ends()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                if not self._backoff(attempt, ends):
+                    break
+                incr('api_retries', command=command, reason=reason)
+            try:
+                outcome = self._hedged(call, ends)
+            except CircuitOpenError:
+                raise
+            except TRANSIENT as e:
+                outcome, reason = e, e.__class__.__name__
+                continue
+            if not outcome.has_error(TOO_MANY_REQUESTS):
+                return outcome
+            reason = 'rate_limited'
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def write(self, call, landed, command):
+        """Run a non-idempotent call, resending only when a read-back says it didn't land
+
+        ``landed()`` is called after an ambiguous failure and returns an ok
+        ApiResult if the write is visible, or None if it is not. If the
+        read-back itself fails the original error is raised: without
+        knowing the state, sending again would be a blind retry.
+        """
+        reason = None
+        ends = self._ends()
+        for attempt in range(self.retries + 1):
+            if attempt:
+                if not self._backoff(attempt, ends):
+                    break
+                incr('api_retries', command=command, reason=reason)
+            try:
+                result = self._guarded(call, self._within(self.write_timeout, ends))
+            except CircuitOpenError:
+                raise
+            except TRANSIENT as e:
+                error = e
+                try:
+                    confirmed = landed()
+                except TRANSIENT:
+                    raise error from None
+                if confirmed is not None:
+                    incr('api_write_confirmed', command=command)
+                    return confirmed
+                reason = e.__class__.__name__
+                continue
+            if not result.has_error(TOO_MANY_REQUESTS) or attempt == self.retries:
+                return result
+            reason = 'rate_limited'
+        # Out of budget: the last answer if it was one, else the last error
+        if reason == 'rate_limited':
+            return result
+        raise error
@@ -0,0 +1,183 @@
+"""
+Phase timing and counters for the DNS scripts
+Every run collects wall-clock and on-CPU time per phase (IP detection,
+getHosts, setHosts, XML parsing, DNS checks, propagation) and counters (API calls,
+retries, DNS queries) in the process-wide METRICS object. At the end of a
+run they can be appended as one JSON line and/or written as a Prometheus
+text-format file, selected with environment variables:
+
+    DNS_METRICS_JSONL=/var/log/lechworld/dns-runs.jsonl
+    DNS_METRICS_PROM=/var/lib/node_exporter/textfile/lechworld_dns.prom
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+JSONL_ENV = 'DNS_METRICS_JSONL'
+PROM_ENV = 'DNS_METRICS_PROM'
+
+
+# Counters worth surfacing in summary_line when non-zero
+SUMMARY_COUNTERS = (('api_retries', 'retries'), ('api_hedges', 'hedged reads'),
+                    ('circuit_opened', 'circuit trips'))
+
+
+class RunMetrics:
+    """Aggregated spans and labelled counters for one run (thread-safe)"""
+
+    def __init__(self):
+        self.run_id = os.urandom(6).hex()
+        self.started = time.time()
+        self.phases = {}     # phase -> {'count', 'seconds', 'max', 'errors'}
+        self.counters = {}   # (name, ((label, value), ...)) -> number
+        self.profiler = None   # a run_profile.RunProfiler while --profile is on
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, phase):
+        """Time a block (wall and this thread's CPU); exceptions are counted as errors and re-raised"""
+        profiler = self.profiler
+        with profiler.phase(phase) if profiler else contextlib.nullcontext():
+            started = time.perf_counter()
+            cpu_started = time.thread_time()
+            failed = False
+            try:
+                yield
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                self.observe(phase, time.perf_counter() - started, failed,
+                             time.thread_time() - cpu_started)
+
+    def observe(self, phase, seconds, failed=False, cpu=0.0):
+        with self.lock:
+            stats = self.phases.setdefault(phase, {'count': 0, 'seconds': 0.0, 'cpu': 0.0,
+                                                   'max': 0.0, 'errors': 0})
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['cpu'] += cpu
+            stats['max'] = max(stats['max'], seconds)
+            stats['errors'] += failed
+
+    def incr(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def snapshot(self, script):
+        """Everything collected so far as a JSON-serializable dict"""
+        with self.lock:
+            phases = {phase: dict(stats, seconds=round(stats['seconds'], 6), cpu=round(stats['cpu'], 6),
+                                  max=round(stats['max'], 6))
+                      for phase, stats in self.phases.items()}
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+        return {
+            'run_id': self.run_id,
+            'script': script,
+            'started': round(self.started, 3),
+            'seconds': round(time.time() - self.started, 6),
+            'phases': phases,
+            'counters': counters,
+        }
+
+    def total(self, name):
+        """Sum of a counter over all its label combinations"""
+        with self.lock:
+            return sum(value for (counter, _), value in self.counters.items() if counter == name)
+
+    def summary_line(self):
+        """Short human-readable timing line for the end of a run"""
+        with self.lock:
+            parts = [f"{phase} {stats['seconds']:.2f}s" + (f"×{stats['count']}" if stats['count'] > 1 else "")
+                     for phase, stats in self.phases.items()]
+        for name, label in SUMMARY_COUNTERS:
+            value = self.total(name)
+            if value:
+                parts.append(f"{value} {label}")
+        return " · ".join(parts)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def prom_labels(labels):
+    """Prometheus label set for (name, value) pairs, '' when there are none"""
+    if not labels:
+        return ''
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels) + '}'
+
+
+def to_prometheus(snapshot):
+    """Prometheus text exposition format for one run snapshot"""
+    script = (('script', snapshot['script']),)
+    lines = [
+        '# HELP lechworld_dns_run_seconds Wall-clock duration of the last run',
+        '# TYPE lechworld_dns_run_seconds gauge',
+        f"lechworld_dns_run_seconds{prom_labels(script)} {snapshot['seconds']}",
+        '# HELP lechworld_dns_run_timestamp_seconds Start time of the last run',
+        '# TYPE lechworld_dns_run_timestamp_seconds gauge',
+        f"lechworld_dns_run_timestamp_seconds{prom_labels(script)} {snapshot['started']}",
+        '# HELP lechworld_dns_phase_seconds Time spent per phase in the last run',
+        '# TYPE lechworld_dns_phase_seconds gauge',
+    ]
+    for phase, stats in sorted(snapshot['phases'].items()):
+        lines.append(f"lechworld_dns_phase_seconds{prom_labels(script + (('phase', phase),))} {stats['seconds']}")
+    lines += ['# HELP lechworld_dns_phase_cpu_seconds On-CPU time per phase in the last run',
+              '# TYPE lechworld_dns_phase_cpu_seconds gauge']
+    for phase, stats in sorted(snapshot['phases'].items()):
+        lines.append(f"lechworld_dns_phase_cpu_seconds{prom_labels(script + (('phase', phase),))} {stats['cpu']}")
+    lines += ['# HELP lechworld_dns_phase_count Times each phase ran in the last run',
+              '# TYPE lechworld_dns_phase_count gauge']
+    for phase, stats in sorted(snapshot['phases'].items()):
+        lines.append(f"lechworld_dns_phase_count{prom_labels(script + (('phase', phase),))} {stats['count']}")
+    seen = set()
+    for counter in snapshot['counters']:
+        metric = f"lechworld_dns_{counter['name']}"
+        if metric not in seen:
+            lines.append(f'# TYPE {metric} gauge')
+            seen.add(metric)
+        lines.append(f"{metric}{prom_labels(script + tuple(sorted(counter['labels'].items())))} {counter['value']}")
+    return '\n'.join(lines) + '\n'
+
+
+def write_reports(script, metrics=None, jsonl_path=None, prom_path=None):
+    """Append the run to the JSON-lines log and/or rewrite the .prom file
+
+    Paths default to DNS_METRICS_JSONL / DNS_METRICS_PROM; nothing is written
+    when neither is set. The .prom file is replaced atomically so a scraper
+    never reads a half-written file.
+    """
+    metrics = metrics or METRICS
+    jsonl_path = jsonl_path or os.getenv(JSONL_ENV)
+    prom_path = prom_path or os.getenv(PROM_ENV)
+    if not (jsonl_path or prom_path):
+        return None
+    snapshot = metrics.snapshot(script)
+    if jsonl_path:
+        with open(jsonl_path, 'a') as f:
+            f.write(json.dumps(snapshot) + '\n')
+    if prom_path:
+        tmp = f"{prom_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(to_prometheus(snapshot))
+        os.replace(tmp, prom_path)
+    return snapshot
+
+
+# Process-wide collector used by the client, resolver and scripts
+METRICS = RunMetrics()
+span = METRICS.span
+incr = METRICS.incr
@@ -0,0 +1,259 @@
+"""
+CPU and memory profiling of a whole run, split by phase
+--profile on the entry points runs the workflow under cProfile and
+tracemalloc. Phases are the run_metrics spans (getHosts, xml_parse,
+build_params, dns_check...): each thread switches to a per-phase profiler
+when it enters a span and back when it leaves, so time in a nested span
+only counts toward the innermost phase and work outside any span lands in
+"other". At exit the directory $DNS_PROFILE_DIR (default ./profiles)
+gets one folder per run holding:
+
+    run.pstats            everything, all threads
+    <phase>.pstats        that phase only (python3 -m pstats <file>)
+    <phase>.alloc.txt     top allocation sites still held when the phase ended
+    summary.txt           wall vs on-CPU seconds per phase (nested phases included)
+
+Wall time minus CPU time is time spent waiting (network, locks, sleeps),
+so a slow phase that is mostly waiting is not mistaken for compute.
+Allocations are compared across the first run of each phase only: the
+snapshots are cheap, but diffing them is a Python loop over every traced
+block, so that is left until the run is over and tracing has stopped.
+tracemalloc is process-wide: allocations by other threads running at the
+same time show up in the phase too.
+
+From Python 3.12 cProfile sits on sys.monitoring, which allows one active
+profiler per process, covering every thread. There the run gets a single
+profiler: run.pstats and the per-phase summary and allocation reports
+are written as usual, but no <phase>.pstats.
+"""
+
+import atexit
+import contextlib
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+from run_metrics import METRICS
+
+PROFILE_ENV = 'DNS_PROFILE_DIR'
+OTHER = 'other'
+TOP_N = 15
+TRACE_FRAMES = 1
+
+# Before sys.monitoring (3.12) every thread can have its own active profiler
+PER_PHASE = sys.version_info < (3, 12)
+
+# Our own bookkeeping, left out of the allocation reports
+_IGNORED = {tracemalloc.__file__, cProfile.__file__, pstats.__file__, __file__}
+
+
+class RunProfiler:
+    """Per-phase, per-thread cProfile and tracemalloc for one run"""
+
+    def __init__(self, script, directory=None, top=TOP_N):
+        self.script = script
+        self.directory = directory or os.getenv(PROFILE_ENV) or 'profiles'
+        self.top = top
+        self.profiles = {}        # (phase, thread id) -> cProfile.Profile
+        self.samples = {}         # phase -> (snapshot before, after) of its first run
+        self.overhead = 0.0       # seconds spent taking snapshots
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.started = None
+        self.whole = None         # the one process-wide profiler when not PER_PHASE
+
+    def _profile(self, phase):
+        key = (phase, threading.get_ident())
+        with self.lock:
+            if key not in self.profiles:
+                self.profiles[key] = cProfile.Profile()
+            return self.profiles[key]
+
+    def _pause(self):
+        if not PER_PHASE:
+            return
+        current = getattr(self.local, 'profile', None)
+        if current is not None:
+            current.disable()
+        self.local.profile = None
+
+    def _resume(self, phase):
+        """Make ``phase``'s profiler the active one for this thread"""
+        if not PER_PHASE:
+            return
+        self.local.profile = self._profile(phase)
+        self.local.profile.enable()
+
+    def _thread_started(self, frame, event, arg):
+        # threading.setprofile hook: runs once in every new thread, then
+        # cProfile's own hook replaces it
+        self._resume(OTHER)
+
+    def start(self):
+        self.started = (time.perf_counter(), time.process_time())
+        tracemalloc.start(TRACE_FRAMES)
+        if PER_PHASE:
+            threading.setprofile(self._thread_started)
+            self._resume(OTHER)
+        else:
+            self.whole = cProfile.Profile()
+            self.whole.enable()
+        METRICS.profiler = self
+
+    def _snapshot(self, phase=None):
+        """A snapshot, or None if ``phase`` already has its sample"""
+        with self.lock:
+            if phase is not None:
+                if phase in self.samples:
+                    return None
+                self.samples[phase] = None
+        started = time.perf_counter()
+        snapshot = tracemalloc.take_snapshot()
+        with self.lock:
+            self.overhead += time.perf_counter() - started
+        return snapshot
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Attribute CPU and allocations inside the block to ``name``"""
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        # Snapshots and bookkeeping run unprofiled
+        self._pause()
+        before = self._snapshot(name)
+        stack.append(name)
+        self._resume(name)
+        try:
+            yield
+        finally:
+            self._pause()
+            stack.pop()
+            if before is not None:
+                after = self._snapshot()
+                with self.lock:
+                    self.samples[name] = (before, after)
+            self._resume(stack[-1] if stack else OTHER)
+
+    def stop(self):
+        """Stop profiling and write the reports; returns (run folder, summary text)"""
+        METRICS.profiler = None
+        if PER_PHASE:
+            threading.setprofile(None)
+            self._pause()
+        else:
+            self.whole.disable()
+        wall = time.perf_counter() - self.started[0]
+        cpu = time.process_time() - self.started[1]
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(METRICS.started))
+        folder = os.path.join(self.directory, f"{self.script}-{stamp}-{METRICS.run_id}")
+        os.makedirs(folder, exist_ok=True)
+        with self.lock:
+            profiles = dict(self.profiles)
+        if self.whole is not None:
+            profiles[(None, None)] = self.whole
+        by_phase = {}
+        for (phase, _), profile in profiles.items():
+            if phase is not None:
+                by_phase.setdefault(phase, []).append(profile)
+        for phase, group in by_phase.items():
+            stats = _merged(group)
+            if stats is not None:
+                stats.dump_stats(os.path.join(folder, f"{_filename(phase)}.pstats"))
+        stats = _merged(profiles.values())
+        if stats is not None:
+            stats.dump_stats(os.path.join(folder, 'run.pstats'))
+        for phase, sample in self.samples.items():
+            if sample is not None:
+                with open(os.path.join(folder, f"{_filename(phase)}.alloc.txt"), 'w') as f:
+                    f.write(self.allocation_report(phase, *sample))
+
+        summary = self.summary(wall, cpu, peak)
+        with open(os.path.join(folder, 'summary.txt'), 'w') as f:
+            f.write(summary + '\n')
+        return folder, summary
+
+    def allocation_report(self, phase, before, after):
+        """Top allocation sites by growth over the first run of ``phase``"""
+        # Filtering the diff, not the snapshots: Snapshot.filter_traces is
+        # another Python loop over every traced block
+        diff = [stat for stat in after.compare_to(before, 'lineno')
+                if stat.size_diff > 0 and stat.traceback[0].filename not in _IGNORED]
+        lines = [f"Top {self.top} allocation sites in {phase} "
+                 f"(still held at the end of its first run)", ""]
+        for stat in diff[:self.top]:
+            frame = stat.traceback[0]
+            lines.append(f"{_kib(stat.size_diff):>10}  {stat.count_diff:>+7} blocks  "
+                         f"{_short(frame.filename)}:{frame.lineno}")
+        if len(lines) == 2:
+            lines.append("(nothing still held at the end of the phase)")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, wall, cpu, peak):
+        """Wall vs on-CPU seconds per phase, as printed at the end of the run"""
+        with METRICS.lock:
+            phases = {name: dict(stats) for name, stats in METRICS.phases.items()}
+        lines = [f"{'phase':<18} {'count':>5} {'wall s':>9} {'cpu s':>9} {'wait s':>9} {'cpu%':>5}"]
+        for name, stats in sorted(phases.items(), key=lambda item: -item[1]['seconds']):
+            seconds, busy = stats['seconds'], stats['cpu']
+            share = 100 * busy / seconds if seconds else 0.0
+            lines.append(f"{name:<18} {stats['count']:>5} {seconds:>9.3f} {busy:>9.3f} "
+                         f"{max(0.0, seconds - busy):>9.3f} {share:>4.0f}%")
+        lines.append(f"whole run: {wall:.3f}s wall, {cpu:.3f}s CPU (all threads), "
+                     f"peak traced memory {_kib(peak)}")
+        lines.append(f"memory snapshots took {self.overhead:.3f}s of that "
+                     f"(outside the phase times, except in enclosing phases)")
+        if not PER_PHASE:
+            lines.append("one process-wide cProfile (Python 3.12+): run.pstats only, "
+                         "no per-phase pstats")
+        return '\n'.join(lines)
+
+
+def _merged(profiles):
+    """One pstats.Stats for several profilers (pstats rejects empty ones)"""
+    stats = None
+    for profile in profiles:
+        profile.create_stats()
+        if not profile.stats:
+            continue
+        if stats is None:
+            stats = pstats.Stats(profile)
+        else:
+            stats.add(profile)
+    return stats
+
+
+def _filename(phase):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', phase)
+
+
+def _kib(size):
+    return f"{size / 1024:.1f} KiB"
+
+
+def _short(filename):
+    cwd = os.getcwd() + os.sep
+    return filename[len(cwd):] if filename.startswith(cwd) else filename
+
+
+def start_profiling(script, directory=None, top=TOP_N):
+    """Profile the rest of this process; the reports are written at exit"""
+    profiler = RunProfiler(script, directory, top)
+    profiler.start()
+
+    def finish():
+        folder, summary = profiler.stop()
+        print(f"\n🔬 Profile of {script} (wall vs on-CPU per phase):", file=sys.stderr)
+        print(summary, file=sys.stderr)
+        print(f"   pstats and allocation reports in {folder}/", file=sys.stderr)
+
+    atexit.register(finish)
+    return profiler
@@ -4,30 +4,29 @@ Script para configurar DNS do lech.world no Namecheap
 Configura os registros necessários para GitHub Pages
 """
 
-import requests
 import xml.etree.ElementTree as ET
 import sys
 
+from client_ip import ClientIPError, get_client_ip as detect_client_ip
+from dns_reconcile import reconcile
+from domain_coord import LockTimeout
+from namecheap_client import NamecheapClient, TransportError
+from record_rules import InvalidRecords, print_violations
+from zone_file import ZoneError, desired_records
+from zone_history import open_history
+
 # Configuração do domínio
 DOMAIN = "lech.world"
 SLD = "lech"
 TLD = "world"
 
-# GitHub Pages IPs
-GITHUB_IPS = [
-    "185.199.108.153",
-    "185.199.109.153", 
-    "185.199.110.153",
-    "185.199.111.153"
-]
-
 def get_client_ip():
-    """Obtém o IP público do cliente"""
+    """Obtém o IP público do cliente (cache, NAMECHEAP_CLIENT_IP ou serviços de eco)"""
     try:
-        response = requests.get('https://api.ipify.org')
-        return response.text
-    except:
-        return "8.8.8.8"  # Fallback IP
+        return detect_client_ip()
+    except ClientIPError as e:
+        print(f"⚠️  Não foi possível detectar seu IP ({e})")
+        return input("Digite seu IP público (para a whitelist): ").strip()
 
 def setup_dns_records(api_user, api_key):
     """Configura os registros DNS para GitHub Pages"""
@@ -36,67 +35,34 @@ def setup_dns_records(api_user, api_key):
     print(f"🌐 Configurando DNS para {DOMAIN}")
     print(f"📍 Seu IP: {client_ip}")
     
-    # Registros DNS a serem configurados
-    dns_records = []
-    
-    # A Records para o domínio apex (lech.world)
-    for i, ip in enumerate(GITHUB_IPS, 1):
-        dns_records.append({
-            'HostName': '@',
-            'RecordType': 'A',
-            'Address': ip,
-            'TTL': '1800'
-        })
-    
-    # CNAME para www
-    dns_records.append({
-        'HostName': 'www',
-        'RecordType': 'CNAME',
-        'Address': 'leolech14.github.io',
-        'TTL': '1800'
-    })
-    
-    # Construir parâmetros da API
-    params = {
-        'ApiUser': api_user,
-        'ApiKey': api_key,
-        'UserName': api_user,
-        'Command': 'namecheap.domains.dns.setHosts',
-        'ClientIp': client_ip,
-        'SLD': SLD,
-        'TLD': TLD
-    }
-    
-    # Adicionar cada registro DNS aos parâmetros
-    for i, record in enumerate(dns_records, 1):
-        params[f'HostName{i}'] = record['HostName']
-        params[f'RecordType{i}'] = record['RecordType']
-        params[f'Address{i}'] = record['Address']
-        params[f'TTL{i}'] = record['TTL']
+    # zones/lech.world.zone: A records para o apex e CNAME para www
+    try:
+        dns_records = desired_records(DOMAIN)
+    except (OSError, ZoneError) as e:
+        print(f"❌ Arquivo de zona inválido: {e}")
+        return False
     
     print("\n📝 Configurando os seguintes registros:")
     print("-" * 50)
     for record in dns_records:
-        print(f"  {record['RecordType']:5} {record['HostName']:10} → {record['Address']}")
+        print(f"  {record.type:5} {record.name:10} → {record.address}")
     print("-" * 50)
     
     # Fazer a requisição para a API
     print("\n🚀 Enviando configuração para Namecheap...")
     
     try:
-        response = requests.post(
-            'https://api.namecheap.com/xml.response',
-            data=params,
-            timeout=30
-        )
+        with NamecheapClient(api_user, api_key, client_ip, history=open_history()) as client:
+            outcome = reconcile(client, SLD, TLD, dns_records)
+        result = outcome.api_result
+        print_violations(outcome.warnings)
         
-        # Parse XML response
-        root = ET.fromstring(response.text)
+        if not outcome.changed and outcome.ok:
+            print("✅ Os registros já estão corretos, nenhuma alteração necessária")
+            return True
         
         # Verificar se foi bem-sucedido
-        status = root.get('Status')
-        
-        if status == 'OK':
+        if outcome.ok:
             print("✅ DNS configurado com sucesso!")
             print("\n🎉 Configuração concluída! Aguarde alguns minutos para propagação.")
             print(f"\n🌐 Seu site estará disponível em:")
@@ -106,19 +72,28 @@ def setup_dns_records(api_user, api_key):
             return True
         else:
             # Buscar mensagem de erro
-            errors = root.findall('.//Error')
-            if errors:
+            if result.errors:
                 print("❌ Erro ao configurar DNS:")
-                for error in errors:
-                    print(f"   {error.text}")
+                for _, error_text in result.errors:
+                    print(f"   {error_text}")
             else:
                 print("❌ Erro desconhecido ao configurar DNS")
-                print(f"Response: {response.text[:500]}")
+                print(f"Response: {result.text[:500]}")
             return False
             
-    except requests.exceptions.RequestException as e:
+    except TransportError as e:
         print(f"❌ Erro de conexão: {e}")
         return False
+    except InvalidRecords as e:
+        print("❌ Erro: os registros não passaram na validação, nada foi enviado:")
+        print_violations(e.violations)
+        return False
+    except LockTimeout as e:
+        print(f"❌ Erro: outra execução ainda está gravando esta zona ({e})")
+        return False
+    except OSError as e:
+        print(f"❌ Erro ao acessar arquivos locais: {e}")
+        return False
     except ET.ParseError as e:
         print(f"❌ Erro ao processar resposta: {e}")
         return False
@@ -0,0 +1,61 @@
+"""
+Shared fixtures: isolated caches and local stand-ins for DNS and the Namecheap API
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dns_stub_server import StubZones, plain_servers
+from namecheap_client import NamecheapClient
+from namecheap_stub_server import StubServer
+from resilience import CallPolicy
+
+# Enough TXT data at big.test.zone that the answer can't fit in one UDP datagram
+TEST_ZONE = """\
+$ORIGIN test.zone.
+$TTL 300
+@       IN  A       185.199.108.153
+        IN  A       185.199.109.153
+www     IN  CNAME   site.example.com.
+@       IN  MX      10 mail.example.com.
+"""
+TEST_ZONE += ''.join(f'big     IN  TXT     "{i:02d}-{"x" * 60}"\n' for i in range(12))
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """No shared answer cache, no cross-run locks, zone cache under tmp_path"""
+    monkeypatch.setenv('DNS_CACHE', 'off')
+    monkeypatch.setenv('DNS_LOCK_DIR', 'off')
+    monkeypatch.setenv('DNS_HISTORY_DB', 'off')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+
+
+@pytest.fixture(scope='session')
+def dns_stub(tmp_path_factory):
+    """'127.0.0.1:<port>' answering test.zone over UDP and TCP"""
+    path = tmp_path_factory.mktemp('zones') / 'test.zone.zone'
+    path.write_text(TEST_ZONE)
+    zones = StubZones()
+    zones.add_zone(str(path))
+    servers = plain_servers(zones)
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"127.0.0.1:{servers[0].server_address[1]}", zones
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def namecheap():
+    """(stub server, client) pair; the client sends every call once"""
+    with StubServer() as server:
+        with NamecheapClient('stub', 'stub-key', '127.0.0.1', url=server.url,
+                             policy=CallPolicy(retries=0, hedge_after=None)) as client:
+            yield server, client
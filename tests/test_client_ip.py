@@ -0,0 +1,96 @@
+import gzip
+import json
+import time
+
+import pytest
+
+import client_ip
+from client_ip import ClientIPError, fetch_ip, get_client_ip, read_cache, write_cache
+from http_transport import Response, TransportError
+
+
+class EchoTransport:
+    """make_transport() stand-in answering each echo URL from a table"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.closed = False
+
+    def get(self, url, timeout=None):
+        answer = self.answers[url]
+        if isinstance(answer, Exception):
+            raise answer
+        if callable(answer):
+            return answer()
+        return Response(200, {}, answer)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def no_interface(monkeypatch):
+    monkeypatch.setattr(client_ip, 'local_interface_ip', lambda: None)
+    monkeypatch.delenv(client_ip.OVERRIDE_ENV, raising=False)
+
+
+def echo(monkeypatch, answers):
+    transport = EchoTransport(answers)
+    monkeypatch.setattr(client_ip, 'make_transport', lambda pool_size: transport)
+    return transport
+
+
+def test_override_wins_and_is_validated(monkeypatch):
+    monkeypatch.setenv(client_ip.OVERRIDE_ENV, '203.0.113.5')
+    assert get_client_ip() == '203.0.113.5'
+    assert get_client_ip('2001:DB8::1') == '2001:db8::1'
+    with pytest.raises(ClientIPError):
+        get_client_ip('localhost')
+
+
+def test_cache_respects_ttl(tmp_path):
+    path = str(tmp_path / 'client_ip.json')
+    write_cache(path, '203.0.113.5')
+    assert read_cache(path, 60) == '203.0.113.5'
+    with open(path, 'w') as f:
+        json.dump({'ip': '203.0.113.5', 'detected_at': time.time() - 120}, f)
+    assert read_cache(path, 60) is None
+    with open(path, 'w') as f:
+        f.write('{not json')
+    assert read_cache(path, 60) is None
+
+
+def test_detection_is_cached_until_refresh(tmp_path, monkeypatch, no_interface):
+    path = str(tmp_path / 'client_ip.json')
+    answers = {url: b'203.0.113.5\n' for url in client_ip.IP_ENDPOINTS}
+    echo(monkeypatch, answers)
+    assert get_client_ip(path=path) == '203.0.113.5'
+
+    answers.update({url: b'203.0.113.9' for url in client_ip.IP_ENDPOINTS})
+    assert get_client_ip(path=path) == '203.0.113.5'
+    assert get_client_ip(path=path, refresh=True) == '203.0.113.9'
+    assert get_client_ip(path=path, ttl=0) == '203.0.113.9'
+
+
+def test_failed_and_corrupt_services_are_skipped(monkeypatch):
+    first, second, third, fourth = client_ip.IP_ENDPOINTS
+
+    def slow():
+        time.sleep(0.05)
+        return Response(200, {}, b'203.0.113.7')
+
+    transport = echo(monkeypatch, {
+        first: lambda: Response(200, {}, gzip.decompress(b'not gzip')),
+        second: TransportError('timed out'),
+        third: b'<html>not an address</html>',
+        fourth: slow,
+    })
+    assert fetch_ip() == '203.0.113.7'
+    time.sleep(0.05)
+    assert transport.closed
+
+
+def test_no_answer_raises(monkeypatch):
+    echo(monkeypatch, {url: TransportError('refused') for url in client_ip.IP_ENDPOINTS})
+    with pytest.raises(ClientIPError):
+        fetch_ip()
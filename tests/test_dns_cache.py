@@ -0,0 +1,92 @@
+import pytest
+
+from dns_cache import NEGATIVE_MAX_TTL, AnswerCache, answer_ttl
+from dns_resolver import SOA, Answer, Record, resolve_many
+from run_metrics import METRICS
+
+SOA_RECORD = Record('test.zone', 'SOA', 900, SOA('ns1.test.zone', 'hostmaster.test.zone', 1, 2, 3, 4, 300))
+
+
+def a_answer(name='www.test.zone', ttl=300, resolver='192.0.2.53'):
+    return Answer(resolver, name, 'A', 'NOERROR', [Record(name, 'A', ttl, '192.0.2.1')])
+
+
+def negative(rcode='NXDOMAIN'):
+    return Answer('192.0.2.53', 'gone.test.zone', 'A', rcode, authority=[SOA_RECORD])
+
+
+def test_answer_ttl():
+    assert answer_ttl(a_answer(ttl=120)) == 120
+    assert answer_ttl(negative()) == 300
+    assert answer_ttl(negative('NOERROR')) == 300
+    big = Record('test.zone', 'SOA', 86400, SOA_RECORD.data._replace(minimum=86400))
+    assert answer_ttl(Answer('r', 'x', 'A', 'NXDOMAIN', authority=[big])) == NEGATIVE_MAX_TTL
+    # Failures and negative answers without an SOA are never cached
+    assert answer_ttl(Answer('r', 'x', 'A', error='timed out')) is None
+    assert answer_ttl(Answer('r', 'x', 'A', 'SERVFAIL')) is None
+    assert answer_ttl(Answer('r', 'x', 'A', 'NXDOMAIN')) is None
+
+
+def test_cached_answer_expires_at_ttl():
+    cache = AnswerCache()
+    assert cache.put(a_answer(ttl=300), now=1000) == 300
+    hit = cache.get('192.0.2.53', 'WWW.test.zone.', 'A', now=1100)
+    assert hit.cached and hit.records[0].ttl == 200
+    assert cache.get('192.0.2.53', 'www.test.zone', 'A', now=1299.5) is not None
+    assert cache.get('192.0.2.53', 'www.test.zone', 'A', now=1300) is None
+    assert len(cache) == 0
+
+
+def test_keys_include_the_resolver_and_type():
+    cache = AnswerCache()
+    cache.put(a_answer(), now=1000)
+    assert cache.get('198.51.100.53', 'www.test.zone', 'A', now=1000) is None
+    assert cache.get('192.0.2.53', 'www.test.zone', 'AAAA', now=1000) is None
+
+
+def test_negative_answers_are_cached_for_the_soa_minimum():
+    cache = AnswerCache()
+    cache.put(negative(), now=1000)
+    hit = cache.get('192.0.2.53', 'gone.test.zone', 'A', now=1100)
+    assert hit.rcode == 'NXDOMAIN' and hit.authority[0].data.minimum == 300
+    assert cache.get('192.0.2.53', 'gone.test.zone', 'A', now=1300) is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    for name in ('a.test.zone', 'b.test.zone'):
+        cache.put(a_answer(name), now=1000)
+    cache.get('192.0.2.53', 'a.test.zone', 'A', now=1001)
+    cache.put(a_answer('c.test.zone'), now=1002)
+    assert cache.get('192.0.2.53', 'b.test.zone', 'A', now=1003) is None
+    assert cache.get('192.0.2.53', 'a.test.zone', 'A', now=1003) is not None
+
+
+def test_disk_cache_round_trip(tmp_path):
+    path = str(tmp_path / 'dns_answers.json')
+    cache = AnswerCache(path=path)
+    cache.put(a_answer())
+    cache.put(negative())
+    cache.save()
+    loaded = AnswerCache(path=path)
+    assert len(loaded) == 2
+    assert loaded.get('192.0.2.53', 'gone.test.zone', 'A').authority[0].data.serial == 1
+    (tmp_path / 'dns_answers.json').write_text('{broken')
+    assert len(AnswerCache(path=path)) == 0
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    monkeypatch.setenv('DNS_CACHE', 'memory')
+    monkeypatch.setattr('dns_cache._shared', {})
+
+
+def test_resolver_reuses_cached_answers_unless_fresh(dns_stub, memory_cache):
+    server, _ = dns_stub
+    hits = METRICS.total('dns_cache_hits')
+    first, = resolve_many([('www.test.zone', 'CNAME')], [server])
+    second, = resolve_many([('www.test.zone', 'CNAME')], [server])
+    assert not first.cached and second.cached
+    assert second.values() == first.values()
+    assert not resolve_many([('www.test.zone', 'CNAME')], [server], fresh=True)[0].cached
+    assert METRICS.total('dns_cache_hits') == hits + 1
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+from dns_daemon import DriftReconciler, compare_answer, expected_answers, next_delay
+from namecheap_client import HostRecord
+
+# What conftest's DNS stub serves for test.zone, all at TTL 300
+SERVED = [HostRecord('@', 'A', '185.199.108.153'), HostRecord('@', 'A', '185.199.109.153'),
+          HostRecord('www', 'CNAME', 'site.example.com')]
+DRIFTED = SERVED[:2] + [HostRecord('www', 'CNAME', 'new.example.com')]
+
+
+def answers(*ttls, soa=None):
+    authority = [SimpleNamespace(type='SOA', ttl=soa[0], data=SimpleNamespace(minimum=soa[1]))] if soa else []
+    return [SimpleNamespace(min_ttl=ttl, authority=authority) for ttl in ttls]
+
+
+def test_next_delay_follows_the_shortest_ttl_within_bounds():
+    assert next_delay(answers(300, 120)) == 120
+    assert next_delay(answers(5)) == 60
+    assert next_delay(answers(86400)) == 3600
+    assert next_delay([]) == 60
+    # Negative answers: the SOA minimum, capped by the SOA record's own TTL
+    assert next_delay(answers(None, soa=(900, 600))) == 600
+
+
+def test_expected_answers_and_compare():
+    expected = expected_answers('test.zone', SERVED + [HostRecord('x', 'SRV', 'y')])
+    assert expected == {('test.zone', 'A'): {'185.199.108.153', '185.199.109.153'},
+                        ('www.test.zone', 'CNAME'): {'site.example.com'}}
+    answer = SimpleNamespace(error=None, rcode='NOERROR', name='www.test.zone', qtype='CNAME',
+                             records=[], values=lambda: ['Site.Example.com.'])
+    assert compare_answer(answer, {'site.example.com'}) == ('ok', None)
+    assert compare_answer(answer, {'new.example.com'})[0] == 'drift'
+    answer.error = 'timed out'
+    assert compare_answer(answer, {'site.example.com'})[0] == 'unknown'
+
+
+def reconciler(namecheap, dns_stub, records):
+    _, client = namecheap
+    server, _ = dns_stub
+    daemon = DriftReconciler(client, [('test.zone', records)], [server], audit_interval=0)
+    return daemon, daemon.states[0], daemon.states[0].next_check
+
+
+def test_in_sync_domain_is_rescheduled_by_ttl_without_api_calls(namecheap, dns_stub):
+    daemon, state, start = reconciler(namecheap, dns_stub, SERVED)
+    assert daemon.run_once(now=start) == [state]
+    assert state.status == 'in_sync'
+    assert state.next_check == start + 300
+    assert daemon.run_once(now=start + 299) == []
+    assert namecheap[0].state.calls == {}
+    assert 'lechworld_dns_domain_in_sync{domain="test.zone",script="dns_daemon"} 1' in daemon.prometheus()
+
+
+def test_drift_is_confirmed_once_per_cooldown(namecheap, dns_stub):
+    server, _ = namecheap
+    # The registrar already holds the new target; resolvers still serve the old one
+    server.state.add_zone('test.zone', DRIFTED)
+    daemon, state, start = reconciler(namecheap, dns_stub, DRIFTED)
+    daemon.run_once(now=start)
+    assert state.status == 'propagating'
+    daemon.run_once(now=start + 300)
+    assert state.status == 'propagating'
+    assert server.state.calls == {'namecheap.domains.dns.getHosts': 1}
+    daemon.run_once(now=start + daemon.api_cooldown)
+    assert server.state.calls['namecheap.domains.dns.getHosts'] == 2
+
+
+def test_drift_at_the_registrar_is_repaired(namecheap, dns_stub):
+    server, _ = namecheap
+    server.state.add_zone('test.zone', SERVED)
+    daemon, state, start = reconciler(namecheap, dns_stub, DRIFTED)
+    daemon.run_once(now=start)
+    assert state.status == 'repaired' and state.repairs == 1
+    assert {r.key for r in server.state.zones['test.zone']} == {r.key for r in DRIFTED}
+
+
+def test_dry_run_reports_but_never_writes(namecheap, dns_stub):
+    server, _ = namecheap
+    server.state.add_zone('test.zone', SERVED)
+    daemon, state, start = reconciler(namecheap, dns_stub, DRIFTED)
+    daemon.dry_run = True
+    daemon.run_once(now=start)
+    assert state.status == 'drift'
+    assert 'namecheap.domains.dns.setHosts' not in server.state.calls
@@ -0,0 +1,109 @@
+import asyncio
+import shutil
+import ssl
+import struct
+import threading
+
+import pytest
+
+import dns_encrypted
+from dns_encrypted import ConnectionLost, UpstreamError, _DoTConnection, is_encrypted, parse_upstream
+from dns_resolver import build_query, resolve_many
+from dns_stub_server import _DoHServer, _DoTServer, self_signed_cert
+from run_metrics import METRICS
+
+QUESTIONS = [('test.zone', 'A'), ('www.test.zone', 'CNAME'), ('test.zone', 'MX'),
+             ('missing.test.zone', 'A')] * 10
+
+
+def test_parse_upstream():
+    assert parse_upstream('tls://1.1.1.1#cloudflare-dns.com') == (
+        'tls', '1.1.1.1', 853, '/dns-query', 'cloudflare-dns.com')
+    assert parse_upstream('https://dns.example:8443/q') == ('https', 'dns.example', 8443, '/q', 'dns.example')
+    assert is_encrypted('https://dns.example') and not is_encrypted('1.1.1.1:53')
+    with pytest.raises(UpstreamError):
+        parse_upstream('udp://1.1.1.1')
+
+
+class Writer:
+    def __init__(self):
+        self.sent = b''
+
+    def write(self, data):
+        self.sent += data
+
+
+def test_dot_answers_are_matched_by_id_in_any_order():
+    async def scenario():
+        conn = _DoTConnection('tls://stub', 'stub', 853, 'stub')
+        writer, loop = Writer(), asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in range(3)]
+        ids = [conn._send(writer, build_query('test.zone', 'A', qid=0xAAAA)[1], f) for f in futures]
+        assert len(set(ids)) == 3
+
+        reader = asyncio.StreamReader()
+        for wire_id in reversed(ids[1:]):
+            message = struct.pack('!H', wire_id) + b'answer'
+            reader.feed_data(struct.pack('!H', len(message)) + message)
+        reader.feed_eof()
+        while await conn._read_one(reader):
+            pass
+        conn._fail_pending(ConnectionLost('closed'))
+        assert [f.result()[2:] for f in futures[1:]] == [b'answer', b'answer']
+        with pytest.raises(ConnectionLost):
+            futures[0].result()
+        assert conn.pending == {}
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture(scope='module')
+def tls_upstreams(dns_stub, tmp_path_factory):
+    """(tls://, https://) upstreams serving conftest's zone, trusted through their own cert"""
+    if not shutil.which('openssl'):
+        pytest.skip("openssl is needed for a self-signed certificate")
+    cert, key = self_signed_cert(str(tmp_path_factory.mktemp('cert')))
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    context.set_alpn_protocols(['http/1.1', 'dot'])
+    _, zones = dns_stub
+    servers = [_DoTServer(('127.0.0.1', 0), zones, context), _DoHServer(('127.0.0.1', 0), zones, context)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    dot, doh = (server.server_address[1] for server in servers)
+    yield cert, f"tls://127.0.0.1:{dot}", f"https://127.0.0.1:{doh}/dns-query"
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def trusted(tls_upstreams, monkeypatch):
+    cert = tls_upstreams[0]
+    contexts = {}
+    for alpn in (None, 'http/1.1'):
+        contexts[alpn] = ssl.create_default_context(cafile=cert)
+        if alpn:
+            contexts[alpn].set_alpn_protocols([alpn])
+    monkeypatch.setattr(dns_encrypted, '_contexts', contexts)
+    return tls_upstreams[1:]
+
+
+@pytest.mark.parametrize('scheme', ['tls', 'https'])
+def test_many_queries_share_one_handshake(trusted, dns_stub, scheme):
+    upstream = trusted[0] if scheme == 'tls' else trusted[1]
+    plain, _ = dns_stub
+    handshakes = METRICS.total('dns_tls_handshakes')
+    encrypted = resolve_many(QUESTIONS, [upstream], fresh=True)
+    assert METRICS.total('dns_tls_handshakes') == handshakes + 1
+    assert all(a.error is None for a in encrypted)
+    expected = resolve_many(QUESTIONS, [plain], fresh=True)
+    assert [(a.rcode, a.values()) for a in encrypted] == [(a.rcode, a.values()) for a in expected]
+
+
+def test_server_name_is_verified(trusted):
+    upstream = trusted[0]
+    good, = resolve_many([('test.zone', 'A')], [upstream + '#localhost'], fresh=True)
+    bad, = resolve_many([('test.zone', 'A')], [upstream + '#wrong.example'], fresh=True)
+    assert good.error is None and good.values()
+    assert bad.error and 'certificate' in bad.error.lower()
@@ -0,0 +1,91 @@
+import struct
+
+import pytest
+
+from dns_resolver import (DNSError, build_query, encode_name, parse_response, query,
+                          read_name, resolve_many, run, split_server)
+
+
+def response(qid, question, answers, flags=0x8180):
+    """Hand-built response: header, the question, then raw answer records"""
+    header = struct.pack('!HHHHHH', qid, flags, 1, len(answers), 0, 0)
+    return header + question + b''.join(answers)
+
+
+def test_build_query_round_trip():
+    qid, packet = build_query('WWW.Lech.World.', 'CNAME', qid=0x1234)
+    assert qid == 0x1234
+    assert struct.unpack('!HHHHHH', packet[:12]) == (0x1234, 0x0100, 1, 0, 0, 0)
+    assert read_name(packet, 12) == ('www.lech.world', len(packet) - 4)
+    assert struct.unpack('!HH', packet[-4:]) == (5, 1)
+
+
+def test_build_query_without_recursion():
+    _, packet = build_query('lech.world', 'SOA', recursion=False)
+    assert struct.unpack('!H', packet[2:4])[0] & 0x0100 == 0
+
+
+def test_encode_name_rejects_long_labels():
+    with pytest.raises(DNSError):
+        encode_name('x' * 64 + '.example.com')
+
+
+def test_compression_pointers():
+    _, packet = build_query('lech.world', 'A', qid=7)
+    question = packet[12:]
+    # www + pointer to the question name, then a CNAME target pointing into it
+    cname_target = b'\x06github\xc0\x11'     # github.world: 0x11 is "world" in the question
+    answers = [
+        b'\x03www\xc0\x0c' + struct.pack('!HHIH', 5, 1, 300, len(cname_target)) + cname_target,
+        b'\xc0\x0c' + struct.pack('!HHIH', 1, 1, 60, 4) + bytes([185, 199, 108, 153]),
+    ]
+    parsed = parse_response(response(7, question, answers))
+    assert parsed['question'] == ('lech.world', 'A')
+    first, second = parsed['answers']
+    assert (first.name, first.type, first.ttl, first.data) == ('www.lech.world', 'CNAME', 300,
+                                                               'github.world')
+    assert (second.name, second.data) == ('lech.world', '185.199.108.153')
+
+
+def test_compression_loop_is_an_error():
+    packet = struct.pack('!HHHHHH', 1, 0x8180, 1, 0, 0, 0) + b'\xc0\x0c' + b'\0\1\0\1'
+    with pytest.raises(DNSError):
+        parse_response(packet)
+
+
+def test_truncated_records_are_an_error():
+    _, packet = build_query('lech.world', 'A', qid=9)
+    record = b'\xc0\x0c' + struct.pack('!HHIH', 1, 1, 60, 4)
+    with pytest.raises(DNSError):
+        parse_response(response(9, packet[12:], [record[:8]]))
+
+
+def test_split_server():
+    assert split_server('1.1.1.1') == ('1.1.1.1', 53)
+    assert split_server('127.0.0.1:8053') == ('127.0.0.1', 8053)
+    assert split_server('[::1]:5353') == ('::1', 5353)
+
+
+def test_udp_answers(dns_stub):
+    server, _ = dns_stub
+    apex, www, missing = resolve_many(
+        [('test.zone', 'A'), ('www.test.zone', 'A'), ('nope.test.zone', 'A')], [server])
+    assert apex.ok and sorted(apex.values()) == ['185.199.108.153', '185.199.109.153']
+    assert www.values('CNAME') == ['site.example.com']
+    assert missing.rcode == 'NXDOMAIN'
+
+
+def test_truncated_udp_falls_back_to_tcp(dns_stub):
+    server, zones = dns_stub
+    before = zones.queries
+    udp = run(query(server, 'big.test.zone', 'TXT', fresh=True))
+    assert udp.ok and len(udp.records) == 12
+    # Answered twice: the truncated UDP reply, then in full over TCP
+    assert zones.queries - before == 2
+    tcp = run(query(server, 'big.test.zone', 'TXT', tcp=True, fresh=True))
+    assert sorted(tcp.values()) == sorted(udp.values())
+
+
+def test_errors_end_up_in_the_answer():
+    answer = run(query('127.0.0.1:9', 'test.zone', 'A', timeout=0.5, tcp=True, fresh=True))
+    assert not answer.ok and answer.error
@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pytest
+
+import domain_coord
+from domain_coord import (LockTimeout, SingleFlight, desired_state, last_write, lock_dir,
+                          mark_applied, queue_desired, shared_fetch, write_lock)
+
+
+class Raw:
+    def __init__(self, raw):
+        self.raw = raw
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_writers_serialize(tmp_path):
+    inside, peak, order = [0], [0], []
+    lock = threading.Lock()
+
+    def writer(i):
+        with write_lock('Test.Zone.', directory=str(tmp_path)):
+            with lock:
+                inside[0] += 1
+                peak[0] = max(peak[0], inside[0])
+            time.sleep(0.02)
+            order.append(i)
+            with lock:
+                inside[0] -= 1
+
+    run_threads(writer, 5)
+    assert peak[0] == 1 and sorted(order) == list(range(5))
+
+
+def test_write_lock_times_out(tmp_path):
+    with write_lock('test.zone', directory=str(tmp_path)):
+        started = time.monotonic()
+        with pytest.raises(LockTimeout):
+            with write_lock('test.zone', timeout=0.1, directory=str(tmp_path)):
+                pass
+        assert time.monotonic() - started < 1
+        # Other domains are not held up
+        with write_lock('other.zone', timeout=0.1, directory=str(tmp_path)):
+            pass
+
+
+def test_newest_desired_state_wins(tmp_path):
+    directory = str(tmp_path)
+    first = queue_desired('test.zone', ['old'], directory)
+    second = queue_desired('test.zone', ['new'], directory)
+    assert second > first
+    assert desired_state('test.zone', directory) == (second, ['new'], 0)
+    mark_applied('test.zone', second, wrote=True, directory=directory)
+    mark_applied('test.zone', first, directory=directory)     # never moves backwards
+    assert desired_state('test.zone', directory)[2] == second
+    assert last_write('test.zone', directory) > 0
+
+
+def test_coordination_can_be_turned_off(monkeypatch):
+    monkeypatch.setenv('DNS_LOCK_DIR', 'off')
+    assert lock_dir() is None
+    with write_lock('test.zone'):
+        with write_lock('test.zone', timeout=0):
+            pass
+    assert queue_desired('test.zone', ['x']) is None
+    assert desired_state('test.zone') == (0, None, 0)
+
+
+def test_no_fcntl_means_uncoordinated(monkeypatch, tmp_path):
+    monkeypatch.setenv('DNS_LOCK_DIR', str(tmp_path))
+    assert lock_dir() == str(tmp_path)
+    monkeypatch.setattr(domain_coord, 'fcntl', None)
+    assert lock_dir() is None
+    assert shared_fetch('test.zone', lambda: 'fetched', None) == 'fetched'
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'zone'
+
+    def caller(i):
+        if i:
+            started.wait(5)
+        results.append(flight.do('test.zone', fetch))
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert calls == [1] and results == ['zone'] * 4
+    # Nothing in flight any more: the next call runs again
+    assert flight.do('test.zone', lambda: 'again') == 'again'
+
+
+def test_single_flight_passes_errors_to_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def fetch():
+        release.wait(5)
+        raise ValueError('boom')
+
+    def caller(i):
+        try:
+            flight.do('k', fetch)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert errors == ['boom'] * 3
+
+
+def test_shared_fetch_reuses_a_response_only_for_waiters(tmp_path):
+    directory = str(tmp_path)
+    fetched, results = [], []
+    in_fetch = threading.Event()
+
+    def fetch():
+        fetched.append(1)
+        in_fetch.set()
+        time.sleep(0.1)
+        return Raw(b'<hosts/>')
+
+    def caller(i):
+        if i:
+            in_fetch.wait(5)    # queue behind the one already calling the API
+        results.append(shared_fetch('test.zone', fetch, lambda raw: ('decoded', raw),
+                                    directory=directory))
+
+    run_threads(caller, 3)
+    assert len(fetched) == 1
+    assert results.count(('decoded', b'<hosts/>')) == 2
+
+    # A call made after the response was stored starts a new wave
+    shared_fetch('test.zone', fetch, None, directory=directory)
+    assert len(fetched) == 2
@@ -0,0 +1,79 @@
+import json
+import sqlite3
+
+import pytest
+
+from inventory import NDJSONSink, SQLiteSink, inspect_domain, iter_domains, iter_inventory
+from namecheap_client import ApiResult, HostRecord
+
+SITE = [HostRecord('@', 'A', '185.199.108.153'), HostRecord('www', 'CNAME', 'site.example.com')]
+
+
+def account(server, count):
+    for i in range(count):
+        server.state.add_zone(f'site{i:02d}.test', SITE)
+
+
+def test_every_page_is_read_once(namecheap):
+    server, client = namecheap
+    account(server, 25)
+    names = [info['Name'] for info in iter_domains(client, page_size=10)]
+    assert sorted(names) == [f'site{i:02d}.test' for i in range(25)]
+    assert server.state.calls['namecheap.domains.getList'] == 3
+
+
+def test_a_failed_page_fails_the_inventory(namecheap, monkeypatch):
+    server, client = namecheap
+    account(server, 25)
+    get_list = client.get_list
+
+    def flaky(page=1, page_size=100):
+        if page == 2:
+            return ApiResult(False, errors=[('500000', 'Too many requests')])
+        return get_list(page, page_size)
+
+    monkeypatch.setattr(client, 'get_list', flaky)
+    with pytest.raises(RuntimeError, match='page 2'):
+        list(iter_domains(client, page_size=10))
+
+
+def test_inventory_flags_vercel_and_empty_zones(namecheap):
+    server, client = namecheap
+    account(server, 12)
+    server.state.add_zone('old.test', [HostRecord('www', 'CNAME', 'cname.vercel-dns.com.'),
+                                       HostRecord('@', 'A', '76.76.21.21')])
+    server.state.add_zone('empty.test', [])
+    results = {r['domain']: r for r in iter_inventory(client, workers=2, page_size=10)}
+    assert len(results) == 14
+    assert server.state.calls['namecheap.domains.dns.getHosts'] == 14
+    assert [r['status'] for r in results.values()].count('ok') == 13
+    assert results['empty.test']['status'] == 'empty'
+    assert len(results['old.test']['vercel']) == 2
+    assert results['site00.test']['vercel'] == []
+
+
+def test_external_dns_costs_no_api_call(namecheap):
+    server, client = namecheap
+    result = inspect_domain(client, {'Name': 'elsewhere.test', 'IsOurDNS': 'false'})
+    assert result['status'] == 'external_dns'
+    assert server.state.calls == {}
+
+
+def test_sinks(tmp_path, namecheap):
+    server, client = namecheap
+    account(server, 2)
+    results = list(iter_inventory(client, workers=2))
+
+    ndjson = NDJSONSink(str(tmp_path / 'inventory.ndjson'))
+    sqlite = SQLiteSink(str(tmp_path / 'inventory.db'))
+    for result in results:
+        ndjson.write(result)
+        sqlite.write(result)
+    ndjson.close()
+    sqlite.close()
+
+    lines = (tmp_path / 'inventory.ndjson').read_text().splitlines()
+    assert sorted(json.loads(line)['domain'] for line in lines) == ['site00.test', 'site01.test']
+    db = sqlite3.connect(str(tmp_path / 'inventory.db'))
+    assert db.execute('SELECT COUNT(*) FROM records').fetchone() == (4,)
+    db.close()
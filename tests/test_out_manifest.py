@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+import pytest
+
+from out_manifest import (DEFAULT_IGNORE, hash_file, is_ignored, load_manifest, update_manifest,
+                          write_manifest)
+
+
+@pytest.fixture
+def public(tmp_path):
+    root = tmp_path / 'out'
+    (root / '_next' / 'static').mkdir(parents=True)
+    (root / 'index.html').write_text('<html>home</html>')
+    (root / 'guide.html').write_text('<html>guide</html>')
+    (root / '_next' / 'static' / 'app.js').write_text('console.log(1)')
+    (root / '.DS_Store').write_text('junk')
+    return root
+
+
+def touch(path, text):
+    """Rewrite ``path`` and move its mtime so the change can't hide in the same millisecond"""
+    path.write_text(text)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000))
+
+
+def test_ignore_patterns():
+    assert is_ignored('.DS_Store', DEFAULT_IGNORE)
+    assert is_ignored('a/node_modules/x.js', DEFAULT_IGNORE)
+    assert not is_ignored('_next/static/app.js', DEFAULT_IGNORE)
+
+
+def test_hash_file_matches_hashlib_on_both_paths(tmp_path, monkeypatch):
+    path = tmp_path / 'blob'
+    path.write_bytes(os.urandom(3000))
+    expected = hashlib.sha256(path.read_bytes()).hexdigest()
+    assert hash_file(str(path)) == expected
+    monkeypatch.setattr('out_manifest.MMAP_THRESHOLD', 1)
+    assert hash_file(str(path)) == expected
+
+
+def test_only_changed_files_are_rehashed(public, tmp_path):
+    path = str(tmp_path / 'out.manifest')
+    manifest, changes = update_manifest(str(public), load_manifest(path), 1, patterns=DEFAULT_IGNORE)
+    assert sorted(changes.added) == ['_next/static/app.js', 'guide.html', 'index.html']
+    write_manifest(manifest, path)
+
+    touch(public / 'guide.html', '<html>guide v2</html>')
+    (public / 'index.html').unlink()
+    (public / 'new.html').write_text('<html>new</html>')
+    manifest, changes = update_manifest(str(public), load_manifest(path), 1, patterns=DEFAULT_IGNORE)
+    assert changes.to_dict() == {'added': ['new.html'], 'modified': ['guide.html'],
+                                 'removed': ['index.html'], 'unchanged': 1, 'rehashed': 2}
+
+
+def test_touched_but_identical_file_is_unchanged(public, tmp_path):
+    manifest, _ = update_manifest(str(public), {}, 1, patterns=DEFAULT_IGNORE)
+    touch(public / 'guide.html', '<html>guide</html>')
+    _, changes = update_manifest(str(public), manifest, 1, patterns=DEFAULT_IGNORE)
+    assert changes.changed == [] and changes.rehashed == 1
+
+
+@pytest.mark.parametrize('text', [
+    'index.html,17',                                  # truncated mid-row
+    'index.html,abc,17,' + 'a' * 64 + '\n',           # corrupt number
+    'index.html,1,17,abc\n',                          # truncated hash
+    'index.html,1,17,' + 'a' * 64 + '\n\0\n',         # NUL byte
+])
+def test_corrupt_manifest_loads_as_empty(tmp_path, text):
+    path = tmp_path / 'out.manifest'
+    path.write_text(text)
+    assert load_manifest(str(path)) == {}
+
+
+def test_manifest_round_trip(public, tmp_path):
+    path = str(tmp_path / 'out.manifest')
+    manifest, _ = update_manifest(str(public), {}, 1, patterns=DEFAULT_IGNORE)
+    write_manifest(manifest, path)
+    loaded = load_manifest(path)
+    assert {rel: e.sha256 for rel, e in loaded.items()} == {rel: e.sha256 for rel, e in manifest.items()}
+    assert load_manifest(str(tmp_path / 'missing')) == {}
@@ -0,0 +1,51 @@
+import threading
+import time
+
+from rate_limit import RateLimiter, TokenBucket, namecheap_limiter
+
+
+def test_bucket_refills_evenly():
+    bucket = TokenBucket(10, 60)
+    now = bucket.updated
+    assert bucket.wait_time(now) == 0.0
+    bucket.tokens = 0
+    assert abs(bucket.wait_time(now) - 6.0) < 1e-9
+    assert abs(bucket.wait_time(now + 3) - 3.0) < 1e-9
+    # Never above capacity however long it sat idle
+    bucket.refill(now + 3600)
+    assert bucket.tokens == 10
+
+
+def test_limiter_waits_for_the_slowest_bucket():
+    limiter = RateLimiter([TokenBucket(100, 1), TokenBucket(2, 0.2)])
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    # 2 tokens up front, then one every 0.1s
+    assert time.monotonic() - started >= 0.18
+    assert limiter.waited > 0
+
+
+def test_limiter_is_shared_between_threads():
+    limiter = RateLimiter([TokenBucket(5, 0.25)])
+    calls = []
+
+    def worker():
+        for _ in range(3):
+            limiter.acquire()
+            calls.append(time.monotonic())
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 9 calls: 5 from the full bucket, 4 more at 20 per second
+    assert len(calls) == 9
+    assert max(calls) - started >= 0.18
+
+
+def test_namecheap_quotas():
+    limiter = namecheap_limiter()
+    assert [b.capacity for b in limiter.buckets] == [50, 700, 8000]
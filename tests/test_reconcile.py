@@ -0,0 +1,108 @@
+import pytest
+
+from dns_reconcile import fetch_current, plan_changes, reconcile
+from namecheap_client import HostRecord
+from record_rules import InvalidRecords
+
+
+def site(ips=('185.199.108.153', '185.199.109.153'), target='site.example.com', ttl=1800):
+    return [HostRecord('@', 'A', ip, ttl) for ip in ips] + [HostRecord('www', 'CNAME', target, ttl)]
+
+
+def test_identical_sets_are_a_noop():
+    assert plan_changes(site(), list(reversed(site()))).is_noop
+
+
+def test_key_ignores_case_and_trailing_dots():
+    current = [HostRecord('WWW', 'CNAME', 'Site.Example.com.')]
+    assert plan_changes(current, [HostRecord('www', 'CNAME', 'site.example.com')]).is_noop
+
+
+def test_ttl_change_is_a_modification():
+    plan = plan_changes(site(ttl=1800), site(ttl=300))
+    assert not plan.add and not plan.remove
+    assert len(plan.modify) == 3
+    assert all(old.ttl == 1800 and new.ttl == 300 for old, new in plan.modify)
+
+
+def test_address_change_on_same_name_and_type_is_paired():
+    plan = plan_changes(site(target='old.example.com'), site(target='new.example.com'))
+    assert not plan.add and not plan.remove
+    (old, new), = plan.modify
+    assert (old.address, new.address) == ('old.example.com', 'new.example.com')
+    assert any('old.example.com → new.example.com' in line for line in plan.lines())
+
+
+def test_adds_and_removes():
+    current = site() + [HostRecord('old', 'TXT', 'gone')]
+    desired = site() + [HostRecord('@', 'MX', 'mail.example.com', mx_pref=10)]
+    plan = plan_changes(current, desired)
+    assert [r.name for r in plan.remove] == ['old']
+    assert [r.type for r in plan.add] == ['MX']
+
+
+def test_mx_preference_change_is_a_modification():
+    current = [HostRecord('@', 'MX', 'mail.example.com', mx_pref=10)]
+    plan = plan_changes(current, [HostRecord('@', 'MX', 'mail.example.com', mx_pref=20)])
+    (old, new), = plan.modify
+    assert (old.mx_pref, new.mx_pref) == (10, 20)
+
+
+def test_empty_zone_is_fetched_as_empty(namecheap):
+    server, client = namecheap
+    server.state.add_zone('test.zone', [])
+    hosts, result = fetch_current(client, 'test', 'zone')
+    assert hosts == [] and not result.ok
+
+
+def test_reconcile_writes_only_when_needed(namecheap):
+    server, client = namecheap
+    server.state.add_zone('test.zone', site(target='old.example.com'))
+
+    outcome = reconcile(client, 'test', 'zone', site())
+    assert outcome.changed and outcome.ok
+    assert server.state.calls['namecheap.domains.dns.setHosts'] == 1
+    assert {r.key for r in server.state.zones['test.zone']} == {r.key for r in site()}
+
+    current, _ = fetch_current(client, 'test', 'zone')
+    outcome = reconcile(client, 'test', 'zone', site(), current=current)
+    assert not outcome.changed and outcome.plan.is_noop
+    assert server.state.calls['namecheap.domains.dns.setHosts'] == 1
+
+
+def test_force_writes_a_matching_zone(namecheap):
+    server, client = namecheap
+    server.state.add_zone('test.zone', site())
+    outcome = reconcile(client, 'test', 'zone', site(), force=True)
+    assert outcome.changed
+    assert server.state.calls['namecheap.domains.dns.setHosts'] == 1
+
+
+def test_invalid_records_make_no_api_call(namecheap):
+    server, client = namecheap
+    with pytest.raises(InvalidRecords) as raised:
+        reconcile(client, 'test', 'zone', [HostRecord('@', 'CNAME', 'site.example.com')])
+    assert [v.rule for v in raised.value.violations] == ['R202']
+    assert server.state.calls == {}
+
+
+def test_stale_client_ip_is_refreshed_once(namecheap, monkeypatch):
+    server, client = namecheap
+    server.state.whitelist = {'192.0.2.50'}
+    server.state.add_zone('test.zone', site())
+    refreshed = []
+
+    def detect(refresh=False):
+        refreshed.append(refresh)
+        return '192.0.2.50'
+
+    monkeypatch.setattr('dns_reconcile.get_client_ip', detect)
+    hosts, result = fetch_current(client, 'test', 'zone')
+    assert result.ok and len(hosts) == 3
+    assert client.client_ip == '192.0.2.50' and refreshed == [True]
+
+    # The same address again: no point in a second try
+    server.state.whitelist = {'192.0.2.99'}
+    hosts, result = fetch_current(client, 'test', 'zone')
+    assert hosts is None and result.has_error('2050900')
+    assert server.state.calls['namecheap.domains.dns.getHosts'] == 3
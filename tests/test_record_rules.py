@@ -0,0 +1,74 @@
+import pytest
+
+from dns_reconcile import Plan
+from namecheap_client import HostRecord
+from record_rules import (MAX_RECORDS, InvalidRecords, apply_plan, check_plan, check_records,
+                          errors, preflight, valid_name)
+
+
+def rules(records, domain='example.com'):
+    return sorted(v.rule for v in check_records(records, domain))
+
+
+def test_valid_site_has_no_violations():
+    records = [HostRecord('@', 'A', '185.199.108.153'),
+               HostRecord('www', 'CNAME', 'site.example.net'),
+               HostRecord('@', 'MX', 'mail.example.net', mx_pref=10),
+               HostRecord('_dmarc', 'TXT', 'v=DMARC1; p=none')]
+    assert rules(records) == []
+
+
+def test_valid_name():
+    assert valid_name('@') and valid_name('*') and valid_name('_acme-challenge.www')
+    assert not valid_name('-bad') and not valid_name('a..b') and not valid_name('x' * 64)
+
+
+@pytest.mark.parametrize('record, rule', [
+    (HostRecord('@', 'SRV', 'x'), 'R101'),
+    (HostRecord('bad name', 'A', '185.199.108.153'), 'R102'),
+    (HostRecord('@', 'A', '185.199.108.153', ttl=30), 'R103'),
+    (HostRecord('@', 'A', '::1'), 'R104'),
+    (HostRecord('@', 'AAAA', '185.199.108.153'), 'R104'),
+    (HostRecord('www', 'CNAME', '@'), 'R105'),
+    (HostRecord('txt', 'TXT', ''), 'R106'),
+    (HostRecord('@', 'MX', 'mail.example.net', mx_pref=70000), 'R107'),
+    (HostRecord('@', 'A', '10.0.0.1'), 'R108'),
+    (HostRecord('@', 'CNAME', 'site.example.net'), 'R202'),
+    (HostRecord('@', 'NS', 'ns1.example.net'), 'R207'),
+])
+def test_record_rules(record, rule):
+    assert rules([record]) == [rule]
+
+
+def test_set_rules():
+    assert rules([HostRecord('@', 'A', '185.199.108.153')] * 2) == ['R201']
+    assert rules([HostRecord('www', 'CNAME', 'a.example.net'),
+                  HostRecord('www', 'TXT', 'hello')]) == ['R203']
+    assert 'R204' in rules([HostRecord('a', 'CNAME', 'b.example.com'),
+                            HostRecord('b', 'CNAME', 'a.example.com')])
+    assert rules([HostRecord('mail', 'CNAME', 'host.example.net'),
+                  HostRecord('@', 'MX', 'mail.example.com')]) == ['R205']
+    assert rules([HostRecord('@', 'A', '185.199.108.153', ttl=300),
+                  HostRecord('@', 'A', '185.199.109.153', ttl=600)]) == ['R206']
+    many = [HostRecord(f'h{i}', 'A', '185.199.108.153') for i in range(MAX_RECORDS + 1)]
+    assert rules(many) == ['R301']
+
+
+def test_preflight_raises_every_error_and_returns_warnings():
+    warnings = preflight([HostRecord('@', 'A', '10.0.0.1')], 'example.com')
+    assert [v.rule for v in warnings] == ['R108']
+    with pytest.raises(InvalidRecords) as raised:
+        preflight([HostRecord('@', 'CNAME', 'x.net', ttl=1), HostRecord('@', 'SRV', 'x')],
+                  'example.com')
+    assert sorted(v.rule for v in raised.value.violations) == ['R101', 'R103', 'R202']
+    assert str(raised.value).startswith('example.com: ')
+
+
+def test_plan_rules():
+    current = [HostRecord('@', 'A', '185.199.108.153'),
+               HostRecord('@', 'MX', 'mail.example.net', mx_pref=10)]
+    everything = Plan(remove=list(current))
+    assert apply_plan(current, everything) == []
+    assert sorted(v.rule for v in check_plan(current, everything)) == ['R302', 'R401']
+    assert [v.rule for v in check_plan(current, everything, allow_empty=True)] == ['R401']
+    assert errors(check_plan(current, Plan(remove=current[1:]))) == []
@@ -0,0 +1,153 @@
+import threading
+import time
+
+import pytest
+
+from http_transport import TransportError
+from namecheap_client import ApiResult
+from resilience import TOO_MANY_REQUESTS, CallPolicy, CircuitBreaker, CircuitOpenError
+from run_metrics import METRICS
+
+OK = ApiResult(True)
+
+
+def policy(**kwargs):
+    kwargs.setdefault('backoff', 0.001)
+    kwargs.setdefault('hedge_after', None)
+    return CallPolicy(**kwargs)
+
+
+def failing(times, result=OK, error=TransportError('reset')):
+    """A call failing ``times`` times, then returning ``result``; counts attempts"""
+    attempts = []
+
+    def call(timeout):
+        attempts.append(timeout)
+        if len(attempts) <= times:
+            raise error
+        return result
+    return call, attempts
+
+
+def test_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker(threshold=2, reset_after=0.05)
+    breaker.failure()
+    breaker.before_call()
+    breaker.failure()
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.06)
+    assert breaker.state == 'half-open'
+    breaker.before_call()               # the one trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.success()
+    assert breaker.state == 'closed'
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(threshold=1, reset_after=0.05)
+    breaker.failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.failure()
+    assert breaker.state == 'open'
+
+
+def test_read_retries_transient_errors():
+    call, attempts = failing(2)
+    assert policy().read(call, 'getHosts') is OK
+    assert len(attempts) == 3
+
+
+def test_read_gives_up_after_retries():
+    call, attempts = failing(10)
+    with pytest.raises(TransportError):
+        policy(retries=2).read(call, 'getHosts')
+    assert len(attempts) == 3
+
+
+def test_read_retries_rate_limits_and_returns_api_errors():
+    limited = ApiResult(False, errors=[(TOO_MANY_REQUESTS, 'Too many requests')])
+    assert policy(retries=1).read(lambda t: limited, 'getHosts') is limited
+    denied = ApiResult(False, errors=[('2050900', 'Invalid request IP')])
+    call, attempts = failing(0, denied)
+    assert policy().read(call, 'getHosts') is denied
+    assert len(attempts) == 1
+
+
+def test_open_breaker_stops_retries():
+    shared = policy(breaker=CircuitBreaker(threshold=2, reset_after=60))
+    call, attempts = failing(10)
+    with pytest.raises(CircuitOpenError):
+        shared.read(call, 'getHosts')
+    assert len(attempts) == 2
+
+
+def test_hedge_wins_over_a_stalled_read():
+    release = threading.Event()
+    attempts = []
+
+    def call(timeout):
+        attempts.append(timeout)
+        if len(attempts) == 1:
+            release.wait(5)
+            return ApiResult(True, raw=b'slow')
+        return OK
+
+    wins = METRICS.total('api_hedge_wins')
+    started = time.monotonic()
+    try:
+        assert policy(hedge_after=0.05).read(call, 'getHosts') is OK
+    finally:
+        release.set()
+    assert time.monotonic() - started < 1
+    assert len(attempts) == 2
+    assert METRICS.total('api_hedge_wins') == wins + 1
+
+
+def test_fast_reads_are_not_hedged():
+    call, attempts = failing(0)
+    assert policy(hedge_after=0.5).read(call, 'getHosts') is OK
+    assert len(attempts) == 1
+
+
+def test_budget_bounds_retries_and_timeouts():
+    attempts = []
+
+    def call(timeout):
+        attempts.append(timeout)
+        time.sleep(0.05)
+        raise TransportError('timed out')
+
+    slow = CallPolicy(retries=50, backoff=0.01, max_backoff=0.01, hedge_after=None,
+                      read_timeout=(5, 10), budget=0.3)
+    started = time.monotonic()
+    with pytest.raises(TransportError):
+        slow.read(call, 'getHosts')
+    assert time.monotonic() - started < 0.5
+    assert len(attempts) < 51
+    assert all(connect <= 0.3 and read <= 0.3 for connect, read in attempts)
+
+
+def test_write_resends_only_when_it_did_not_land():
+    call, attempts = failing(1)
+    assert policy().write(call, lambda: None, 'setHosts') is OK
+    assert len(attempts) == 2
+
+    confirmed = ApiResult(True, raw=b'read back')
+    call, attempts = failing(1)
+    assert policy().write(call, lambda: confirmed, 'setHosts') is confirmed
+    assert len(attempts) == 1
+
+
+def test_write_is_not_resent_blindly():
+    call, attempts = failing(1)
+
+    def landed():
+        raise TransportError('read-back failed too')
+
+    with pytest.raises(TransportError, match='reset'):
+        policy().write(call, landed, 'setHosts')
+    assert len(attempts) == 1
@@ -0,0 +1,115 @@
+import json
+import re
+
+import pytest
+
+from zone_file import (ZoneError, compile_zone, desired_records, parse_bind, parse_mapping,
+                       parse_ttl, parse_zone)
+
+
+def test_parse_ttl():
+    assert parse_ttl('3600') == 3600
+    assert parse_ttl('1h30m') == 5400
+    assert parse_ttl('1W') == 604800
+    with pytest.raises(ValueError):
+        parse_ttl('1x')
+
+
+def test_parse_bind():
+    origin, entries = parse_bind("""\
+$ORIGIN Example.COM.
+$TTL 1h
+@       IN A     192.0.2.1   ; apex
+        300 IN A 192.0.2.2
+www     CNAME    example.com.
+api     IN CNAME lb
+@       MX 10    mail.example.net.
+txt     TXT      "v=spf1 " "~all"
+long    TXT      ( "first"
+                   "second" )
+@       NS       ns1.example.net.
+@       SOA      ns1 hostmaster 1 2 3 4 5
+""")
+    assert origin == 'example.com'
+    records = [record for _, record in entries]
+    assert [(r.name, r.type, r.address, r.ttl) for r in records] == [
+        ('@', 'A', '192.0.2.1', 3600),
+        ('@', 'A', '192.0.2.2', 300),
+        ('www', 'CNAME', 'example.com', 3600),
+        ('api', 'CNAME', 'lb.example.com', 3600),
+        ('@', 'MX', 'mail.example.net', 3600),
+        ('txt', 'TXT', 'v=spf1 ~all', 3600),
+        ('long', 'TXT', 'firstsecond', 3600),
+    ]
+    assert records[4].mx_pref == 10
+    assert [source for source, _ in entries][:2] == ['line 3', 'line 4']
+
+
+@pytest.mark.parametrize('text, message', [
+    ('www IN A 192.0.2.1\n', 'no $ORIGIN'),
+    ('$ORIGIN example.com.\n@ IN SRV 0 0 443 x.\n', 'unsupported record type'),
+    ('$ORIGIN example.com.\n@ IN MX mail\n', 'MX needs'),
+    ('$ORIGIN example.com.\nwww.other.org. IN A 192.0.2.1\n', 'outside the zone'),
+    ('$ORIGIN example.com.\ntxt TXT "open\n', 'unterminated'),
+    ('$ORIGIN example.com.\ntxt TXT ( "a"\n', "unclosed '('"),
+    ('$INCLUDE other.zone\n', 'unsupported directive'),
+])
+def test_parse_bind_errors(text, message):
+    with pytest.raises(ZoneError, match=re.escape(message)):
+        parse_bind(text)
+
+
+def test_parse_mapping():
+    origin, entries = parse_mapping({
+        'domain': 'Example.com.', 'ttl': 600, 'records': [
+            {'name': '@', 'type': 'a', 'address': '192.0.2.1'},
+            {'name': 'www', 'type': 'CNAME', 'address': 'example.com', 'ttl': 300},
+            {'HostName': '@', 'RecordType': 'MX', 'Address': 'mail.example.net', 'MXPref': '5'},
+        ]})
+    assert origin == 'example.com'
+    records = [record for _, record in entries]
+    assert [(r.type, r.ttl) for r in records] == [('A', 600), ('CNAME', 300), ('MX', 1800)]
+    assert records[2].mx_pref == 5
+
+
+def test_parse_mapping_errors():
+    with pytest.raises(ZoneError, match="'records' list"):
+        parse_mapping({'domain': 'example.com'})
+    with pytest.raises(ZoneError, match=r'records\[0\]'):
+        parse_mapping({'records': [{'name': '@'}]})
+
+
+def test_parse_zone_takes_the_domain_from_the_file_name():
+    origin, entries = parse_zone('@ IN A 192.0.2.1\n', 'zones/example.com.zone')
+    assert origin == 'example.com' and entries[0][1].name == '@'
+
+
+def test_compile_zone_caches_by_content_and_name(tmp_path):
+    text = '@ IN A 192.0.2.1\nwww IN CNAME example.net.\n'
+    first = tmp_path / 'a.example.zone'
+    second = tmp_path / 'b.example.zone'
+    first.write_text(text)
+    second.write_text(text)
+    cache = tmp_path / 'zone-cache'
+    zone = compile_zone(str(first), directory=str(cache))
+    assert zone.domain == 'a.example'
+    assert zone.params['RecordType2'] == 'CNAME'
+    assert compile_zone(str(first), directory=str(cache)).digest == zone.digest
+    assert len(list(cache.iterdir())) == 1
+    # Same content under another name is another zone
+    assert compile_zone(str(second), directory=str(cache)).domain == 'b.example'
+
+
+def test_compile_zone_rejects_invalid_records(tmp_path):
+    path = tmp_path / 'example.com.json'
+    path.write_text(json.dumps({'records': [{'name': '@', 'type': 'CNAME', 'address': 'x.net'}]}))
+    with pytest.raises(ZoneError, match='R202'):
+        compile_zone(str(path), 'example.com', use_cache=False)
+
+
+def test_desired_records_falls_back_to_github_pages(tmp_path):
+    records = desired_records('missing.example')
+    assert {r.type for r in records} == {'A', 'CNAME'}
+    path = tmp_path / 'other.zone'
+    path.write_text('$ORIGIN other.example.\n@ IN A 192.0.2.9\n')
+    assert [r.address for r in desired_records('other.example', str(path))] == ['192.0.2.9']
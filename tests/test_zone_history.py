@@ -0,0 +1,72 @@
+import pytest
+
+from namecheap_client import HostRecord
+from zone_history import ZoneHistory, parse_when, rollback, zone_hash
+
+OLD = [HostRecord('@', 'A', '185.199.108.153'), HostRecord('www', 'CNAME', 'old.example.com')]
+NEW = [HostRecord('@', 'A', '185.199.108.153'), HostRecord('www', 'CNAME', 'new.example.com')]
+
+
+@pytest.fixture
+def history():
+    history = ZoneHistory(':memory:')
+    yield history
+    history.close()
+
+
+def test_zone_hash_ignores_order_and_case():
+    assert zone_hash(OLD) == zone_hash([HostRecord('WWW', 'CNAME', 'Old.Example.com.'), OLD[0]])
+    assert zone_hash(OLD) != zone_hash(NEW)
+
+
+def test_parse_when():
+    assert parse_when('2d', now=1_000_000) == 1_000_000 - 172800
+    assert parse_when('1700000000') == 1700000000.0
+    with pytest.raises(ValueError):
+        parse_when('last tuesday')
+
+
+def test_unchanged_polls_only_move_last_seen(history):
+    first = history.record('Test.Zone', OLD, when=100)
+    assert history.record('test.zone', list(reversed(OLD)), when=200) == first
+    (digest, prev, kind, _, first_seen, last_seen, count), = history.log('test.zone')
+    assert (digest, prev, kind, first_seen, last_seen, count) == (first, None, 'get', 100, 200, 2)
+    # A write is always an entry, even when the content is the same
+    history.record('test.zone', OLD, 'set', ['~ nothing'], when=300)
+    assert len(history.log('test.zone')) == 2
+
+
+def test_point_in_time_queries(history):
+    old = history.record('test.zone', OLD, when=100)
+    history.record('test.zone', NEW, 'set', ['~ www'], when=200)
+    history.record('other.zone', OLD, when=150)
+    assert history.zone_at('test.zone', 150)[0] == old
+    assert history.zone_at('test.zone', 50) is None
+    assert history.lookup('test.zone', 'www', 'cname', when=150) == [('CNAME', 'old.example.com', 1800)]
+    assert history.lookup('test.zone', 'www.', when=250) == [('CNAME', 'new.example.com', 1800)]
+    assert history.changed_since(0) == [('test.zone', 1, 200)]
+    # Both domains share one stored copy of the OLD zone
+    assert history.db.execute('SELECT COUNT(*) FROM zones').fetchone() == (2,)
+    assert [r.key for r in history.snapshot(old[:12])] == [r.key for r in OLD]
+
+
+def test_rollback_of_an_unchanged_zone_is_a_noop(namecheap, history):
+    server, client = namecheap
+    server.state.add_zone('test.zone', OLD)
+    plan, result = rollback(client, 'test.zone', OLD, history)
+    assert plan.is_noop and result is None
+    assert 'namecheap.domains.dns.setHosts' not in server.state.calls
+    assert history.log('test.zone') == []
+
+
+def test_rollback_restores_a_snapshot(namecheap, history):
+    server, client = namecheap
+    server.state.add_zone('test.zone', NEW)
+    plan, result = rollback(client, 'test.zone', OLD, history, dry_run=True)
+    assert not plan.is_noop and result is None
+    assert 'namecheap.domains.dns.setHosts' not in server.state.calls
+
+    plan, result = rollback(client, 'test.zone', OLD, history)
+    assert result.ok
+    assert {r.key for r in server.state.zones['test.zone']} == {r.key for r in OLD}
+    assert history.log('test.zone')[0][2] == 'rollback'
@@ -4,107 +4,123 @@ Direct DNS update script for Namecheap
 No interaction required - pass credentials as arguments or env vars
 """
 
-import requests
-import xml.etree.ElementTree as ET
 import sys
 import os
 
+from run_metrics import span, write_reports
+
 # Domain settings
 DOMAIN = "lech.world"
 SLD = "lech"
 TLD = "world"
 
-# GitHub Pages IPs
-GITHUB_IPS = [
-    "185.199.108.153",
-    "185.199.109.153",
-    "185.199.110.153",
-    "185.199.111.153"
-]
-
-def update_dns(api_user, api_key):
-    # Get client IP
+def update_dns(api_user, api_key, force=False, client_ip=None, zone_file=None):
+    # Imported here so the usage message and --profile start without them
+    from client_ip import ClientIPError, get_client_ip
+    from dns_reconcile import reconcile
+    from namecheap_client import NamecheapClient
+    from record_rules import InvalidRecords, print_violations
+    from zone_file import ZoneError, desired_records
+    from zone_history import open_history
+    
+    # Get client IP (explicit, NAMECHEAP_CLIENT_IP, cache or echo services)
     try:
-        client_ip = requests.get('https://api.ipify.org', timeout=5).text.strip()
-    except:
-        client_ip = "8.8.8.8"
+        client_ip = get_client_ip(client_ip)
+    except ClientIPError as e:
+        print(f"❌ Could not determine client IP: {e}")
+        print("   Pass --client-ip <IP> or set NAMECHEAP_CLIENT_IP")
+        return False
     
     print(f"🌐 Updating DNS for {DOMAIN}")
     print(f"📍 Client IP: {client_ip}")
     
-    # Build parameters for setting DNS records
-    params = {
-        'ApiUser': api_user,
-        'ApiKey': api_key,
-        'UserName': api_user,
-        'Command': 'namecheap.domains.dns.setHosts',
-        'ClientIp': client_ip,
-        'SLD': SLD,
-        'TLD': TLD
-    }
-    
-    # Add A records for GitHub Pages
-    for i, ip in enumerate(GITHUB_IPS, 1):
-        params[f'HostName{i}'] = '@'
-        params[f'RecordType{i}'] = 'A'
-        params[f'Address{i}'] = ip
-        params[f'TTL{i}'] = '1800'
-    
-    # Add CNAME for www
-    params['HostName5'] = 'www'
-    params['RecordType5'] = 'CNAME'
-    params['Address5'] = 'leolech14.github.io'
-    params['TTL5'] = '1800'
+    try:
+        records = desired_records(DOMAIN, zone_file)
+    except (OSError, ZoneError) as e:
+        print(f"❌ Invalid zone file: {e}")
+        return False
     
     print("\n📝 Setting DNS records:")
-    print("  A    @    → 185.199.108.153")
-    print("  A    @    → 185.199.109.153")
-    print("  A    @    → 185.199.110.153")
-    print("  A    @    → 185.199.111.153")
-    print("  CNAME www → leolech14.github.io")
+    for record in records:
+        print(f"  {record.type:5} {record.name:4} → {record.address}")
     
     # Make API request
     print("\n🚀 Sending to Namecheap API...")
     
     try:
-        response = requests.post(
-            'https://api.namecheap.com/xml.response',
-            data=params,
-            timeout=30
-        )
+        with NamecheapClient(api_user, api_key, client_ip, history=open_history()) as client:
+            outcome = reconcile(client, SLD, TLD, records, force=force)
+        result = outcome.api_result
+        
+        if outcome.superseded:
+            print("ℹ️  Another run queued newer records meanwhile; the zone was brought to those")
+        if not outcome.changed and outcome.ok:
+            print("✅ Zone already up to date, nothing to change")
+            return True
         
-        root = ET.fromstring(response.text)
+        for line in outcome.plan.lines():
+            print(line)
         
-        if root.get('Status') == 'OK':
+        if outcome.ok:
             print("✅ DNS updated successfully!")
             print("\n🎉 Your site will be available at:")
             print("   https://www.lech.world (wait 5-30 minutes)")
             return True
         else:
-            errors = root.findall('.//Error')
-            if errors:
+            if result.errors:
                 print("❌ Error:")
-                for error in errors:
-                    print(f"   {error.text}")
-                    if "2050900" in str(error.get('Number', '')):
+                for error_num, error_text in result.errors:
+                    print(f"   {error_text}")
+                    if "2050900" in error_num:
                         print(f"\n⚠️  Add your IP to whitelist: {client_ip}")
                         print("   https://ap.www.namecheap.com/settings/tools/apiaccess/")
             else:
-                print(f"❌ API Error: {response.text[:200]}")
+                print(f"❌ API Error: {result.text[:200]}")
             return False
+    except InvalidRecords as e:
+        print("❌ Records failed pre-flight checks, nothing was written:")
+        print_violations(e.violations)
+        return False
     except Exception as e:
         print(f"❌ Error: {e}")
         return False
 
 if __name__ == "__main__":
+    # --force rewrites the zone even when it already matches
+    # --client-ip <IP> skips IP detection
+    # --zone <FILE> reads the desired records from another zone file
+    # --profile writes CPU and memory profiles per phase (see run_profile.py)
+    args = sys.argv[1:]
+    force = '--force' in args
+    profile = '--profile' in args
+    args = [arg for arg in args if arg not in ('--force', '--profile')]
+    client_ip = None
+    if '--client-ip' in args:
+        i = args.index('--client-ip')
+        client_ip = args[i + 1] if i + 1 < len(args) else None
+        del args[i:i + 2]
+    zone_file = None
+    if '--zone' in args:
+        i = args.index('--zone')
+        zone_file = args[i + 1] if i + 1 < len(args) else None
+        del args[i:i + 2]
+    
     # Try to get credentials from command line or environment
-    api_user = sys.argv[1] if len(sys.argv) > 1 else os.getenv('NAMECHEAP_API_USER')
-    api_key = sys.argv[2] if len(sys.argv) > 2 else os.getenv('NAMECHEAP_API_KEY')
+    api_user = args[0] if len(args) > 0 else os.getenv('NAMECHEAP_API_USER')
+    api_key = args[1] if len(args) > 1 else os.getenv('NAMECHEAP_API_KEY')
     
     if not api_user or not api_key:
-        print("Usage: python3 update_dns.py <API_USER> <API_KEY>")
+        print("Usage: python3 update_dns.py [--force] [--profile] [--client-ip IP] [--zone FILE] <API_USER> <API_KEY>")
         print("Or set environment variables: NAMECHEAP_API_USER and NAMECHEAP_API_KEY")
         print("\nGet credentials at: https://ap.www.namecheap.com/settings/tools/apiaccess/")
         sys.exit(1)
     
-    update_dns(api_user, api_key)
\ No newline at end of file
+    if profile:
+        from run_profile import start_profiling
+        start_profiling('update_dns')
+    try:
+        with span('update_dns'):
+            ok = update_dns(api_user, api_key, force=force, client_ip=client_ip, zone_file=zone_file)
+    finally:
+        write_reports('update_dns')
+    sys.exit(0 if ok else 1)
\ No newline at end of file
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Verify the deployed site against the local static export
+Walks out/ (through out_manifest.py, so local hashes are only recomputed
+for files that changed), maps each file to its URL the way firebase.json
+serves it (cleanUrls, index.html), and fetches every URL over a pooled
+keep-alive connection pool with bounded concurrency. Each body is hashed
+while it streams in and compared with the local SHA-256, and the
+Cache-Control header is checked against the hosting.headers rules.
+
+Reports content mismatches, missing assets and wrong or missing
+(immutable) cache headers; exits 1 if anything is off. A file missing
+from the deploy is still answered 200 by the "**" rewrite, so a body
+identical to the rewrite target (index.html) counts as missing too.
+
+Usage: python3 verify_site.py [--base-url https://www.lech.world]
+                              [--workers 16] [--changed-only] [--json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote, unquote
+
+from http_transport import TransportError, make_transport
+from out_manifest import (DEFAULT_MANIFEST, DEFAULT_PUBLIC, FIREBASE_CONFIG, load_manifest,
+                          update_manifest, write_manifest)
+from run_metrics import incr, percentile, span
+
+BASE_URL = 'https://www.lech.world'
+WORKERS = 16
+TIMEOUT = (5, 30)
+
+# Not served under their own name
+SKIP = ('404.html',)
+
+
+def _glob_regex(pattern):
+    """Firebase hosting glob (**, *, ?, @(a|b)) -> compiled regex"""
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+            continue
+        if c == '*':
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c in '@!+' and pattern.startswith('(', i + 1):
+            end = pattern.index(')', i)
+            options = '|'.join(re.escape(o) for o in pattern[i + 2:end].split('|'))
+            out.append(f'(?:{options})')
+            i = end + 1
+            continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return re.compile(''.join(out) + '$')
+
+
+class HostingConfig:
+    """The parts of firebase.json hosting that decide URLs and headers"""
+
+    def __init__(self, clean_urls=False, header_rules=None, rewrites=None):
+        self.clean_urls = clean_urls
+        self.header_rules = header_rules or []   # [(regex, {header: value})]
+        self.rewrites = rewrites or []           # [(regex, destination file)]
+
+    @classmethod
+    def load(cls, path=FIREBASE_CONFIG):
+        try:
+            with open(path) as f:
+                hosting = json.load(f).get('hosting', {})
+        except (OSError, ValueError):
+            return cls()
+        rules = []
+        for rule in hosting.get('headers', []):
+            pattern = rule.get('source') or rule.get('glob')
+            if pattern:
+                headers = {h['key'].lower(): h['value'] for h in rule.get('headers', [])}
+                rules.append((_glob_regex(pattern.lstrip('/')), headers))
+        rewrites = []
+        for rule in hosting.get('rewrites', []):
+            pattern = rule.get('source') or rule.get('glob')
+            if pattern and rule.get('destination'):
+                rewrites.append((_glob_regex(pattern.lstrip('/')), rule['destination'].lstrip('/')))
+        return cls(bool(hosting.get('cleanUrls')), rules, rewrites)
+
+    def url_path(self, rel):
+        """'guide.html' -> '/guide' with cleanUrls, 'index.html' -> '/'"""
+        if rel == 'index.html' or rel.endswith('/index.html'):
+            rel = rel[:-len('index.html')]
+        elif self.clean_urls and rel.endswith('.html'):
+            rel = rel[:-len('.html')]
+        return '/' + quote(rel)
+
+    def rewrite_target(self, rel):
+        """File served for this URL if the file itself were missing, or None"""
+        path = unquote(self.url_path(rel)).lstrip('/')
+        for regex, destination in self.rewrites:
+            if regex.match(path):
+                return destination
+        return None
+
+    def expected_headers(self, rel):
+        """Headers the rules declare for a file; later rules win"""
+        expected = {}
+        for regex, headers in self.header_rules:
+            if regex.match(rel):
+                expected.update(headers)
+        return expected
+
+
+def _normalize(value):
+    return ','.join(part.strip().lower() for part in value.split(','))
+
+
+def check_cache_control(expected, served):
+    """Problems with the served Cache-Control for one file"""
+    if not expected:
+        return []
+    if served is None:
+        return [f"missing Cache-Control (want {expected!r})"]
+    if _normalize(served) == _normalize(expected):
+        return []
+    if 'immutable' in _normalize(expected) and 'immutable' not in _normalize(served):
+        return [f"Cache-Control {served!r} is not immutable (want {expected!r})"]
+    return [f"Cache-Control {served!r} (want {expected!r})"]
+
+
+def verify_file(transport, base_url, config, rel, sha256, timeout=TIMEOUT, rewrite_sha256=None):
+    """Fetch one file and compare it; returns a result dict, never raises
+
+    ``rewrite_sha256`` is the hash of the file a rewrite would serve in its
+    place: a body matching it means the file itself is not deployed.
+    """
+    url = base_url.rstrip('/') + config.url_path(rel)
+    result = {'path': rel, 'url': url, 'status': None, 'problems': [], 'bytes': 0}
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    try:
+        # identity so the bytes hashed are the bytes on disk
+        with transport.stream('GET', url, headers={'Accept-Encoding': 'identity'},
+                              timeout=timeout) as response:
+            result['status'] = response.status
+            headers = {k.lower(): v for k, v in response.headers.items()}
+            for chunk in response.iter_chunks():
+                digest.update(chunk)
+                result['bytes'] += len(chunk)
+    except TransportError as e:
+        result['problems'].append(f"fetch failed: {e}")
+    else:
+        if result['status'] == 404:
+            result['problems'].append("missing (404)")
+        elif result['status'] != 200:
+            result['problems'].append(f"HTTP {result['status']}")
+        elif sha256 != digest.hexdigest() == rewrite_sha256:
+            # The rewrite answered, so the headers are the target's too
+            result['problems'].append(f"missing (rewritten to /{config.rewrite_target(rel)})")
+        else:
+            if digest.hexdigest() != sha256:
+                result['problems'].append(f"content differs ({result['bytes']} bytes served)")
+            expected = config.expected_headers(rel).get('cache-control')
+            result['problems'] += check_cache_control(expected, headers.get('cache-control'))
+    result['seconds'] = round(time.perf_counter() - started, 4)
+    incr('site_files', result='ok' if not result['problems'] else 'problem')
+    return result
+
+
+def _rewrite_sha256(config, manifest, rel):
+    target = config.rewrite_target(rel)
+    if target is None or target == rel or target not in manifest:
+        return None
+    return manifest[target].sha256
+
+
+def verify_site(base_url, manifest, paths=None, workers=WORKERS, config=None, timeout=TIMEOUT):
+    """Yield per-file results in completion order, ``workers`` requests in flight"""
+    config = config or HostingConfig.load()
+    paths = sorted(p for p in (paths if paths is not None else manifest) if p not in SKIP)
+    transport = make_transport(pool_size=workers)
+    try:
+        with span('site_verify'), ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(verify_file, transport, base_url, config, rel,
+                                   manifest[rel].sha256, timeout, _rewrite_sha256(config, manifest, rel))
+                       for rel in paths]
+            for future in as_completed(futures):
+                yield future.result()
+    finally:
+        transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the deployed site byte-for-byte against out/")
+    parser.add_argument('--base-url', default=BASE_URL)
+    parser.add_argument('--public', default=DEFAULT_PUBLIC, help="local export directory")
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    parser.add_argument('--workers', type=int, default=WORKERS, help="concurrent requests")
+    parser.add_argument('--changed-only', action='store_true',
+                        help="only verify files changed since the last manifest update")
+    parser.add_argument('--json', action='store_true', help="print one JSON object per file")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.public):
+        print(f"❌ {args.public} is not a directory (run the static export first)")
+        sys.exit(1)
+
+    manifest, changes = update_manifest(args.public, load_manifest(args.manifest))
+    write_manifest(manifest, args.manifest)
+    paths = changes.changed if args.changed_only else None
+
+    started = time.perf_counter()
+    results = []
+    if not args.json:
+        count = len(paths) if paths is not None else len(manifest)
+        print(f"🔎 Verifying {count} files on {args.base_url} with {args.workers} connections")
+    for result in verify_site(args.base_url, manifest, paths, args.workers):
+        results.append(result)
+        if args.json:
+            print(json.dumps(result), flush=True)
+        elif result['problems']:
+            print(f"❌ {result['url']}")
+            for problem in result['problems']:
+                print(f"     {problem}")
+
+    failed = [r for r in results if r['problems']]
+    if not args.json:
+        elapsed = time.perf_counter() - started
+        times = [r['seconds'] * 1000 for r in results]
+        total = sum(r['bytes'] for r in results)
+        print("-" * 60)
+        print(f"{'✅' if not failed else '⚠️ '} {len(results) - len(failed)}/{len(results)} files OK "
+              f"in {elapsed:.2f}s ({total / 1024:.0f} KiB, "
+              f"p50 {percentile(times, 50):.0f} ms, p95 {percentile(times, 95):.0f} ms)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
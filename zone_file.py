@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Declarative zone files for the Namecheap scripts
+Desired records are described in a BIND-style zone file or in JSON/YAML,
+validated once and compiled into HostRecords plus the indexed setHosts
+parameters (HostNameN, RecordTypeN, AddressN, TTLN, MXPrefN). Compiled
+zones are cached on disk keyed by the SHA-256 of the file's content, so
+batch runs over large, unchanged zones skip parsing and validation.
+
+BIND format (A, AAAA, CNAME, MX, TXT, NS; apex SOA/NS are managed by
+Namecheap and skipped):
+
+    $ORIGIN lech.world.
+    $TTL 1800
+    @     IN A      185.199.108.153
+    www   300 IN CNAME leolech14.github.io.
+    @     MX 10 mail.example.com.
+    @     TXT "v=spf1 include:_spf.example.com ~all"
+
+JSON/YAML format (YAML needs PyYAML):
+
+    {"domain": "lech.world", "ttl": 1800, "records": [
+      {"name": "@", "type": "A", "address": "185.199.108.153"},
+      {"name": "www", "type": "CNAME", "address": "leolech14.github.io", "ttl": 300}
+    ]}
+
+Every script takes its desired records from zones/<domain>.zone through
+desired_records(); the GitHub Pages defaults below are the one fallback
+for when that file is missing.
+
+Usage: python3 zone_file.py zones/lech.world.zone [--domain lech.world]
+                            [--params] [--no-cache]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+from namecheap_client import DEFAULT_TTL, HostRecord, build_host_params
+from record_rules import SUPPORTED_TYPES, check_records, errors, valid_name
+from run_metrics import incr, span
+
+# Bump when parsing or validation changes so stale cache entries are ignored
+CACHE_VERSION = 3
+
+ZONES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'zones')
+
+# GitHub Pages anycast addresses and user site, used only without a zone file
+GITHUB_IPS = (
+    "185.199.108.153",
+    "185.199.109.153",
+    "185.199.110.153",
+    "185.199.111.153",
+)
+GITHUB_USERNAME = "leolech14"
+
+TTL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+class ZoneError(ValueError):
+    """The zone file can't be parsed or fails validation"""
+
+
+class CompiledZone:
+    """Validated records of one zone plus their setHosts parameters"""
+
+    def __init__(self, domain, records, digest, params=None):
+        self.domain = domain
+        self.records = records
+        self.digest = digest
+        self.params = params or build_host_params(records)
+
+    def to_dict(self):
+        return {'version': CACHE_VERSION, 'domain': self.domain, 'digest': self.digest,
+                'records': [r.to_dict() for r in self.records], 'params': self.params}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['domain'], [HostRecord.from_dict(r) for r in d['records']],
+                   d['digest'], d['params'])
+
+
+# --- BIND format ------------------------------------------------------------
+
+def parse_ttl(text):
+    """'3600', '1h', '1h30m' -> seconds"""
+    text = str(text).strip().lower()
+    if text.isdigit():
+        return int(text)
+    total = 0
+    for number, unit in re.findall(r'(\d+)([smhdw])', text):
+        total += int(number) * TTL_UNITS[unit]
+    if not total or re.sub(r'\d+[smhdw]', '', text):
+        raise ValueError(f"Bad TTL {text!r}")
+    return total
+
+
+def _split_line(line, lineno):
+    """Tokens of one line as (quoted, text); comments dropped"""
+    tokens, i, n = [], 0, len(line)
+    while i < n:
+        c = line[i]
+        if c in ' \t\r\n':
+            i += 1
+        elif c == ';':
+            break
+        elif c == '"':
+            j, buf = i + 1, []
+            while j < n and line[j] != '"':
+                if line[j] == '\\' and j + 1 < n:
+                    j += 1
+                buf.append(line[j])
+                j += 1
+            if j >= n:
+                raise ZoneError(f"line {lineno}: unterminated string")
+            tokens.append((True, ''.join(buf)))
+            i = j + 1
+        elif c in '()':
+            tokens.append((False, c))
+            i += 1
+        else:
+            j = i
+            while j < n and line[j] not in ' \t\r\n;"()':
+                j += 1
+            tokens.append((False, line[i:j]))
+            i = j
+    return tokens
+
+
+def _logical_lines(text):
+    """(lineno, inherits_owner, tokens) per record, joining ( ... ) continuations"""
+    depth, start, inherit, tokens = 0, 0, False, []
+    for lineno, line in enumerate(text.splitlines(), 1):
+        parts = _split_line(line, lineno)
+        if depth == 0:
+            if not parts:
+                continue
+            start, inherit, tokens = lineno, line[:1] in (' ', '\t'), []
+        for quoted, value in parts:
+            if not quoted and value == '(':
+                depth += 1
+            elif not quoted and value == ')':
+                depth -= 1
+                if depth < 0:
+                    raise ZoneError(f"line {lineno}: unbalanced ')'")
+            else:
+                tokens.append((quoted, value))
+        if depth == 0 and tokens:
+            yield start, inherit, tokens
+    if depth:
+        raise ZoneError(f"line {start}: unclosed '('")
+
+
+def _absolute(name, origin):
+    name = name.lower()
+    if name == '@':
+        return origin
+    if name.endswith('.'):
+        return name.rstrip('.')
+    return f"{name}.{origin}"
+
+
+def _host(name, origin, lineno):
+    """Absolute owner name -> Namecheap HostName ('@' for the apex)"""
+    if name == origin:
+        return '@'
+    if name.endswith('.' + origin):
+        return name[:-len(origin) - 1]
+    raise ZoneError(f"line {lineno}: {name} is outside the zone {origin}")
+
+
+def parse_bind(text, origin=None):
+    """(origin, [(source, HostRecord)]) from BIND zone file text"""
+    origin = origin.lower().rstrip('.') if origin else None
+    default_ttl = DEFAULT_TTL
+    owner = None
+    entries = []
+
+    for lineno, inherit, tokens in _logical_lines(text):
+        values = [value for _, value in tokens]
+        if values[0].startswith('$'):
+            directive = values[0].upper()
+            if directive == '$ORIGIN' and len(values) == 2:
+                origin = values[1].lower().rstrip('.')
+            elif directive == '$TTL' and len(values) == 2:
+                try:
+                    default_ttl = parse_ttl(values[1])
+                except ValueError as e:
+                    raise ZoneError(f"line {lineno}: {e}")
+            else:
+                raise ZoneError(f"line {lineno}: unsupported directive {values[0]}")
+            continue
+        if not origin:
+            raise ZoneError(f"line {lineno}: no $ORIGIN and no domain given")
+
+        if not inherit:
+            owner = _absolute(values.pop(0), origin)
+            tokens = tokens[1:]
+        elif owner is None:
+            raise ZoneError(f"line {lineno}: record without an owner name")
+
+        # [TTL] [class] or [class] [TTL], then the type
+        ttl = default_ttl
+        while values:
+            word = values[0].upper()
+            if word in ('IN', 'CH', 'HS'):
+                if word != 'IN':
+                    raise ZoneError(f"line {lineno}: only class IN is supported")
+            elif word[:1].isdigit():
+                try:
+                    ttl = parse_ttl(values[0])
+                except ValueError as e:
+                    raise ZoneError(f"line {lineno}: {e}")
+            else:
+                break
+            values.pop(0)
+            tokens = tokens[1:]
+        if not values:
+            raise ZoneError(f"line {lineno}: missing record type")
+        type_ = values.pop(0).upper()
+        rdata = tokens[1:]
+        source = f"line {lineno}"
+
+        if type_ == 'SOA' or (type_ == 'NS' and owner == origin):
+            continue   # Namecheap manages the apex SOA and nameservers
+        if type_ not in SUPPORTED_TYPES:
+            raise ZoneError(f"{source}: unsupported record type {type_}")
+        if not rdata:
+            raise ZoneError(f"{source}: {type_} record without data")
+
+        host = _host(owner, origin, lineno)
+        mx_pref = None
+        if type_ == 'TXT':
+            address = ''.join(value for _, value in rdata)
+        elif type_ == 'MX':
+            if len(rdata) != 2 or not rdata[0][1].isdigit():
+                raise ZoneError(f"{source}: MX needs '<preference> <host>'")
+            mx_pref = int(rdata[0][1])
+            address = _absolute(rdata[1][1], origin)
+        elif len(rdata) != 1:
+            raise ZoneError(f"{source}: {type_} takes exactly one value")
+        elif type_ in ('CNAME', 'NS'):
+            address = _absolute(rdata[0][1], origin)
+        else:
+            address = rdata[0][1]
+        entries.append((source, HostRecord(host, type_, address, ttl, mx_pref)))
+    return origin, entries
+
+
+# --- JSON / YAML --------------------------------------------------------------
+
+def parse_mapping(data, origin=None):
+    """(origin, [(source, HostRecord)]) from the JSON/YAML structure"""
+    if not isinstance(data, dict) or not isinstance(data.get('records'), list):
+        raise ZoneError("expected an object with a 'records' list")
+    origin = (origin or data.get('domain') or '').lower().rstrip('.') or None
+    default_ttl = data.get('ttl', DEFAULT_TTL)
+    entries = []
+    for i, entry in enumerate(data['records']):
+        source = f"records[{i}]"
+        try:
+            if 'RecordType' in entry:
+                record = HostRecord.from_dict(entry)
+            else:
+                record = HostRecord(entry.get('name', '@'), entry['type'], str(entry['address']),
+                                    entry.get('ttl', default_ttl), entry.get('mx_pref'))
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            raise ZoneError(f"{source}: bad record ({e})")
+        entries.append((source, record))
+    return origin, entries
+
+
+def _load_yaml(text):
+    try:
+        import yaml
+    except ImportError:
+        raise ZoneError("YAML zone files need PyYAML (pip install pyyaml)")
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as e:
+        raise ZoneError(f"invalid YAML: {e}")
+
+
+def parse_zone(text, path, domain=None):
+    """Dispatch on the file extension: .json, .yaml/.yml, anything else is BIND"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ZoneError(f"invalid JSON: {e}")
+        return parse_mapping(data, domain)
+    if ext in ('.yaml', '.yml'):
+        return parse_mapping(_load_yaml(text), domain)
+    if not domain:
+        # lech.world.zone / lech.world.db -> lech.world
+        base = os.path.basename(path)
+        if ext in ('.zone', '.db') and base.count('.') >= 2:
+            domain = os.path.splitext(base)[0]
+    return parse_bind(text, domain)
+
+
+# --- validation ---------------------------------------------------------------
+
+def validate(entries, domain):
+    """All errors in a parsed zone as a list of messages (empty when valid)
+
+    The checks themselves are record_rules'; warnings don't fail a zone.
+    """
+    problems = []
+    if not domain or not valid_name(domain):
+        problems.append(f"bad or missing domain {domain!r}")
+    violations = check_records([record for _, record in entries], domain,
+                               [source for source, _ in entries])
+    return problems + [str(v) for v in errors(violations)]
+
+
+# --- compile + cache ----------------------------------------------------------
+
+def cache_dir():
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'lechworld', 'zones')
+
+
+def _read_cache(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') == CACHE_VERSION:
+            return CompiledZone.from_dict(data)
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _write_cache(path, zone):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(zone.to_dict(), f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def compile_zone(path, domain=None, use_cache=True, directory=None):
+    """Parse, validate and compile a zone file; raises ZoneError
+
+    The cache key covers the file content, the file name (a BIND file
+    without $ORIGIN takes its domain from it), the domain override and
+    CACHE_VERSION, so an edited file or a parser change always recompiles.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    key = f"{CACHE_VERSION}\0{os.path.basename(path).lower()}\0{(domain or '').lower()}\0"
+    digest = hashlib.sha256(key.encode('utf-8') + data).hexdigest()
+    cached_path = os.path.join(directory or cache_dir(), f"{digest}.json")
+
+    if use_cache:
+        zone = _read_cache(cached_path)
+        if zone:
+            incr('zone_cache_hits')
+            return zone
+        incr('zone_cache_misses')
+
+    with span('zone_compile'):
+        try:
+            text = data.decode('utf-8')
+        except UnicodeDecodeError as e:
+            raise ZoneError(f"{path}: not UTF-8 ({e})")
+        origin, entries = parse_zone(text, path, domain)
+        problems = validate(entries, origin)
+        if problems:
+            raise ZoneError(f"{path}: " + "; ".join(problems))
+        zone = CompiledZone(origin, [record for _, record in entries], digest)
+
+    if use_cache:
+        _write_cache(cached_path, zone)
+    return zone
+
+
+def github_pages_records(ips, username, ttl=DEFAULT_TTL):
+    """Desired records for GitHub Pages: apex A records plus the www CNAME"""
+    records = [HostRecord('@', 'A', ip, ttl) for ip in ips]
+    records.append(HostRecord('www', 'CNAME', f'{username}.github.io', ttl))
+    return records
+
+
+def zone_path(domain):
+    return os.path.join(ZONES_DIR, f'{domain}.zone')
+
+
+def desired_records(domain, path=None):
+    """Records from ``path`` or zones/<domain>.zone, else the GitHub Pages defaults
+
+    Raises ZoneError (or OSError for an explicit ``path``) like compile_zone.
+    """
+    if path or os.path.exists(zone_path(domain)):
+        return compile_zone(path or zone_path(domain), domain).records
+    return github_pages_records(GITHUB_IPS, GITHUB_USERNAME)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate and compile a zone file")
+    parser.add_argument('zone_file')
+    parser.add_argument('--domain', help="zone origin (default: $ORIGIN, 'domain' key or file name)")
+    parser.add_argument('--params', action='store_true', help="print the setHosts parameters as JSON")
+    parser.add_argument('--no-cache', action='store_true', help="always parse and validate")
+    args = parser.parse_args()
+
+    try:
+        zone = compile_zone(args.zone_file, args.domain, use_cache=not args.no_cache)
+    except (OSError, ZoneError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if args.params:
+        print(json.dumps(zone.params, indent=2))
+        return
+    print(f"✅ {zone.domain}: {len(zone.records)} records (sha256 {zone.digest[:12]})")
+    for record in zone.records:
+        pref = f" {record.mx_pref}" if record.type == 'MX' else ''
+        print(f"   {record.type:6} {record.name:20} {record.ttl:>6}{pref} → {record.address}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Change history for Namecheap zones
+Every getHosts result and every applied setHosts is stored as a snapshot
+in a local SQLite database. Zone contents are stored once per content
+hash, and a domain only gets a new history entry when its hash changes,
+so polling an unchanged zone costs one UPDATE. Records are indexed by
+domain, name/type and time, which makes "what did www point to on a given
+date" and "which domains changed this week" single queries. A stored
+snapshot can be replayed with one setHosts.
+
+The database lives at ~/.local/share/lechworld/zone_history.db; set
+DNS_HISTORY_DB to use another file, or DNS_HISTORY_DB=off to disable it.
+
+Usage: python3 zone_history.py log lech.world
+       python3 zone_history.py show lech.world --at 2026-10-01
+       python3 zone_history.py lookup lech.world www --at 2026-10-01
+       python3 zone_history.py changed --since 7d
+       python3 zone_history.py rollback lech.world --at 2026-10-01 [--dry-run]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from client_ip import ClientIPError, get_client_ip
+from dns_reconcile import fetch_current, plan_changes
+from domain_coord import LockTimeout, mark_applied, write_lock
+from namecheap_client import HostRecord, NamecheapClient, TransportError, split_domain
+
+HISTORY_ENV = 'DNS_HISTORY_DB'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS zones (
+    hash TEXT PRIMARY KEY,
+    records TEXT NOT NULL,            -- JSON list of setHosts-style dicts
+    record_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS zone_records (
+    hash TEXT NOT NULL, name TEXT NOT NULL, type TEXT NOT NULL,
+    address TEXT NOT NULL, ttl INTEGER, mx_pref INTEGER
+);
+CREATE INDEX IF NOT EXISTS zone_records_lookup ON zone_records (hash, name, type);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    domain TEXT NOT NULL,
+    hash TEXT NOT NULL REFERENCES zones (hash),
+    prev_hash TEXT,                   -- NULL for the first snapshot of a domain
+    kind TEXT NOT NULL,               -- get | set | rollback
+    plan TEXT,                        -- change lines for set/rollback
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_domain_time ON history (domain, first_seen);
+CREATE INDEX IF NOT EXISTS history_time ON history (first_seen);
+"""
+
+
+def default_path():
+    base = os.getenv('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'lechworld', 'zone_history.db')
+
+
+def zone_hash(records):
+    """Content hash of a record set, independent of order and host ids"""
+    canonical = sorted((r.key, r.attrs) for r in records)
+    return hashlib.sha256(json.dumps(canonical).encode('utf-8')).hexdigest()
+
+
+def parse_when(text, now=None):
+    """'2026-10-01', '2026-10-01T12:00', '7d', '12h' or unix seconds -> unix time"""
+    now = time.time() if now is None else now
+    text = str(text).strip()
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhdw])', text)
+    if match:
+        units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+        return now - float(match.group(1)) * units[match.group(2)]
+    if re.fullmatch(r'\d{9,}(\.\d+)?', text):
+        return float(text)
+    try:
+        moment = datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError(f"Not a date, time or age: {text!r}")
+    if len(text) == 10:
+        # A bare date means the end of that day
+        moment = moment.replace(hour=23, minute=59, second=59)
+    return moment.timestamp()
+
+
+class ZoneHistory:
+    """SQLite-backed snapshot store, safe to share between threads"""
+
+    def __init__(self, path=None):
+        self.path = path or default_path()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def record(self, domain, records, kind='get', plan=None, when=None):
+        """Store a snapshot; returns its hash
+
+        If the domain's latest snapshot has the same content only its
+        last_seen time moves, unless this is a write (set/rollback).
+        """
+        domain = domain.lower()
+        when = time.time() if when is None else when
+        digest = zone_hash(records)
+        with self.lock, self.db:
+            latest = self.db.execute(
+                'SELECT id, hash FROM history WHERE domain = ? ORDER BY first_seen DESC, id DESC LIMIT 1',
+                (domain,)).fetchone()
+            if latest and latest[1] == digest and kind == 'get':
+                self.db.execute('UPDATE history SET last_seen = ? WHERE id = ?', (when, latest[0]))
+                return digest
+            if not self.db.execute('SELECT 1 FROM zones WHERE hash = ?', (digest,)).fetchone():
+                dicts = [r.to_dict() for r in records]
+                self.db.execute('INSERT INTO zones VALUES (?, ?, ?)',
+                                (digest, json.dumps(dicts), len(dicts)))
+                self.db.executemany('INSERT INTO zone_records VALUES (?, ?, ?, ?, ?, ?)', [
+                    (digest, r.key[0], r.type, r.key[2], r.ttl, r.mx_pref if r.type == 'MX' else None)
+                    for r in records])
+            self.db.execute(
+                'INSERT INTO history (domain, hash, prev_hash, kind, plan, first_seen, last_seen) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (domain, digest, latest[1] if latest else None, kind,
+                 '\n'.join(plan) if plan else None, when, when))
+        return digest
+
+    def snapshot(self, digest):
+        """HostRecords of a stored zone (hash prefixes work), or None"""
+        with self.lock:
+            row = self.db.execute('SELECT records FROM zones WHERE hash LIKE ? LIMIT 2',
+                                  (digest + '%',)).fetchall()
+        if len(row) != 1:
+            return None
+        return [HostRecord.from_dict(d) for d in json.loads(row[0][0])]
+
+    def _entry_at(self, domain, when):
+        return self.db.execute(
+            'SELECT hash, first_seen FROM history WHERE domain = ? AND first_seen <= ? '
+            'ORDER BY first_seen DESC, id DESC LIMIT 1', (domain.lower(), when)).fetchone()
+
+    def zone_at(self, domain, when=None):
+        """(hash, since, records) in effect at ``when`` (default now), or None"""
+        with self.lock:
+            row = self._entry_at(domain, time.time() if when is None else when)
+        if not row:
+            return None
+        return row[0], row[1], self.snapshot(row[0])
+
+    def lookup(self, domain, name, type_=None, when=None):
+        """[(type, address, ttl)] for one host name at a point in time"""
+        name = name.strip().lower().rstrip('.') or '@'
+        with self.lock:
+            row = self._entry_at(domain, time.time() if when is None else when)
+            if not row:
+                return []
+            sql = 'SELECT type, address, ttl FROM zone_records WHERE hash = ? AND name = ?'
+            params = [row[0], name]
+            if type_:
+                sql += ' AND type = ?'
+                params.append(type_.upper())
+            return self.db.execute(sql + ' ORDER BY type, address', params).fetchall()
+
+    def log(self, domain, limit=20):
+        """Latest history entries for a domain, newest first"""
+        with self.lock:
+            return self.db.execute(
+                'SELECT h.hash, h.prev_hash, h.kind, h.plan, h.first_seen, h.last_seen, z.record_count '
+                'FROM history h JOIN zones z ON z.hash = h.hash WHERE h.domain = ? '
+                'ORDER BY h.first_seen DESC, h.id DESC LIMIT ?', (domain.lower(), limit)).fetchall()
+
+    def changed_since(self, since):
+        """[(domain, changes, last change time)] for zones whose content changed after ``since``"""
+        with self.lock:
+            return self.db.execute(
+                'SELECT domain, COUNT(*), MAX(first_seen) FROM history '
+                'WHERE first_seen >= ? AND prev_hash IS NOT NULL AND prev_hash != hash '
+                'GROUP BY domain ORDER BY MAX(first_seen) DESC', (since,)).fetchall()
+
+
+_shared = {}
+
+
+def open_history(path=None):
+    """Process-wide ZoneHistory for ``path`` / DNS_HISTORY_DB, or None when disabled"""
+    path = path or os.getenv(HISTORY_ENV) or default_path()
+    if path.lower() in ('off', 'none', '0'):
+        return None
+    if path not in _shared:
+        try:
+            _shared[path] = ZoneHistory(path)
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️  Zone history disabled ({path}: {e})", file=sys.stderr)
+            _shared[path] = None
+    return _shared[path]
+
+
+def rollback(client, domain, records, history=None, dry_run=False):
+    """Replay a stored snapshot with a single setHosts (skipped if the zone already matches)"""
+    sld, tld = split_domain(domain)
+    with write_lock(domain):
+        current, result = fetch_current(client, sld, tld)
+        if current is None:
+            return None, result
+        plan = plan_changes(current, records)
+        if plan.is_noop or dry_run:
+            return plan, None
+        result = client.set_hosts(sld, tld, records)
+        if result.ok:
+            mark_applied(domain, None, wrote=True)
+            if history is not None:
+                history.record(domain, records, 'rollback', [line.strip() for line in plan.lines()])
+    return plan, result
+
+
+def _fmt_time(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and roll back stored zone snapshots")
+    parser.add_argument('--db', help=f"history database (default: ${HISTORY_ENV} or {default_path()})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('log', help="snapshots of one domain, newest first")
+    p.add_argument('domain')
+    p.add_argument('--limit', type=int, default=20)
+
+    p = commands.add_parser('show', help="the whole zone at a point in time")
+    p.add_argument('domain')
+    p.add_argument('--at', help="date/time or age like 3d (default: now)")
+
+    p = commands.add_parser('lookup', help="what one host name pointed to")
+    p.add_argument('domain')
+    p.add_argument('name')
+    p.add_argument('--type')
+    p.add_argument('--at', help="date/time or age like 3d (default: now)")
+
+    p = commands.add_parser('changed', help="domains whose records changed")
+    p.add_argument('--since', default='7d', help="date/time or age (default: 7d)")
+
+    p = commands.add_parser('rollback', help="restore a stored snapshot with one setHosts")
+    p.add_argument('domain')
+    target = p.add_mutually_exclusive_group(required=True)
+    target.add_argument('--at', help="restore the zone as it was at this date/time")
+    target.add_argument('--snapshot', help="restore this snapshot hash (prefix is enough)")
+    p.add_argument('--dry-run', action='store_true', help="show the plan without writing")
+    p.add_argument('--client-ip')
+    args = parser.parse_args()
+
+    history = ZoneHistory(args.db or os.getenv(HISTORY_ENV) or None)
+    try:
+        when = parse_when(args.at) if getattr(args, 'at', None) else None
+        if args.command == 'log':
+            for digest, prev, kind, plan, first, last, count in history.log(args.domain, args.limit):
+                seen = _fmt_time(first) + (f" → {_fmt_time(last)}" if last > first else "")
+                print(f"{digest[:12]}  {kind:8} {count:4} records  {seen}")
+                for line in (plan or '').splitlines():
+                    print(f"      {line}")
+        elif args.command == 'show':
+            found = history.zone_at(args.domain, when)
+            if not found:
+                print(f"❓ No snapshot of {args.domain} at that time")
+                sys.exit(1)
+            digest, since, records = found
+            print(f"📜 {args.domain} snapshot {digest[:12]} (since {_fmt_time(since)})")
+            for record in records:
+                print(f"   {record.type:6} {record.name:20} {record.ttl:>6} → {record.address}")
+        elif args.command == 'lookup':
+            rows = history.lookup(args.domain, args.name, args.type, when)
+            if not rows:
+                print(f"❓ No {args.type or ''} records for {args.name} in that snapshot")
+                sys.exit(1)
+            for type_, address, ttl in rows:
+                print(f"{args.name} {type_:6} {address} (TTL {ttl})")
+        elif args.command == 'changed':
+            rows = history.changed_since(parse_when(args.since))
+            for domain, changes, last in rows:
+                print(f"{domain:30} {changes:3} change(s), last {_fmt_time(last)}")
+            if not rows:
+                print("➖ No zone changes in that period")
+        elif args.command == 'rollback':
+            if args.snapshot:
+                digest, records = args.snapshot, history.snapshot(args.snapshot)
+            else:
+                found = history.zone_at(args.domain, when)
+                digest, records = (found[0], found[2]) if found else (None, None)
+            if records is None:
+                print("❓ No matching snapshot")
+                sys.exit(1)
+            sys.exit(0 if _rollback_cli(history, args, digest, records) else 1)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        history.close()
+
+
+def _rollback_cli(history, args, digest, records):
+    api_user = os.getenv('NAMECHEAP_API_USER')
+    api_key = os.getenv('NAMECHEAP_API_KEY')
+    if not api_user or not api_key:
+        print("Set NAMECHEAP_API_USER and NAMECHEAP_API_KEY")
+        return False
+    try:
+        client_ip = get_client_ip(args.client_ip)
+    except ClientIPError as e:
+        print(f"❌ Could not determine client IP ({e}); pass --client-ip")
+        return False
+
+    print(f"⏪ Rolling {args.domain} back to snapshot {digest[:12]} ({len(records)} records)")
+    try:
+        with NamecheapClient(api_user, api_key, client_ip, history=history) as client:
+            plan, result = rollback(client, args.domain, records, history, args.dry_run)
+    except TransportError as e:
+        print(f"❌ Connection error: {e}")
+        return False
+    except LockTimeout as e:
+        print(f"❌ Another run is still writing this zone ({e})")
+        return False
+    except OSError as e:
+        print(f"❌ Could not take the zone lock: {e}")
+        return False
+    if plan is None:
+        print(f"❌ Could not read the current zone: {'; '.join(t for _, t in result.errors)}")
+        return False
+    if plan.is_noop:
+        print("✅ Zone already matches that snapshot, nothing to do")
+        return True
+    for line in plan.lines():
+        print(line)
+    if args.dry_run:
+        print("🔍 Dry run, nothing was written")
+        return True
+    if not result.ok:
+        print(f"❌ setHosts failed: {'; '.join(t for _, t in result.errors)}")
+        return False
+    print("✅ Snapshot restored")
+    return True
+
+
+if __name__ == "__main__":
+    main()